@@ -0,0 +1,352 @@
+"""
+Module contains an asyncio based facade to create PokeObjects from a
+request, and the downloader of the async engine. Every top level and
+expanded sub-request runs as a coroutine on one event loop, so thousands
+of requests in flight do not need thousands of threads.
+"""
+import asyncio
+import collections
+import functools
+import itertools
+
+from pokedex_maker import InvalidPokeObject, PokedexMaker
+from pokeretriever import parsing
+from pokeretriever.instrumentation import metrics
+from pokeretriever.resilience import FailedRequest, RequestFailed
+from pokeretriever.pokeretriever import SECTIONS, PokedexObject, \
+    PokedexRequest, expanded_sections
+from pokeretriever.scheduler import EXPANSION, TOP_LEVEL, RequestScheduler
+from pokeretriever.transport import AiohttpTransport
+
+
+class AsyncPokedexMaker:
+    """
+    Facade to create PokeObjects from a request using an async transport,
+    e.g. an AiohttpTransport.
+    Parsing is shared with PokedexMaker so both engines create identical
+    objects.
+    """
+    base_url = PokedexMaker.base_url
+    transport = None
+    cache = None
+    scheduler = None
+    snapshot = None
+    retry_policy = PokedexMaker.retry_policy
+    breaker = PokedexMaker.breaker
+    # (kind, name) -> asyncio.Task of the sub-resources being loaded,
+    # shared by every expanded Pokemon that asks for one at the same time
+    memo = None
+
+    def __init__(self, transport, cache=None, scheduler=None,
+                 snapshot=None):
+        """
+        Initialize an AsyncPokedexMaker. Must be called inside the event
+        loop that runs the requests.
+        :param transport: the opened async transport requests are sent
+        through
+        :param cache: a ResponseCache, or None to always use the network
+        :param scheduler: the RequestScheduler every fetch goes through,
+        its max_in_flight is the global concurrency limit
+        :param snapshot: a SnapshotStore to answer every lookup offline, or
+        None to use the cache and network
+        """
+        AsyncPokedexMaker.transport = transport
+        AsyncPokedexMaker.cache = cache
+        AsyncPokedexMaker.snapshot = snapshot
+        AsyncPokedexMaker.scheduler = scheduler if scheduler is not None \
+            else RequestScheduler()
+        AsyncPokedexMaker.memo = {}
+
+    @classmethod
+    async def execute_request(cls, pokedex_request: PokedexRequest) \
+            -> PokedexObject:
+        """
+        Creates a PokeObject from a request. Pokemon are never lazy on this
+        engine, their sections are fetched before they are returned.
+        :param pokedex_request: PokedexRequest
+        :return: PokedexObject
+        """
+        if pokedex_request.mode == 'pokemon':
+            return await cls._get_pokemon(pokedex_request.name_or_id,
+                                          pokedex_request.expanded)
+        elif pokedex_request.mode == 'stat':
+            return PokedexMaker._build_stat(
+                await cls._get_json('stat', pokedex_request.name_or_id))
+        elif pokedex_request.mode == 'ability':
+            return PokedexMaker._build_ability(
+                await cls._get_json('ability', pokedex_request.name_or_id))
+        elif pokedex_request.mode == 'move':
+            return PokedexMaker._build_move(
+                await cls._get_json('move', pokedex_request.name_or_id))
+
+    @classmethod
+    async def _get_json(cls, kind: str, name: str,
+                        priority=TOP_LEVEL) -> dict:
+        """
+        Helper method to get the json of a PokeAPI resource from the
+        snapshot when one is set, otherwise going through the response
+        cache when one is set.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: dict
+        """
+        if cls.snapshot is not None:
+            metrics.count('snapshot.lookup')
+            body = cls.snapshot.get(kind, name)
+            if body is None:
+                raise InvalidPokeObject(name)
+            return parsing.loads(body)
+        url = f'{cls.base_url}/{kind}/{name}'
+        entry = cls.cache.get(url) if cls.cache is not None else None
+        if entry is not None and entry.is_fresh(cls.cache.ttl):
+            metrics.count('cache.hit')
+            return parsing.loads(entry.body)
+        if cls.cache is not None:
+            metrics.count('cache.miss')
+        headers = entry.validators() if entry is not None else {}
+        response = await cls._send(kind, name, url, headers, priority)
+        body = response.content
+        metrics.count('bytes_downloaded', len(body))
+        if entry is not None and response.status_code == 304:
+            metrics.count('cache.revalidated')
+            cls.cache.revalidated(url, response.headers.get('ETag'),
+                                  response.headers.get('Last-Modified'))
+            return parsing.loads(entry.body)
+        if response.status_code in PokedexMaker.invalid_statuses:
+            raise InvalidPokeObject(name)
+        if response.status_code >= 400:
+            raise RequestFailed(name, f'HTTP {response.status_code}')
+        with metrics.phase('lean'):
+            json_response = parsing.LEAN_PARSERS[kind](parsing.loads(body))
+        if cls.cache is not None:
+            cls.cache.put(url, parsing.dumps(json_response),
+                          response.headers.get('ETag'),
+                          response.headers.get('Last-Modified'))
+        return json_response
+
+    @classmethod
+    async def _send(cls, kind: str, name: str, url: str, headers: dict,
+                    priority=TOP_LEVEL):
+        """
+        Helper method to send a request through the scheduler, retrying
+        like PokedexMaker._send does.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param url: str
+        :param headers: dict, the request headers
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: TransportResponse, its status is not a transient one
+        :raises RequestFailed: when every attempt failed or the circuit
+        breaker is open
+        """
+        policy = cls.retry_policy
+        for attempt in range(policy.max_retries + 1):
+            cls.breaker.before_request(name)
+            retry_after = None
+            try:
+                async with cls.scheduler.async_slot(priority):
+                    metrics.count(f'requests.{kind}')
+                    with metrics.phase('network'):
+                        response = await cls.transport.get(url, headers)
+            except OSError as e:
+                # transports raise connection errors and timeouts as
+                # OSErrors
+                reason = type(e).__name__
+            else:
+                if not policy.is_transient(response.status_code):
+                    cls.breaker.record_success()
+                    return response
+                reason = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After')
+            cls.breaker.record_failure()
+            if attempt == policy.max_retries:
+                break
+            metrics.count('retries')
+            if retry_after is not None:
+                cls.scheduler.retry_after(retry_after)
+            else:
+                await asyncio.sleep(policy.delay(attempt))
+        raise RequestFailed(name, reason)
+
+    @classmethod
+    async def _get_pokemon(cls, name: str, expanded=False):
+        """
+        Helper method to get a Pokemon. The sub-resources of its expanded
+        sections are all requested concurrently.
+        :param name: name or id of the pokemon
+        :param expanded: bool for every section or none, or the names of
+        the SECTIONS to expand
+        :return: Pokemon
+        """
+        json_response = await cls._get_json('pokemon', name)
+        sections = [section for section in SECTIONS
+                    if section in expanded_sections(expanded)]
+        names = PokedexMaker._section_names(json_response)
+        expansions = await asyncio.gather(*(
+            asyncio.gather(*(cls._get_sub_resource(
+                PokedexMaker.section_kinds[section], sub_name)
+                for sub_name in names[section]))
+            for section in sections))
+        expansions = dict(zip(sections, map(list, expansions)))
+        return PokedexMaker._build_pokemon(json_response, sections,
+                                           expansions.get('stats'),
+                                           expansions.get('abilities'),
+                                           expansions.get('moves'))
+
+    @classmethod
+    async def _get_sub_resource(cls, kind: str, name: str):
+        """
+        Helper method to get a Stat, Ability or Move through the shared
+        memo. Coroutines asking for the same sub-resource while it is
+        loaded await the same task, and the flyweights hand it out
+        afterwards for as long as a Pokemon holds it.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: the name of the sub-resource
+        :return: Stat, Ability or Move
+        """
+        key = (kind, name)
+        task = cls.memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(cls._load_sub_resource(kind, name))
+            cls.memo[key] = task
+            task.add_done_callback(functools.partial(cls._forget, key))
+        return await asyncio.shield(task)
+
+    @classmethod
+    def _forget(cls, key: tuple, task):
+        """
+        Helper method to drop a load from the memo once it is done, the
+        flyweights own what it loaded.
+        :param key: tuple, the (kind, name) of the sub-resource
+        :param task: asyncio.Task, the load
+        """
+        if cls.memo.get(key) is task:
+            del cls.memo[key]
+
+    @classmethod
+    async def _load_sub_resource(cls, kind: str, name: str):
+        """
+        Helper method to get the live instance of a Stat, Ability or Move
+        from the flyweight registry shared with PokedexMaker, or else to
+        fetch, create and register it.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: the name of the sub-resource
+        :return: Stat, Ability or Move
+        """
+        live = PokedexMaker.flyweights.get((kind, name))
+        if live is not None:
+            return live
+        builders = {
+            'stat': PokedexMaker._build_stat,
+            'ability': PokedexMaker._build_ability,
+            'move': PokedexMaker._build_move
+        }
+        return PokedexMaker.flyweights.canonical(
+            (kind, name),
+            builders[kind](await cls._get_json(kind, name, EXPANSION)))
+
+
+class AsyncPokeObjectDownloader:
+    """
+    AsyncPokeObjectDownloader takes requests for PokedexObjects and gets
+    them concurrently on a single asyncio event loop.
+    """
+
+    def __init__(self, pokedex_requests, scheduler, cache=None,
+                 unordered: bool = False, snapshot=None, transport=None):
+        """
+        Initialize an AsyncPokeObjectDownloader.
+        :param pokedex_requests: iterable of requests
+        :param scheduler: RequestScheduler every fetch goes through, its
+        max_in_flight caps the requests in flight including expanded
+        sub-requests.
+        :param cache: ResponseCache or None to always use the network
+        :param unordered: bool, when True objects are yielded as soon as
+        they complete instead of in request order
+        :param snapshot: SnapshotStore answering every lookup offline, or
+        None
+        :param transport: an unopened async transport, opened and closed by
+        the download, or None for an AiohttpTransport with a pool of
+        max_in_flight connections
+        """
+        self.pokedex_requests = pokedex_requests
+        self.scheduler = scheduler
+        self.cache = cache
+        self.unordered = unordered
+        self.snapshot = snapshot
+        self.transport = transport if transport is not None \
+            else AiohttpTransport(scheduler.max_in_flight)
+        self.failures = []  # FailedRequest of every request that failed
+
+    def download(self):
+        """
+        Processes each request, yielding PokeObjects as soon as they are
+        ready. The event loop only runs while the caller waits for the
+        next object. Requests that fail are added to failures instead.
+        :return: generator of PokeObjects.
+        """
+        loop = asyncio.new_event_loop()
+        objects = self._download()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(objects.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(objects.aclose())
+            loop.close()
+
+    async def _download(self):
+        """
+        Helper method that runs the requests on the event loop, keeping at
+        most 4 * max_in_flight top level requests pending at a time.
+        :return: async generator of PokeObjects.
+        """
+        window = 4 * self.scheduler.max_in_flight
+        requests_iter = iter(self.pokedex_requests)
+        async with self.transport as transport:
+            pokedex_maker = AsyncPokedexMaker(transport, self.cache,
+                                              self.scheduler, self.snapshot)
+            pending = collections.deque(
+                asyncio.ensure_future(self._execute(pokedex_maker, request))
+                for request in itertools.islice(requests_iter, window))
+            try:
+                while pending:
+                    if self.unordered:
+                        done, _ = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED)
+                        pending = collections.deque(
+                            task for task in pending if task not in done)
+                    else:
+                        done = [pending.popleft()]
+                    for task in done:
+                        for request in itertools.islice(requests_iter, 1):
+                            pending.append(asyncio.ensure_future(
+                                self._execute(pokedex_maker, request)))
+                        result = await task
+                        if isinstance(result, FailedRequest):
+                            self.failures.append(result)
+                        else:
+                            yield result
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def _execute(pokedex_maker, pokedex_request):
+        """
+        Helper method to run a request, turning the failures of that one
+        request into its outcome so the rest of the batch carries on.
+        :param pokedex_maker: AsyncPokedexMaker
+        :param pokedex_request: PokedexRequest
+        :return: PokedexObject or FailedRequest
+        """
+        try:
+            return await pokedex_maker.execute_request(pokedex_request)
+        except (InvalidPokeObject, RequestFailed) as e:
+            metrics.count('failed_requests')
+            return FailedRequest(pokedex_request.mode,
+                                 pokedex_request.name_or_id, e)
@@ -0,0 +1,124 @@
+"""
+Checks that PokedexObjects survive a round trip through the binary codec,
+from bytes, a memoryview and an mmap, then compares its size and encode
+and decode times with pickle and with JSON of to_dict(), for a batch of
+Pokemon and a batch of expanded Pokemon.
+
+Usage: python benchmarks/bench_codec.py [--count N] [--repeat N]
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import fixtures  # noqa: E402
+from pokedex_maker import PokedexMaker  # noqa: E402
+from pokeretriever import codec, parsing  # noqa: E402
+from pokeretriever.pokeretriever import SECTIONS  # noqa: E402
+
+FORMATS = [
+    ('pickle', lambda objects: pickle.dumps(objects, pickle.HIGHEST_PROTOCOL),
+     pickle.loads),
+    ('json of to_dict()', lambda objects: json.dumps(
+        [pokedex.to_dict() for pokedex in objects]).encode(), json.loads),
+    ('codec', codec.encode, codec.decode),
+]
+
+
+def make_batch(count: int, expanded: bool) -> list:
+    """
+    Builds a batch of Pokemon, the expanded ones sharing their Stats,
+    Abilities and Moves like the makers do.
+    :param count: int
+    :param expanded: bool
+    :return: list of Pokemon
+    """
+    bodies = {}
+
+    def lean(kind: str, name: str) -> bytes:
+        if (kind, name) not in bodies:
+            bodies[kind, name] = parsing.lean_body(kind, json.dumps(
+                fixtures.resource_json(kind, name)).encode())
+        return bodies[kind, name]
+
+    batch = []
+    for i in range(count):
+        body = lean('pokemon', str(i % 1000 + 1))
+        if not expanded:
+            batch.append(PokedexMaker._build_pokemon(parsing.loads(body),
+                                                     False))
+            continue
+        names = PokedexMaker._section_names(parsing.loads(body))
+        batch.append(PokedexMaker._build_pokemon(
+            parsing.loads(body), True,
+            *([PokedexMaker._build_from_body(
+                PokedexMaker.section_kinds[section], name,
+                lean(PokedexMaker.section_kinds[section], name))
+               for name in names[section]] for section in SECTIONS)))
+    return batch
+
+
+def check_round_trip(batch: list):
+    """
+    Checks that a batch decodes to the same objects from every kind of
+    buffer before its times are reported. The codec's own tests cover the
+    details and the bad input.
+    :param batch: list of Pokemon
+    :raises ValueError: when the batch does not survive the trip
+    """
+    expected = [pokedex.to_dict() for pokedex in batch]
+    blob = codec.encode(batch)
+    with tempfile.TemporaryFile() as file:
+        file.write(blob)
+        file.flush()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for buffer in (blob, memoryview(blob), mapped):
+                decoded = codec.decode(buffer)
+                if [pokedex.to_dict() for pokedex in decoded] != expected:
+                    raise ValueError(f'the batch decoded from '
+                                     f'{type(buffer).__name__} differs')
+
+
+def best_time(function, argument, repeat: int) -> float:
+    """
+    Gets the best time of repeat calls.
+    :return: float, milliseconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200,
+                        help='Pokemon per batch')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per format, the best one is reported')
+    arguments = parser.parse_args()
+
+    for expanded in (False, True):
+        batch = make_batch(arguments.count, expanded)
+        check_round_trip(batch)
+        print(f'\n{len(batch)} {"expanded " if expanded else ""}Pokemon, '
+              f'round trip ok')
+        print(f'{"format":<20}{"KB":>10}{"encode ms":>12}{"decode ms":>12}')
+        for name, encode, decode in FORMATS:
+            blob = encode(batch)
+            print(f'{name:<20}{len(blob) / 1024:>10.1f}'
+                  f'{best_time(encode, batch, arguments.repeat):>12.2f}'
+                  f'{best_time(decode, blob, arguments.repeat):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Measures the bytes per object of Pokemon, Ability, Move and Stat objects,
+comparing the slotted, interned model with the dict backed model it
+replaced. Then measures the bytes per expanded Pokemon of a batch, with
+its Stats, Abilities and Moves built for every Pokemon or shared through
+the flyweight registry.
+
+Usage: python benchmarks/bench_memory.py [--count N]
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import fixtures  # noqa: E402
+from pokedex_maker import PokedexMaker  # noqa: E402
+from pokeretriever import parsing  # noqa: E402
+
+
+def dict_backed(kind: str, json_response: dict):
+    """
+    Creates the object the way the model did before __slots__, with a
+    __dict__, lists and a private copy of every string.
+    :param kind: str
+    :param json_response: dict
+    :return: types.SimpleNamespace
+    """
+    if kind == 'pokemon':
+        return types.SimpleNamespace(
+            name=json_response['name'], id=json_response['id'],
+            height=json_response['height'], weight=json_response['weight'],
+            stats=[(stat['stat']['name'], stat['base_stat'])
+                   for stat in json_response['stats']],
+            types=[a_type['type']['name'] for a_type
+                   in json_response['types']],
+            abilities=[ability['ability']['name']
+                       for ability in json_response['abilities']],
+            move=[(move['move']['name'],
+                   move['version_group_details'][0]['level_learned_at'])
+                  for move in json_response['moves']],
+            expanded=False)
+    if kind == 'ability':
+        return types.SimpleNamespace(
+            name=json_response['name'], id=json_response['id'],
+            generation=json_response['generation']['name'],
+            effect=json_response['effect_entries'][0]['effect'],
+            effect_short=json_response['effect_entries'][0]['short_effect'],
+            pokemon=[pokemon['pokemon']['name']
+                     for pokemon in json_response['pokemon']])
+    if kind == 'move':
+        return types.SimpleNamespace(
+            name=json_response['name'], id=json_response['id'],
+            generation=json_response['generation']['name'],
+            accuracy=json_response['accuracy'], pp=json_response['pp'],
+            power=json_response['power'],
+            type=json_response['type']['name'],
+            damage_class=json_response['damage_class']['name'],
+            effect_short=json_response['effect_entries'][0]['short_effect'])
+    return types.SimpleNamespace(
+        name=json_response['name'], id=json_response['id'],
+        is_battle_only=json_response['is_battle_only'])
+
+
+def slotted(kind: str, json_response: dict):
+    """
+    Creates the object with the current model.
+    :param kind: str
+    :param json_response: dict
+    :return: PokedexObject
+    """
+    if kind == 'pokemon':
+        return PokedexMaker._build_pokemon(json_response, False)
+    builders = {'ability': PokedexMaker._build_ability,
+                'move': PokedexMaker._build_move,
+                'stat': PokedexMaker._build_stat}
+    return builders[kind](json_response)
+
+
+def measure(kind: str, bodies: list, factory) -> float:
+    """
+    Measures the bytes still allocated per object after the parsed json
+    is thrown away.
+    :param kind: str
+    :param bodies: list of bytes, the raw responses
+    :param factory: callable creating an object from a kind and json
+    :return: float, bytes per object
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(kind, json.loads(body)) for body in bodies]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(objects)
+
+
+def expanded_batch(count: int, shared: bool) -> float:
+    """
+    Measures the bytes still allocated per expanded Pokemon of a batch.
+    :param count: int, Pokemon in the batch
+    :param shared: bool, True to share the sub-resources through the
+    flyweight registry, False to build them for every Pokemon
+    :return: float, bytes per Pokemon
+    """
+    bodies = {}
+
+    def lean(kind: str, name: str) -> bytes:
+        if (kind, name) not in bodies:
+            bodies[kind, name] = parsing.lean_body(kind, json.dumps(
+                fixtures.resource_json(kind, name)).encode())
+        return bodies[kind, name]
+
+    batch = []
+    for i in range(count):
+        body = lean('pokemon', str(i % 1000 + 1))
+        names = PokedexMaker._section_names(parsing.loads(body))
+        batch.append((body, {
+            section: [(name, lean(PokedexMaker.section_kinds[section], name))
+                      for name in names[section]]
+            for section in names}))
+    builders = {'ability': PokedexMaker._build_ability,
+                'move': PokedexMaker._build_move,
+                'stat': PokedexMaker._build_stat}
+    build = PokedexMaker._build_from_body if shared else \
+        lambda kind, name, body: builders[kind](parsing.loads(body))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    pokemon = [PokedexMaker._build_pokemon(
+        parsing.loads(body), True,
+        *([build(PokedexMaker.section_kinds[section], name, sub_body)
+           for name, sub_body in section_bodies[section]]
+          for section in ('stats', 'abilities', 'moves')))
+        for body, section_bodies in batch]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(pokemon)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=500,
+                        help='objects created per kind')
+    count = parser.parse_args().count
+
+    makers = {'pokemon': fixtures.pokemon_json,
+              'ability': fixtures.ability_json,
+              'move': fixtures.move_json,
+              'stat': fixtures.stat_json}
+    print(f'{"kind":<10}{"before B/obj":>14}{"after B/obj":>14}'
+          f'{"saved":>8}')
+    for kind, maker in makers.items():
+        bodies = [json.dumps(maker(i % 1000 + 1)).encode()
+                  for i in range(count)]
+        before = measure(kind, bodies, dict_backed)
+        after = measure(kind, bodies, slotted)
+        print(f'{kind:<10}{before:>14.0f}{after:>14.0f}'
+              f'{1 - after / before:>8.0%}')
+    built = expanded_batch(count, shared=False)
+    shared = expanded_batch(count, shared=True)
+    print(f'\n{"expanded batch":<16}{"per Pokemon B/obj":>20}')
+    print(f'{"built each time":<16}{built:>20.0f}')
+    print(f'{"flyweights":<16}{shared:>20.0f}'
+          f'  ({1 - shared / built:.0%} saved)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures the parse time and allocations per Pokemon of the response
+handling paths: the old stringify and parse everything path, the full
+parse with the stdlib and orjson backends, trimming a fresh response, and
+parsing an already trimmed (cached) response.
+
+Usage: python benchmarks/bench_parse.py [--count N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import fixtures  # noqa: E402
+from pokeretriever import parsing  # noqa: E402
+
+
+def old_path(body: bytes):
+    """The response handling before status code based error detection."""
+    if str(body) == "b'Not Found'":
+        raise ValueError
+    return json.loads(body)
+
+
+PATHS = [
+    ('str() check + json.loads', old_path),
+    ('json.loads', json.loads),
+    ('backend loads', parsing.loads),
+    ('lean_body (fresh response)',
+     lambda body: parsing.lean_body('pokemon', body)),
+]
+
+
+def time_per_call(function, bodies: list, repeat: int) -> float:
+    """
+    Gets the best time per call over repeat runs.
+    :return: float, microseconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            function(body)
+        best = min(best, time.perf_counter() - start)
+    return best / len(bodies) * 1e6
+
+
+def allocated_per_call(function, bodies: list) -> float:
+    """
+    Gets the peak bytes allocated while handling one body.
+    :return: float, average peak bytes
+    """
+    total = 0
+    for body in bodies:
+        tracemalloc.start()
+        function(body)
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return total / len(bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200,
+                        help='pokemon bodies parsed per run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per path, the best one is reported')
+    arguments = parser.parse_args()
+
+    bodies = [json.dumps(fixtures.pokemon_json(i + 1)).encode()
+              for i in range(arguments.count)]
+    lean_bodies = [parsing.lean_body('pokemon', body) for body in bodies]
+    paths = PATHS + [('backend loads (cached lean body)', parsing.loads)]
+    print(f'JSON backend: {"orjson" if parsing.orjson else "json"}')
+    print(f'average body {sum(map(len, bodies)) / len(bodies):.0f} B, '
+          f'lean body {sum(map(len, lean_bodies)) / len(bodies):.0f} B')
+    print(f'{"path":<36}{"us/pokemon":>12}{"peak KB":>10}')
+    for index, (name, function) in enumerate(paths):
+        inputs = lean_bodies if index == len(paths) - 1 else bodies
+        micros = time_per_call(function, inputs, arguments.repeat)
+        peak = allocated_per_call(function, inputs[:20])
+        print(f'{name:<36}{micros:>12.1f}{peak / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
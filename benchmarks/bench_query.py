@@ -0,0 +1,127 @@
+"""
+Answers "which Pokemon have ability X and a move of type Y with power >= P"
+over a batch of fixtures two ways: by cross-referencing the Pokemon and
+move bodies like one lookup per resource would, and with the inverted
+indexes of the query mode. Checks both agree, then reports the requests
+the lookups need, the time to build the indexes, to update them with a few
+new Pokemon and to answer the queries.
+
+Usage: python benchmarks/bench_query.py [--count N] [--queries N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import fixtures  # noqa: E402
+from pokeretriever import parsing  # noqa: E402
+from pokeretriever.index import Clause, PokedexIndex  # noqa: E402
+
+
+def lean(kind: str, name: str) -> bytes:
+    """Gets the lean body of a fixture."""
+    return parsing.lean_body(kind, parsing.dumps(
+        fixtures.resource_json(kind, name)))
+
+
+def cross_reference(pokemon: dict, moves: dict, abilities: dict,
+                    question: tuple) -> tuple:
+    """
+    Answers a question the way separate lookups would: the ability, every
+    Pokemon to find the ones it lists or that list it, and every move of
+    those Pokemon.
+    :param pokemon: dict of name to lean body
+    :param moves: dict of name to lean body
+    :param abilities: dict of name to lean body
+    :param question: tuple of the ability, the move type and the min power
+    :return: tuple of the sorted matching names and the lookups needed
+    """
+    ability, move_type, power = question
+    lookups = 1 + len(pokemon)
+    listed = {entry['pokemon']['name'] for entry
+              in parsing.loads(abilities[ability])['pokemon']}
+    matches = []
+    for name, body in sorted(pokemon.items()):
+        doc = parsing.loads(body)
+        if name not in listed and ability not in (
+                entry['ability']['name'] for entry in doc['abilities']):
+            continue
+        for entry in doc['moves']:
+            lookups += 1
+            move = parsing.loads(moves[entry['move']['name']])
+            if move['type']['name'] == move_type \
+                    and (move['power'] or 0) >= power:
+                matches.append(name)
+                break
+    return sorted(matches), lookups
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000,
+                        help='Pokemon indexed')
+    parser.add_argument('--queries', type=int, default=20,
+                        help='questions asked')
+    arguments = parser.parse_args()
+
+    pokemon = {fixtures.pokemon_name(id_): lean('pokemon', str(id_))
+               for id_ in range(1, arguments.count + 1)}
+    moves = {name: lean('move', name)
+             for name in fixtures.resource_names('move')}
+    abilities = {name: lean('ability', name)
+                 for name in fixtures.resource_names('ability')}
+    rng = random.Random(0)
+    questions = [(rng.choice(list(abilities)), rng.choice(fixtures.TYPES),
+                  rng.choice([60, 80, 100])) for _ in range(arguments.queries)]
+
+    start = time.perf_counter()
+    answers = [cross_reference(pokemon, moves, abilities, question)
+               for question in questions]
+    walk = time.perf_counter() - start
+    lookups = sum(needed for _, needed in answers)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with PokedexIndex(os.path.join(directory, 'index.sqlite3')) as index:
+            # the last few Pokemon arrive later, like the next run's fetches
+            late = set(list(pokemon)[-max(1, arguments.count // 100):])
+            start = time.perf_counter()
+            for kind, bodies in (('move', moves), ('ability', abilities),
+                                 ('pokemon', pokemon)):
+                for name, body in bodies.items():
+                    if name not in late:
+                        index.add_body(kind, body)
+            index.commit()
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            for name in late:
+                index.add_body('pokemon', pokemon[name])
+            index.commit()
+            update = time.perf_counter() - start
+            start = time.perf_counter()
+            found = [sorted(name for name in index.find('pokemon', [
+                Clause.parse(f'ability={ability}'),
+                Clause.parse(f'move.type={move_type}'),
+                Clause.parse(f'move.power>={power}')])
+                if name in pokemon)
+                for ability, move_type, power in questions]
+            query = time.perf_counter() - start
+            size = os.path.getsize(os.path.join(directory, 'index.sqlite3'))
+
+    assert found == [matches for matches, _ in answers], \
+        'the index and the cross-reference disagree'
+    print(f'{len(questions)} questions over {len(pokemon)} Pokemon, '
+          f'{len(moves)} moves and {len(abilities)} abilities, answers agree')
+    print(f'cross-reference: {lookups} lookups, {walk * 1000:.1f} ms '
+          f'with every body at hand')
+    print(f'index: built in {build * 1000:.0f} ms ({size / 1024:.0f} KB), '
+          f'{len(late)} new Pokemon added in {update * 1000:.1f} ms, '
+          f'{query / len(questions) * 1000:.2f} ms per question')
+
+
+if __name__ == '__main__':
+    main()
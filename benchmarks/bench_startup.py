@@ -0,0 +1,168 @@
+"""
+Measures the startup of poke_maker.py with python -X importtime: the wall
+clock and the import time of `--help`, of a single lookup without the
+response cache and of one answered from a warm response cache, and the
+modules that cost the most. Fails when a run fails or loads a module only
+other code paths need, so a heavy import sneaking back into the CLI is
+caught. The median import time is compared with a budget, which only
+fails the check with --strict.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--help-budget MS]
+       [--lookup-budget MS] [--strict]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POKE_MAKER = os.path.join(ROOT, 'poke_maker.py')
+# modules the runs below must not load, they belong to other code paths:
+# the http transports, the async engine, the server, the profiler and the
+# snapshot. Only the cached lookup needs sqlite3, for the response cache
+LOOKUP_FORBIDDEN = ('requests', 'aiohttp', 'asyncio', 'http.server',
+                    'poke_server', 'cProfile', 'pokeretriever.snapshot')
+UNCACHED_FORBIDDEN = LOOKUP_FORBIDDEN + ('sqlite3',)
+HELP_FORBIDDEN = UNCACHED_FORBIDDEN + ('pokedex_maker',
+                                      'pokeretriever.transport',
+                                      'pokeretriever.instrumentation')
+# the host is never contacted, the lookups are answered by the cache
+API_URL = 'http://127.0.0.1:9/api/v2'
+
+
+def import_times(arguments: list) -> tuple:
+    """
+    Runs poke_maker.py once with -X importtime.
+    :param arguments: list of str, its command line arguments
+    :return: tuple of a dict of every module imported to its cumulative
+    microseconds, the names of nested imports indented, and the error the
+    run ended with or None
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', POKE_MAKER, *arguments],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = {}
+    errors = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            errors.append(line)
+        elif 'cumulative' not in line:
+            _, cumulative, name = line.split('|')
+            modules[name[1:].rstrip()] = int(cumulative)
+    error = None
+    if result.returncode != 0:
+        error = f'exit status {result.returncode}: ' \
+                f'{errors[-1] if errors else "no output"}'
+    return modules, error
+
+
+def measure(arguments: list, repeat: int) -> tuple:
+    """
+    Gets the median wall clock and import time of repeat runs, which one
+    slow run does not move like it moves a single measure.
+    :param arguments: list of str
+    :param repeat: int
+    :return: tuple of the wall clock ms, the import time ms, the modules
+    of the median run and the error of the first run that failed or None
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        modules, error = import_times(arguments)
+        wall = (time.perf_counter() - start) * 1000
+        if error is not None:
+            return wall, 0.0, modules, error
+        # top level imports are the lines without indentation
+        total = sum(micros for name, micros in modules.items()
+                    if not name.startswith(' ')) / 1000
+        runs.append((total, wall, modules))
+    runs.sort(key=lambda run: run[0])
+    total, _, modules = runs[len(runs) // 2]
+    wall = statistics.median(wall for _, wall, _ in runs)
+    return wall, total, modules, None
+
+
+def report(name: str, result: tuple, budget: float, forbidden,
+           strict: bool = False) -> bool:
+    """
+    Prints a run and checks it. A run that fails or loads a forbidden
+    module fails the check. Going over the import time budget only does
+    with strict, the timings of a shared machine vary too much to gate on.
+    :param name: str, the scenario
+    :param result: tuple, what measure() returned
+    :param budget: float, ms importing the median run should stay under
+    :param forbidden: iterable of the modules the run must not load
+    :param strict: bool, True to fail when over budget
+    :return: bool, True when the run passes
+    """
+    wall, total, modules, error = result
+    if error is not None:
+        print(f'\n{name}: FAIL: the run failed, {error}')
+        return False
+    loaded = sorted(module for module in forbidden
+                    if module in {name.strip() for name in modules})
+    print(f'\n{name}: {wall:.0f} ms wall clock, {total:.1f} ms importing '
+          f'(median, budget {budget:.0f} ms)')
+    slowest = sorted(modules.items(), key=lambda item: item[1],
+                     reverse=True)
+    for module, micros in slowest[:8]:
+        print(f'  {micros / 1000:>8.1f} ms  {module.strip()}')
+    if loaded:
+        print(f'  FAIL: loads {", ".join(loaded)}')
+        return False
+    if total > budget:
+        print(f'  {"FAIL" if strict else "WARNING"}: over budget')
+        return not strict
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per scenario, the median one is reported')
+    parser.add_argument('--help-budget', type=float, default=30,
+                        help='max ms importing for --help')
+    parser.add_argument('--lookup-budget', type=float, default=45,
+                        help='max ms importing for a single lookup')
+    parser.add_argument('--strict', action='store_true',
+                        help='fail when a scenario is over its budget')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures_dir = os.path.join(directory, 'fixtures')
+        cache_dir = os.path.join(directory, 'cache')
+        fixtures.write_fixtures(fixtures_dir, [1])
+        lookup = ['pokemon', '--inputdata', '1', '--cache-dir', cache_dir,
+                  '--api-url', API_URL]
+        # warm the cache, the lookups measured below never leave it
+        warmed = subprocess.run([sys.executable, POKE_MAKER, *lookup,
+                                 '--transport', 'fixtures', '--fixtures-dir',
+                                 fixtures_dir], stdout=subprocess.DEVNULL)
+        ok = warmed.returncode == 0
+        if not ok:
+            print(f'FAIL: warming the cache exited with status '
+                  f'{warmed.returncode}')
+        ok &= report('--help', measure(['--help'], arguments.repeat),
+                    arguments.help_budget, HELP_FORBIDDEN, arguments.strict)
+        ok &= report('uncached single lookup',
+                     measure(['pokemon', '--inputdata', '1', '--no-cache',
+                              '--transport', 'fixtures', '--fixtures-dir',
+                              fixtures_dir], arguments.repeat),
+                     arguments.lookup_budget, UNCACHED_FORBIDDEN,
+                     arguments.strict)
+        ok &= report('cached single lookup',
+                     measure(lookup, arguments.repeat),
+                     arguments.lookup_budget, LOOKUP_FORBIDDEN,
+                     arguments.strict)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+A local stand-in for the PokeAPI server. It serves recorded responses
+from a fixtures directory (laid out as <kind>/<name or id>.json) or the
+synthetic responses of fixtures.py, with configurable latency, jitter and
+error rate. Responses carry an ETag and honour If-None-Match.
+
+Usage: python benchmarks/fake_pokeapi.py [--port N] [--latency MS]
+       [--jitter MS] [--error-rate P] [--fixtures-dir DIR]
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import fixtures
+
+
+class FakePokeAPI:
+    """
+    A threaded HTTP server answering /api/v2/<kind>/<name> and the
+    paginated /api/v2/<kind>?limit=&offset= list endpoints.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0,
+                 fixtures_dir: str = None, seed: int = 0):
+        """
+        Initialize a FakePokeAPI, it starts serving on start().
+        :param port: int, 0 picks a free port
+        :param latency: float, seconds added to every response
+        :param jitter: float, max random seconds added on top of latency
+        :param error_rate: float, share of requests answered with a 503
+        :param fixtures_dir: str, directory of recorded responses, or None
+        for synthetic ones
+        :param seed: int, seed of the jitter and error randomness
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fixtures_dir = fixtures_dir
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The base url to pass to poke_maker.py --api-url."""
+        return f'http://127.0.0.1:{self._server.server_port}/api/v2'
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def body(self, kind: str, name: str):
+        """
+        Gets the encoded response for a resource.
+        :param kind: str
+        :param name: str, name or id
+        :return: bytes or None if it does not exist
+        """
+        key = (kind, name)
+        with self._lock:
+            if key in self._bodies:
+                return self._bodies[key]
+        if self.fixtures_dir is not None:
+            path = os.path.join(self.fixtures_dir, kind, f'{name}.json')
+            body = open(path, 'rb').read() if os.path.isfile(path) else None
+        else:
+            doc = fixtures.resource_json(kind, name)
+            body = json.dumps(doc).encode() if doc is not None else None
+        with self._lock:
+            self._bodies[key] = body
+        return body
+
+    def list_body(self, kind: str, limit: int, offset: int) -> bytes:
+        """
+        Gets the encoded response of a list endpoint page.
+        :param kind: str
+        :param limit: int
+        :param offset: int
+        :return: bytes
+        """
+        if self.fixtures_dir is not None:
+            directory = os.path.join(self.fixtures_dir, kind)
+            names = sorted(name[:-len('.json')]
+                           for name in os.listdir(directory)
+                           if name.endswith('.json')) \
+                if os.path.isdir(directory) else []
+            refs = names
+        else:
+            names = fixtures.resource_names(kind)
+            refs = range(1, len(names) + 1)
+        next_url = f'{self.url}/{kind}?limit={limit}&offset=' \
+                   f'{offset + limit}' if offset + limit < len(names) \
+            else None
+        return json.dumps({
+            'count': len(names), 'next': next_url, 'previous': None,
+            'results': [{'name': name, 'url': f'{self.url}/{kind}/{ref}/'}
+                        for name, ref in zip(names[offset:offset + limit],
+                                             refs[offset:offset + limit])]
+        }).encode()
+
+    def _make_handler(self):
+        """Creates the request handler class bound to this server."""
+        api = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with api._lock:
+                    api.request_count += 1
+                    delay = api.latency + api._random.uniform(0, api.jitter)
+                    failed = api._random.random() < api.error_rate
+                time.sleep(delay)
+                if failed:
+                    return self._send(503, b'Service Unavailable',
+                                      {'Retry-After': '0'})
+                parsed = urllib.parse.urlparse(self.path)
+                parts = [part for part in parsed.path.split('/') if part]
+                if len(parts) == 3 and parts[:2] == ['api', 'v2']:
+                    query = urllib.parse.parse_qs(parsed.query)
+                    return self._send(200, api.list_body(
+                        parts[2], int(query.get('limit', ['20'])[0]),
+                        int(query.get('offset', ['0'])[0])))
+                if len(parts) != 4 or parts[:2] != ['api', 'v2']:
+                    return self._send(404, b'Not Found')
+                body = api.body(parts[2], parts[3])
+                if body is None:
+                    return self._send(404, b'Not Found')
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send(304, b'', {'ETag': etag})
+                self._send(200, body, {'ETag': etag})
+
+            def _send(self, status: int, body: bytes, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='milliseconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='max random milliseconds added on top')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of requests answered with a 503')
+    parser.add_argument('--fixtures-dir', type=str, default=None,
+                        help='directory of recorded responses laid out as '
+                             '<kind>/<name or id>.json')
+    arguments = parser.parse_args()
+    api = FakePokeAPI(arguments.port, arguments.latency / 1000,
+                      arguments.jitter / 1000, arguments.error_rate,
+                      arguments.fixtures_dir)
+    print(f'Serving {api.url}')
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
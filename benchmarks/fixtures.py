@@ -0,0 +1,235 @@
+"""
+This module creates deterministic stand-ins for PokeAPI responses. They
+have the same shape and roughly the same size as the real responses, so
+benchmarks can run without the network.
+"""
+import json
+import os
+import random
+
+TYPES = ['normal', 'fighting', 'flying', 'poison', 'ground', 'rock', 'bug',
+         'ghost', 'steel', 'fire', 'water', 'grass', 'electric', 'psychic',
+         'ice', 'dragon', 'dark', 'fairy']
+GENERATIONS = ['generation-i', 'generation-ii', 'generation-iii',
+               'generation-iv', 'generation-v', 'generation-vi',
+               'generation-vii', 'generation-viii']
+DAMAGE_CLASSES = ['physical', 'special', 'status']
+STATS = ['hp', 'attack', 'defense', 'special-attack', 'special-defense',
+         'speed']
+VERSION_GROUPS = ['red-blue', 'yellow', 'gold-silver', 'crystal',
+                  'ruby-sapphire', 'emerald', 'firered-leafgreen',
+                  'diamond-pearl', 'platinum', 'heartgold-soulsilver',
+                  'black-white', 'black-2-white-2', 'x-y',
+                  'omega-ruby-alpha-sapphire', 'sun-moon',
+                  'ultra-sun-ultra-moon']
+SHORT_EFFECTS = ['Inflicts regular damage with no additional effect.',
+                 'Has a $effect_chance% chance to burn the target.',
+                 "Raises the user's Attack by two stages.",
+                 'Has an increased chance for a critical hit.']
+
+MOVE_COUNT = 800
+ABILITY_COUNT = 260
+POKEMON_COUNT = 1000
+
+
+def _named(name: str, kind: str, id_: int) -> dict:
+    """Creates a PokeAPI named resource reference."""
+    return {'name': name,
+            'url': f'https://pokeapi.co/api/v2/{kind}/{id_}/'}
+
+
+def move_name(id_: int) -> str:
+    return f'move-{id_}'
+
+
+def ability_name(id_: int) -> str:
+    return f'ability-{id_}'
+
+
+def pokemon_name(id_: int) -> str:
+    return f'pokemon-{id_}'
+
+
+def pokemon_json(id_: int) -> dict:
+    """
+    Creates a pokemon response with 40 to 120 moves, each learned in
+    several version groups like the real API.
+    :param id_: int
+    :return: dict
+    """
+    rng = random.Random(id_)
+    move_ids = rng.sample(range(1, MOVE_COUNT + 1), rng.randint(40, 120))
+    return {
+        'id': id_,
+        'name': pokemon_name(id_),
+        'base_experience': rng.randint(40, 300),
+        'height': rng.randint(2, 200),
+        'weight': rng.randint(10, 5000),
+        'is_default': True,
+        'order': id_,
+        'abilities': [{'ability': _named(ability_name(a), 'ability', a),
+                       'is_hidden': i == 2, 'slot': i + 1}
+                      for i, a in enumerate(rng.sample(
+                          range(1, ABILITY_COUNT + 1), rng.randint(1, 3)))],
+        'forms': [_named(pokemon_name(id_), 'pokemon-form', id_)],
+        'game_indices': [{'game_index': id_,
+                          'version': _named(group, 'version', i)}
+                         for i, group in enumerate(VERSION_GROUPS)],
+        'held_items': [],
+        'location_area_encounters':
+            f'https://pokeapi.co/api/v2/pokemon/{id_}/encounters',
+        'moves': [{'move': _named(move_name(m), 'move', m),
+                   'version_group_details': [
+                       {'level_learned_at': rng.randint(0, 60),
+                        'move_learn_method': _named('level-up',
+                                                    'move-learn-method', 1),
+                        'version_group': _named(group, 'version-group', i)}
+                       for i, group in enumerate(
+                           rng.sample(VERSION_GROUPS, rng.randint(1, 8)))]}
+                  for m in move_ids],
+        'species': _named(pokemon_name(id_), 'pokemon-species', id_),
+        'sprites': {'front_default': f'https://raw.githubusercontent.com/'
+                                     f'PokeAPI/sprites/master/sprites/'
+                                     f'pokemon/{id_}.png'},
+        'stats': [{'base_stat': rng.randint(5, 160), 'effort': 0,
+                   'stat': _named(stat, 'stat', i + 1)}
+                  for i, stat in enumerate(STATS)],
+        'types': [{'slot': i + 1, 'type': _named(a_type, 'type', 1)}
+                  for i, a_type in enumerate(rng.sample(TYPES,
+                                                        rng.randint(1, 2)))]
+    }
+
+
+def move_json(id_: int) -> dict:
+    """
+    Creates a move response.
+    :param id_: int
+    :return: dict
+    """
+    rng = random.Random(-id_)
+    return {
+        'id': id_,
+        'name': move_name(id_),
+        'accuracy': rng.choice([None, 70, 85, 90, 95, 100]),
+        'pp': rng.choice([5, 10, 15, 20, 25, 30, 35, 40]),
+        'power': rng.choice([None, 20, 40, 60, 80, 90, 100, 120, 150]),
+        'priority': 0,
+        'type': _named(rng.choice(TYPES), 'type', 1),
+        'damage_class': _named(rng.choice(DAMAGE_CLASSES),
+                               'move-damage-class', 1),
+        'generation': _named(rng.choice(GENERATIONS), 'generation', 1),
+        'effect_chance': rng.choice([None, 10, 30]),
+        'effect_entries': [{
+            'effect': 'Inflicts regular damage.  ' * rng.randint(1, 6),
+            'short_effect': rng.choice(SHORT_EFFECTS),
+            'language': _named('en', 'language', 9)}],
+        'learned_by_pokemon': [_named(pokemon_name(p), 'pokemon', p)
+                               for p in rng.sample(
+                                   range(1, POKEMON_COUNT + 1), 60)]
+    }
+
+
+def ability_json(id_: int) -> dict:
+    """
+    Creates an ability response.
+    :param id_: int
+    :return: dict
+    """
+    rng = random.Random(id_ * 7919)
+    return {
+        'id': id_,
+        'name': ability_name(id_),
+        'is_main_series': True,
+        'generation': _named(rng.choice(GENERATIONS), 'generation', 1),
+        'effect_entries': [{
+            'effect': "This Pokémon's moves have a chance to flinch.  "
+                      * rng.randint(1, 4),
+            'short_effect': 'Has a chance of making the target flinch.',
+            'language': _named('en', 'language', 9)}],
+        'pokemon': [{'is_hidden': False, 'slot': 1,
+                     'pokemon': _named(pokemon_name(p), 'pokemon', p)}
+                    for p in rng.sample(range(1, POKEMON_COUNT + 1),
+                                        rng.randint(1, 40))]
+    }
+
+
+def stat_json(id_: int) -> dict:
+    """
+    Creates a stat response.
+    :param id_: int
+    :return: dict
+    """
+    return {
+        'id': id_,
+        'name': STATS[(id_ - 1) % len(STATS)],
+        'game_index': id_,
+        'is_battle_only': False,
+        'move_damage_class': None
+    }
+
+
+def _makers() -> dict:
+    """Maps each kind to its response maker, namer and count."""
+    return {'pokemon': (pokemon_json, pokemon_name, POKEMON_COUNT),
+            'move': (move_json, move_name, MOVE_COUNT),
+            'ability': (ability_json, ability_name, ABILITY_COUNT),
+            'stat': (stat_json, lambda id_: STATS[id_ - 1], len(STATS))}
+
+
+def resource_names(kind: str) -> list:
+    """
+    Lists the names of every resource of a kind, in id order.
+    :param kind: str, 'pokemon', 'move', 'ability' or 'stat'
+    :return: list of str
+    """
+    if kind not in _makers():
+        return []
+    _, namer, count = _makers()[kind]
+    return [namer(id_) for id_ in range(1, count + 1)]
+
+
+def write_fixtures(directory: str, pokemon_ids) -> int:
+    """
+    Writes the responses a run needs in the <kind>/<name or id>.json
+    layout the fixtures transport and FakePokeAPI read: the pokemon by id
+    and every move, ability and stat by name, the way expanded Pokemon
+    request them.
+    :param directory: str
+    :param pokemon_ids: iterable of int
+    :return: int, the number of files written
+    """
+    written = 0
+    targets = [('pokemon', str(id_), pokemon_json(id_))
+               for id_ in pokemon_ids]
+    for kind in ('move', 'ability', 'stat'):
+        maker, namer, count = _makers()[kind]
+        targets.extend((kind, namer(id_), maker(id_))
+                       for id_ in range(1, count + 1))
+    for kind, name, doc in targets:
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        with open(os.path.join(directory, kind, f'{name}.json'), 'w') as file:
+            json.dump(doc, file)
+        written += 1
+    return written
+
+
+def resource_json(kind: str, name: str):
+    """
+    Creates the response for a resource url path, looking it up by id or
+    by name.
+    :param kind: str, 'pokemon', 'move', 'ability' or 'stat'
+    :param name: str, the name or id of the resource
+    :return: dict or None if there is no such resource
+    """
+    makers = _makers()
+    if kind not in makers:
+        return None
+    maker, namer, count = makers[kind]
+    if name.isdigit():
+        id_ = int(name)
+    else:
+        ids = [id_ for id_ in range(1, count + 1) if namer(id_) == name]
+        id_ = ids[0] if ids else 0
+    if not 1 <= id_ <= count:
+        return None
+    return maker(id_)
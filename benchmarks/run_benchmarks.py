@@ -0,0 +1,225 @@
+"""
+Runs poke_maker.py scenarios against a local FakePokeAPI and reports
+throughput, p50/p95/p99 run latency, time to first output, peak RSS and
+peak thread count. Results are saved as JSON so runs can be compared over
+time.
+
+With --transport fixtures the runs answer from synthetic fixtures on
+disk instead of the fake server, which leaves the network out of the
+numbers.
+
+Usage: python benchmarks/run_benchmarks.py [--repeat N] [--latency MS]
+       [--jitter MS] [--error-rate P] [--scenario NAME ...]
+       [--transport http|fixtures] [--results FILE]
+       [-- extra poke_maker.py arguments]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import fixtures
+from fake_pokeapi import FakePokeAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POKE_MAKER = os.path.join(ROOT, 'poke_maker.py')
+
+# name -> (poke_maker.py arguments, number of ids, ids in the input file)
+SCENARIOS = {
+    'single': (['pokemon', '--inputdata', '1'], 1, None),
+    'batch-1k': (['pokemon'], 1000, 1000),
+    'expanded': (['pokemon', '--expanded'], 20, 20),
+}
+
+
+def percentile(values: list, share: float) -> float:
+    """
+    Gets a percentile with linear interpolation.
+    :param values: list of numbers
+    :param share: float between 0 and 1
+    :return: float
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * share
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def sample_process(pid: int, peaks: dict, done: threading.Event):
+    """
+    Polls /proc for the peak RSS and thread count of a process.
+    :param pid: int
+    :param peaks: dict updated with 'rss_kb' and 'threads'
+    :param done: threading.Event set when the process exited
+    """
+    path = f'/proc/{pid}/status'
+    while not done.is_set():
+        try:
+            with open(path) as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        peaks['rss_kb'] = max(peaks.get('rss_kb', 0),
+                                              int(line.split()[1]))
+                    elif line.startswith('Threads:'):
+                        peaks['threads'] = max(peaks.get('threads', 0),
+                                               int(line.split()[1]))
+        except (FileNotFoundError, ProcessLookupError):
+            return
+        done.wait(0.01)
+
+
+def run_once(command: list) -> dict:
+    """
+    Runs poke_maker.py once.
+    :param command: list, the full command line
+    :return: dict of seconds, first_output_seconds, rss_kb, threads and
+    returncode
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    peaks = {}
+    done = threading.Event()
+    sampler = threading.Thread(target=sample_process,
+                               args=(process.pid, peaks, done))
+    sampler.start()
+    first_output = None
+    for _ in iter(lambda: process.stdout.read(65536), b''):
+        if first_output is None:
+            first_output = time.perf_counter() - start
+    returncode = process.wait()
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    return {'seconds': seconds, 'first_output_seconds': first_output,
+            'rss_kb': peaks.get('rss_kb'), 'threads': peaks.get('threads'),
+            'returncode': returncode}
+
+
+def run_scenario(name: str, api: FakePokeAPI, repeat: int,
+                 extra_args: list, work_dir: str,
+                 fixtures_dir: str = None) -> dict:
+    """
+    Runs a scenario repeat times and summarizes the runs.
+    :param fixtures_dir: str, answers the runs with the fixtures transport
+    when provided, or None to send them to the fake server
+    :return: dict
+    """
+    args, ids, input_ids = SCENARIOS[name]
+    command = [sys.executable, POKE_MAKER] + args
+    if input_ids is not None:
+        input_file = os.path.join(work_dir, f'{name}.txt')
+        with open(input_file, 'w') as file:
+            file.writelines(f'{id_}\n' for id_ in range(1, input_ids + 1))
+        command += ['--inputfile', input_file]
+    command += ['--no-cache', '--api-url', api.url] + extra_args
+    if fixtures_dir is not None:
+        command += ['--transport', 'fixtures', '--fixtures-dir',
+                    fixtures_dir]
+
+    requests_before = api.request_count
+    runs = [run_once(command) for _ in range(repeat)]
+    seconds = [run['seconds'] for run in runs]
+    first_outputs = [run['first_output_seconds'] for run in runs
+                     if run['first_output_seconds'] is not None]
+    return {
+        'command': command[1:],
+        'runs': runs,
+        'failed_runs': sum(run['returncode'] != 0 for run in runs),
+        'objects_per_second': ids / statistics.mean(seconds),
+        'http_requests_per_run': (api.request_count - requests_before)
+        / repeat,
+        'latency_seconds': {'p50': percentile(seconds, 0.50),
+                            'p95': percentile(seconds, 0.95),
+                            'p99': percentile(seconds, 0.99)},
+        'first_output_p50_seconds': percentile(first_outputs, 0.50)
+        if first_outputs else None,
+        'peak_rss_kb': max((run['rss_kb'] or 0) for run in runs) or None,
+        'peak_threads': max((run['threads'] or 0) for run in runs) or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=20.0,
+                        help='milliseconds added to every response')
+    parser.add_argument('--jitter', type=float, default=10.0,
+                        help='max random milliseconds added on top')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of requests answered with a 503')
+    parser.add_argument('--fixtures-dir', type=str, default=None,
+                        help='recorded responses, synthetic ones are used '
+                             'when not provided')
+    parser.add_argument('--transport', type=str, default='http',
+                        choices=['http', 'fixtures'],
+                        help="'fixtures' answers the runs from synthetic "
+                             "fixtures on disk instead of the fake server")
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='scenario to run, may be repeated, runs all '
+                             'when not provided')
+    parser.add_argument('--results', type=str, default=None,
+                        help='results file, defaults to '
+                             'benchmarks/results/<timestamp>.json')
+    parser.add_argument('extra_args', nargs=argparse.REMAINDER,
+                        help='arguments passed on to poke_maker.py after --')
+    arguments = parser.parse_args()
+    extra_args = [arg for arg in arguments.extra_args if arg != '--']
+
+    api = FakePokeAPI(latency=arguments.latency / 1000,
+                      jitter=arguments.jitter / 1000,
+                      error_rate=arguments.error_rate,
+                      fixtures_dir=arguments.fixtures_dir).start()
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'server': {'latency_ms': arguments.latency,
+                   'jitter_ms': arguments.jitter,
+                   'error_rate': arguments.error_rate},
+        'transport': arguments.transport,
+        'extra_args': extra_args,
+        'scenarios': {}
+    }
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            fixtures_dir = None
+            if arguments.transport == 'fixtures':
+                fixtures_dir = os.path.join(work_dir, 'fixtures')
+                fixtures.write_fixtures(fixtures_dir, range(
+                    1, max(ids for _, ids, _ in SCENARIOS.values()) + 1))
+            for name in arguments.scenario or list(SCENARIOS):
+                result = run_scenario(name, api, arguments.repeat,
+                                      extra_args, work_dir, fixtures_dir)
+                results['scenarios'][name] = result
+                latency = result['latency_seconds']
+                print(f'{name:<10} {result["objects_per_second"]:>9.1f} '
+                      f'obj/s  p50 {latency["p50"]:.3f}s  '
+                      f'p95 {latency["p95"]:.3f}s  '
+                      f'p99 {latency["p99"]:.3f}s  '
+                      f'rss {result["peak_rss_kb"]} KB  '
+                      f'threads {result["peak_threads"]}  '
+                      f'failed {result["failed_runs"]}/{arguments.repeat}')
+    finally:
+        api.stop()
+
+    path = arguments.results or os.path.join(
+        ROOT, 'benchmarks', 'results',
+        datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results saved to {path}')
+
+
+if __name__ == '__main__':
+    main()
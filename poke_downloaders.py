@@ -0,0 +1,263 @@
+"""
+Module contains the downloaders of the threads and processes engines. They
+take requests for PokedexObjects and get them with a PokedexMaker, keeping
+a bounded number of requests pending so any number of them can be run.
+"""
+import collections
+import concurrent.futures
+import contextlib
+import itertools
+import os
+
+from pokedex_maker import InvalidPokeObject, PokedexMaker
+from pokeretriever.instrumentation import metrics
+from pokeretriever.pokeretriever import RenderedObject
+from pokeretriever.resilience import FailedRequest, RequestFailed
+from pokeretriever.transport import RequestsTransport
+
+
+class PokeObjectDownloader:
+    """
+    PokeObjectDownloader takes requests for PokedexObjects and gets
+    them.
+    """
+
+    def __init__(self, pokedex_requests, max_workers: int,
+                 cache=None, scheduler=None, unordered: bool = False,
+                 snapshot=None, transport=None):
+        """
+        Initialize a PokeObjectDownloader.
+        Note: the max threads the downloader can use is the max request
+        objects it can process at a time. Each request object has a
+        parameter of how many threads it can use as well (multiplying
+        the threads total). Threads only wait on the scheduler though, so
+        the requests on the wire never go past its max_in_flight.
+        :param pokedex_requests: iterable of requests
+        :param max_workers: the max threads the downloader can use.
+        :param cache: ResponseCache or None to always use the network
+        :param scheduler: RequestScheduler every fetch goes through
+        :param unordered: bool, when True objects are yielded as soon as
+        they complete instead of in request order
+        :param snapshot: SnapshotStore answering every lookup offline, or
+        None
+        :param transport: the transport to send requests through, kept open
+        by its owner, e.g. a warm one kept by the serve mode, or None to
+        open a RequestsTransport for this download
+        """
+        self.pokedex_requests = pokedex_requests
+        self.max_workers = max_workers
+        self.cache = cache
+        self.scheduler = scheduler
+        self.unordered = unordered
+        self.snapshot = snapshot
+        self.transport = transport
+        self.failures = []  # FailedRequest of every request that failed
+
+    def download(self):
+        """
+        Processes each request, yielding PokeObjects as soon as they are
+        ready. At most 2 * max_workers requests are pending at a time, so
+        memory stays bounded however many requests there are. Requests that
+        fail are added to failures instead.
+        :return: generator of PokeObjects.
+        """
+        window = 2 * self.max_workers
+        requests_iter = iter(self.pokedex_requests)
+        with contextlib.nullcontext(self.transport) \
+                if self.transport is not None else RequestsTransport() \
+                as transport:
+            pokedex_maker = PokedexMaker(transport, self.cache,
+                                         self.scheduler, self.snapshot)
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+            try:
+                pending = collections.deque(
+                    executor.submit(self._execute, pokedex_maker, request)
+                    for request in itertools.islice(requests_iter, window))
+                while pending:
+                    if self.unordered:
+                        done, _ = concurrent.futures.wait(
+                            pending,
+                            return_when=concurrent.futures.FIRST_COMPLETED)
+                        pending = collections.deque(
+                            future for future in pending
+                            if future not in done)
+                    else:
+                        done = [pending.popleft()]
+                    for future in done:
+                        for request in itertools.islice(requests_iter, 1):
+                            pending.append(executor.submit(
+                                self._execute, pokedex_maker, request))
+                        result = future.result()
+                        if isinstance(result, FailedRequest):
+                            self.failures.append(result)
+                        else:
+                            yield result
+            finally:
+                executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _execute(pokedex_maker, pokedex_request):
+        """
+        Helper method to run a request, turning the failures of that one
+        request into its outcome so the rest of the batch carries on.
+        :param pokedex_maker: PokedexMaker
+        :param pokedex_request: PokedexRequest
+        :return: PokedexObject or FailedRequest
+        """
+        try:
+            return pokedex_maker.execute_request(pokedex_request)
+        except (InvalidPokeObject, RequestFailed) as e:
+            metrics.count('failed_requests')
+            return FailedRequest(pokedex_request.mode,
+                                 pokedex_request.name_or_id, e)
+
+
+class ProcessPokeObjectDownloader:
+    """
+    ProcessPokeObjectDownloader runs requests as a pipeline: I/O threads
+    only fetch the lean response bodies, and a pool of processes parses,
+    builds and renders them in batches, so the CPU bound part scales with
+    the cores instead of sharing one interpreter with the fetching.
+    """
+
+    def __init__(self, pokedex_requests, max_workers: int, processes: int,
+                 batch_size: int, render: str = 'text', cache=None,
+                 scheduler=None, unordered: bool = False, snapshot=None,
+                 transport=None):
+        """
+        Initialize a ProcessPokeObjectDownloader.
+        :param pokedex_requests: iterable of requests
+        :param max_workers: the max I/O threads fetching bodies
+        :param processes: int, the size of the process pool, or None for
+        one process per core
+        :param batch_size: int, max requests handed to a process at once
+        :param render: str, 'text' to render what write_to() writes or
+        'data' to render what to_dict() returns
+        :param cache: ResponseCache or None to always use the network
+        :param scheduler: RequestScheduler every fetch goes through
+        :param unordered: bool, when True objects are yielded as soon as
+        they complete instead of in request order
+        :param snapshot: SnapshotStore answering every lookup offline, or
+        None
+        :param transport: the transport to send requests through, kept open
+        by its owner, or None to open a RequestsTransport for this download
+        """
+        self.pokedex_requests = pokedex_requests
+        self.max_workers = max_workers
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.render = render
+        self.cache = cache
+        self.scheduler = scheduler
+        self.unordered = unordered
+        self.snapshot = snapshot
+        self.transport = transport
+        self.failures = []  # FailedRequest of every request that failed
+
+    def download(self):
+        """
+        Fetches the bodies of each request and renders them in batches,
+        yielding RenderedObjects as soon as their batch is done. At most
+        2 * max_workers fetches and 2 * processes batches are pending at a
+        time, so memory stays bounded however many requests there are.
+        Requests that fail are added to failures instead, once the objects
+        of the requests before them were yielded.
+        :return: generator of RenderedObjects.
+        """
+        window = 2 * self.max_workers
+        max_batches = 2 * self.processes
+        requests_iter = iter(self.pokedex_requests)
+        with contextlib.nullcontext(self.transport) \
+                if self.transport is not None else RequestsTransport() \
+                as transport:
+            pokedex_maker = PokedexMaker(transport, self.cache,
+                                         self.scheduler, self.snapshot)
+            fetch_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+            render_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.processes)
+            try:
+                fetches = collections.deque(
+                    fetch_pool.submit(self._fetch, pokedex_maker, request)
+                    for request in itertools.islice(requests_iter, window))
+                batches = collections.deque()
+                batch = []
+                while fetches or batch or batches:
+                    if fetches:
+                        if self.unordered:
+                            done, _ = concurrent.futures.wait(
+                                fetches,
+                                return_when=concurrent.futures.FIRST_COMPLETED)
+                            fetches = collections.deque(
+                                future for future in fetches
+                                if future not in done)
+                        else:
+                            done = [fetches.popleft()]
+                        for future in done:
+                            for request in itertools.islice(requests_iter, 1):
+                                fetches.append(fetch_pool.submit(
+                                    self._fetch, pokedex_maker, request))
+                            batch.append(future.result())
+                    # a batch is handed off when full or nothing else comes,
+                    # its failures stay in the main process in their place
+                    if batch and (len(batch) >= self.batch_size
+                                  or not fetches):
+                        batches.append((render_pool.submit(
+                            self.render_batch,
+                            [result for result in batch
+                             if not isinstance(result, FailedRequest)],
+                            self.render), batch))
+                        batch = []
+                    while batches and (not fetches or batches[0][0].done()
+                                       or len(batches) > max_batches):
+                        future, results = batches.popleft()
+                        with metrics.phase('render_wait'):
+                            rendered = iter(future.result())
+                        for result in results:
+                            if isinstance(result, FailedRequest):
+                                self.failures.append(result)
+                            else:
+                                yield RenderedObject(*next(rendered))
+            finally:
+                fetch_pool.shutdown(cancel_futures=True)
+                render_pool.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _fetch(pokedex_maker, pokedex_request):
+        """
+        Helper method to fetch the bodies of a request, turning the
+        failures of that one request into its outcome so the rest of the
+        batch carries on.
+        :param pokedex_maker: PokedexMaker
+        :param pokedex_request: PokedexRequest
+        :return: tuple of the mode, body and section bodies, or
+        FailedRequest
+        """
+        try:
+            body, section_bodies = pokedex_maker.fetch_bodies(pokedex_request)
+        except (InvalidPokeObject, RequestFailed) as e:
+            metrics.count('failed_requests')
+            return FailedRequest(pokedex_request.mode,
+                                 pokedex_request.name_or_id, e)
+        return pokedex_request.mode, body, section_bodies
+
+    @staticmethod
+    def render_batch(batch: list, render: str) -> list:
+        """
+        Builds and renders a batch of fetched requests, run in a worker
+        process.
+        :param batch: list of tuples of the mode, body and section bodies
+        :param render: str, 'text' or 'data'
+        :return: list of tuples of the text and the data of each object,
+        the one that was not rendered is None
+        """
+        rendered = []
+        for mode, body, section_bodies in batch:
+            pokedex = PokedexMaker.build_from_bodies(mode, body,
+                                                     section_bodies)
+            if render == 'text':
+                rendered.append((pokedex._render(), None))
+            else:
+                rendered.append((None, pokedex.to_dict()))
+        return rendered
@@ -1,14 +1,23 @@
 """
 This module if for Creating and displaying or saving information about
 Pokemon.
+
+Only what parsing the command line needs is imported up front. The
+makers, engines, cache, server and the rest are imported by the Driver
+on the code paths that use them, so --help and small lookups start fast.
 """
+import abc
 import argparse
-import requests
-import concurrent.futures
-import multiprocessing
+import collections
+import functools
+import json
+import os
+import re
 import sys
-from pokedex_maker import InvalidPokeObject, PokedexMaker
-from pokeretriever.pokeretriever import *
+from pokeretriever.pokeretriever import PokedexRequest, expanded_sections
+
+# the address of the poke_maker server when --server is not given
+DEFAULT_ADDRESS = 'http://127.0.0.1:8766'
 
 
 class Arguments:
@@ -17,7 +26,28 @@ class Arguments:
     """
 
     def __init__(self, mode: str, input_data: str, expanded: bool,
-                 input_file: str = None, output_file: str = None):
+                 input_file: str = None, output_file: str = None,
+                 cache_dir: str = '.pokecache', cache_ttl: float = 86400,
+                 cache_max_size: int = 256, no_cache: bool = False,
+                 engine: str = 'threads', workers: int = 8,
+                 expand_threads: int = 4, max_in_flight: int = 16,
+                 rate_limit: float = None, unordered: bool = False,
+                 dedupe_window: int = 100000, snapshot: str = None,
+                 output_format: str = 'text',
+                 api_url: str = 'https://pokeapi.co/api/v2',
+                 stats: bool = False, stats_json: str = None,
+                 profile: str = None, retries: int = 3,
+                 errors_file: str = None, server: str = None,
+                 expand: str = None, lazy: bool = False,
+                 processes: int = None, batch_size: int = 32,
+                 transport: str = 'http', fixtures_dir: str = None,
+                 connect_timeout: float = None,
+                 read_timeout: float = None,
+                 refresh: bool = False, prefetch: int = 0,
+                 prefetch_wait: float = 5.0, shards: int = 1,
+                 shard_index: int = None, shard_dir: str = None,
+                 merge_shards: bool = False, where: list = None,
+                 find: str = 'pokemon', index: str = None):
         """
         Initialize a Arguments.
         :param mode string
@@ -26,12 +56,119 @@ class Arguments:
         :param expanded bool
         :param input_file str, name relative path of the input file
         :param output_file, str, data of the output file
+        :param cache_dir, str, directory of the response cache
+        :param cache_ttl, float, seconds before a cached response is
+        revalidated
+        :param cache_max_size, int, max size of the response cache in MB
+        :param no_cache, bool, when True the response cache is not used
+        :param engine, str, 'threads', 'async' or 'processes', how requests
+        are run
+        :param workers, int, max top level requests processed at once by
+        the threads and processes engines
+        :param expand_threads, int, max threads each expanded request
+        fetches its sub-resources with
+        :param max_in_flight, int, max requests on the wire at once, for
+        every engine
+        :param rate_limit, float, max requests started per second or None
+        :param unordered, bool, when True objects are reported in the order
+        they complete instead of the input order
+        :param dedupe_window, int, how many recent input ids are remembered
+        to skip duplicates
+        :param snapshot, str, path of the snapshot file written in snapshot
+        mode or used to answer the other modes offline
+        :param output_format, str, 'text', 'ndjson', 'json' or 'csv'
+        :param api_url, str, base url of the PokeAPI server
+        :param stats, bool, when True a summary of the run statistics is
+        printed to stderr
+        :param stats_json, str, path the run statistics are written to as
+        JSON, or None
+        :param profile, str, path a cProfile dump of the run is written to,
+        or None
+        :param retries, int, how many times a transient failure is retried
+        :param errors_file, str, path the failed requests are written to as
+        NDJSON, or None to print them to stderr
+        :param server, str, address the serve mode listens on, and the
+        other modes forward their requests to when a server answers there
+        :param expand, str, comma separated Pokemon sections to expand, e.g.
+        'abilities,stats', or None to go by expanded
+        :param lazy, bool, when True expanded Pokemon sections are only
+        fetched when they are rendered
+        :param processes, int, size of the process pool of the processes
+        engine, or None for one process per core
+        :param batch_size, int, max objects the processes engine hands to
+        a process at once
+        :param transport, str, 'http' to send requests to the api url or
+        'fixtures' to answer them from fixtures_dir
+        :param fixtures_dir, str, directory of recorded responses laid out
+        as <kind>/<name or id>.json
+        :param connect_timeout, float, seconds to wait for a connection,
+        None for the default of the transport
+        :param read_timeout, float, seconds to wait for each read, None for
+        the default of the transport
+        :param refresh, bool, when True the output file is refreshed
+        through its manifest, re-fetching only what changed
+        :param prefetch, int, max related resources prefetched into the
+        response cache, 0 to not prefetch
+        :param prefetch_wait, float, seconds the prefetches may still run
+        once the report is written
+        :param shards, int, how many shards the input is split across, 1 to
+        not shard the run
+        :param shard_index, int, the shard this run makes, written to its
+        shard file, or None to run and merge every shard
+        :param shard_dir, str, directory of the shard files, or None for a
+        temporary one
+        :param merge_shards, bool, when True the shard files already in
+        shard_dir are merged without running the shards
+        :param where, list of str, the clauses of the query mode, e.g.
+        'ability=overgrow' or 'move.power>=80'
+        :param find, str, 'pokemon', 'ability' or 'move', the kind the
+        query mode looks for
+        :param index, str, path of the index file of the query mode, or
+        None for one in cache_dir
         """
         self.mode = mode
         self.input_data = input_data
         self.expanded = expanded
         self.input_file = input_file
         self.output_file = output_file
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.cache_max_size = cache_max_size
+        self.no_cache = no_cache
+        self.engine = engine
+        self.workers = workers
+        self.expand_threads = expand_threads
+        self.max_in_flight = max_in_flight
+        self.rate_limit = rate_limit
+        self.unordered = unordered
+        self.dedupe_window = dedupe_window
+        self.snapshot = snapshot
+        self.output_format = output_format
+        self.api_url = api_url
+        self.stats = stats
+        self.stats_json = stats_json
+        self.profile = profile
+        self.retries = retries
+        self.errors_file = errors_file
+        self.server = server
+        self.expand = expand
+        self.lazy = lazy
+        self.processes = processes
+        self.batch_size = batch_size
+        self.transport = transport
+        self.fixtures_dir = fixtures_dir
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.refresh = refresh
+        self.prefetch = prefetch
+        self.prefetch_wait = prefetch_wait
+        self.shards = shards
+        self.shard_index = shard_index
+        self.shard_dir = shard_dir
+        self.merge_shards = merge_shards
+        self.where = where
+        self.find = find
+        self.index = index
 
     def __str__(self):
         """Returns the current state of the request"""
@@ -43,38 +180,289 @@ class ArgumentParser:
     ArgumentParser deals with commandline arguments.
     """
 
-    @classmethod
-    def setup_commandline_request(cls):
+    @staticmethod
+    def _make_parser() -> argparse.ArgumentParser:
         """
-        Reads and verifies that the proper commandline arguments where
-        provided and creates a creates a Request object using values.
-        :return: Request Object
+        Helper method to create the parser of the command line.
+        :return: argparse.ArgumentParser
         """
         parser = argparse.ArgumentParser()
 
         parser.add_argument('mode', type=str,
-                            choices=["pokemon", "ability", "move"],
+                            choices=["pokemon", "ability", "move",
+                                     "snapshot", "serve", "query"],
                             help="The mode to get information about the "
                                  "pokemon, Can be one of: 'pokemon', "
-                                 "'ability', or 'move')")
-        input_group = parser.add_mutually_exclusive_group(required=True)
+                                 "'ability', or 'move'), 'snapshot' to "
+                                 "download every pokemon, ability, move and "
+                                 "stat into the --snapshot file, 'serve' "
+                                 "to answer the lookups of other runs on "
+                                 "--server, or 'query' to report the "
+                                 "--find kind matching every --where "
+                                 "clause, from what was fetched before")
+        input_group = parser.add_mutually_exclusive_group()
         input_group.add_argument('--inputfile', type=str, dest='input_file',
                                  help="The name/relative path of the input "
-                                      "file.")
+                                      "file. Each line is an input spec like "
+                                      "--inputdata takes")
         input_group.add_argument('--inputdata', type=str, dest='input_data',
                                  help="data of the intended request. usually "
                                       "the name or the id of the object "
-                                      "being queried")
+                                      "being queried, or a comma separated "
+                                      "list of names, ids, id ranges like "
+                                      "1-151 and 'all' for every one")
         parser.add_argument('--expanded', action='store_true',
                             help='When provided, certain attributes are '
                                  'expanded')
+        parser.add_argument('--expand', '--fields', type=str, dest='expand',
+                            help='comma separated Pokemon sections to '
+                                 'expand, some of stats, abilities and '
+                                 'moves, e.g. abilities,stats. Only their '
+                                 'sub-resources are fetched')
+        parser.add_argument('--lazy', action='store_true',
+                            help='When provided, expanded Pokemon sections '
+                                 'are only fetched when they are rendered, '
+                                 'ignored by the async engine')
+        parser.add_argument('--refresh', action='store_true',
+                            help='When provided, the output file is patched '
+                                 'instead of rebuilt: a manifest next to it '
+                                 'remembers what it was made of, unchanged '
+                                 'objects are revalidated with conditional '
+                                 'requests and only changed or new ones are '
+                                 'fetched again. Requires --output and the '
+                                 'text or ndjson format')
         parser.add_argument('--output', type=str, dest='output_file',
                             help='the output file name')
+        parser.add_argument('--format', type=str, dest='output_format',
+                            default='text',
+                            choices=['text', 'ndjson', 'json', 'csv'],
+                            help="the report format, 'text' is the human "
+                                 "readable report, the others are for "
+                                 "other tools")
+        parser.add_argument('--cache-dir', type=str, default='.pokecache',
+                            help='directory of the persistent response '
+                                 'cache')
+        parser.add_argument('--cache-ttl', type=float, default=86400,
+                            help='seconds a cached response is used before '
+                                 'it is revalidated with the server')
+        parser.add_argument('--cache-max-size', type=int, default=256,
+                            help='max size of the response cache in MB, '
+                                 'least recently used responses are evicted '
+                                 'first')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='When provided, the response cache is not '
+                                 'used')
+        parser.add_argument('--engine', type=str, default='threads',
+                            choices=['threads', 'async', 'processes'],
+                            help="How requests are run: 'threads' uses "
+                                 "thread pools and requests, 'async' runs "
+                                 "every request as a coroutine on one "
+                                 "event loop (requires aiohttp), "
+                                 "'processes' fetches with threads and "
+                                 "parses and renders in a process pool")
+        parser.add_argument('--workers', type=int, default=8,
+                            help='max number of top level requests the '
+                                 'threads and processes engines fetch at '
+                                 'once')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='size of the process pool of the processes '
+                                 'engine, one per core when not provided')
+        parser.add_argument('--batch-size', type=int, default=32,
+                            help='max number of objects the processes '
+                                 'engine hands to a process at once')
+        parser.add_argument('--expand-threads', type=int, default=4,
+                            help='max number of threads each expanded '
+                                 'request fetches its stats, abilities and '
+                                 'moves with')
+        parser.add_argument('--max-in-flight', type=int, default=16,
+                            help='max number of requests on the wire at '
+                                 'once, across every thread or coroutine')
+        parser.add_argument('--rate-limit', type=float, default=None,
+                            help='max number of requests started per '
+                                 'second, unlimited when not provided')
+        parser.add_argument('--prefetch', type=int, default=0, metavar='N',
+                            help='prefetch up to N resources the results '
+                                 'reference (the abilities and moves of a '
+                                 'Pokemon, the Pokemon of an ability) into '
+                                 'the response cache, with spare request '
+                                 'slots, so follow-up queries hit warm data')
+        parser.add_argument('--prefetch-wait', type=float, default=5.0,
+                            help='seconds the prefetches may still run once '
+                                 'the report is written, the rest is '
+                                 'cancelled')
+        parser.add_argument('--unordered', action='store_true',
+                            help='When provided, results are reported as '
+                                 'soon as they complete instead of in input '
+                                 'order')
+        parser.add_argument('--dedupe-window', type=int, default=100000,
+                            help='how many recent ids of the input file are '
+                                 'remembered to skip duplicate ids')
+        parser.add_argument('--snapshot', type=str,
+                            help='snapshot file written by the snapshot '
+                                 'mode, the other modes answer every lookup '
+                                 'from it without the network')
+        parser.add_argument('--api-url', type=str,
+                            default='https://pokeapi.co/api/v2',
+                            help='base url of the PokeAPI server, e.g. a '
+                                 'local mirror')
+        parser.add_argument('--stats', action='store_true',
+                            help='When provided, prints per phase timings, '
+                                 'request counts, bytes downloaded, cache '
+                                 'hits and queue waits to stderr')
+        parser.add_argument('--stats-json', type=str,
+                            help='file the run statistics are written to as '
+                                 'JSON')
+        parser.add_argument('--profile', type=str,
+                            help='file a cProfile dump of the run is written '
+                                 'to, only the main thread is profiled so '
+                                 'use it with --engine async to see the '
+                                 'whole pipeline')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='how many times connection errors, '
+                                 'timeouts and 429/5xx responses are retried '
+                                 'with exponential backoff')
+        parser.add_argument('--errors-file', type=str,
+                            help='file the failed requests are written to as '
+                                 'NDJSON, they are printed to stderr when not '
+                                 'provided')
+        parser.add_argument('--server', type=str,
+                            default=os.environ.get('POKE_MAKER_SERVER'),
+                            help='address of a poke_maker server, e.g. '
+                                 f'{DEFAULT_ADDRESS} or unix:/tmp/poke.sock. '
+                                 'The serve mode listens on it, the other '
+                                 'modes forward their requests to it when it '
+                                 'is running. Defaults to $POKE_MAKER_SERVER')
+        parser.add_argument('--transport', type=str, default='http',
+                            choices=['http', 'fixtures'],
+                            help="How requests are answered: 'http' sends "
+                                 "them to --api-url with a connection pool "
+                                 "of --max-in-flight connections, "
+                                 "'fixtures' answers them from "
+                                 "--fixtures-dir")
+        parser.add_argument('--fixtures-dir', type=str,
+                            help='directory of recorded responses laid out '
+                                 'as <kind>/<name or id>.json, for the '
+                                 'fixtures transport')
+        parser.add_argument('--connect-timeout', type=float,
+                            help='seconds to wait for a connection before '
+                                 'the attempt fails and is retried, 5 by '
+                                 'default')
+        parser.add_argument('--read-timeout', type=float,
+                            help='seconds to wait for each read of a '
+                                 'response before the attempt fails and is '
+                                 'retried, 30 by default')
+        parser.add_argument('--shards', type=int, default=1, metavar='N',
+                            help='split the input across N poke_maker.py '
+                                 'processes running at once, each writing a '
+                                 'shard file to --shard-dir, and merge them '
+                                 'into the report in input order')
+        parser.add_argument('--shard-index', type=int, metavar='I',
+                            help='only make shard I (0 to N - 1) of the '
+                                 '--shards, into its shard file, e.g. on '
+                                 'another machine sharing --shard-dir')
+        parser.add_argument('--shard-dir', type=str,
+                            help='directory of the shard files, a '
+                                 'temporary one when not provided')
+        parser.add_argument('--merge-shards', action='store_true',
+                            help='When provided, the shard files already in '
+                                 '--shard-dir are merged into the report '
+                                 'without running the shards')
+        parser.add_argument('--where', type=str, action='append',
+                            metavar='CLAUSE',
+                            help='a clause the query mode matches, e.g. '
+                                 'ability=overgrow, type=grass, '
+                                 'move.type=fire or move.power>=80, '
+                                 'repeat it to match every clause. The move '
+                                 'clauses must hold for the same move')
+        parser.add_argument('--find', type=str, default='pokemon',
+                            choices=['pokemon', 'ability', 'move'],
+                            help='the kind the query mode looks for')
+        parser.add_argument('--index', type=str,
+                            help="index file of the query mode, kept up to "
+                                 "date with the response cache and "
+                                 "--snapshot, 'index.sqlite3' in "
+                                 "--cache-dir when not provided or "
+                                 "':memory:' to build it for one run")
+        return parser
 
+    @classmethod
+    def setup_commandline_request(cls):
+        """
+        Reads and verifies that the proper commandline arguments where
+        provided and creates a creates a Request object using values.
+        :return: Request Object
+        """
+        parser = cls._make_parser()
         kwarg = vars(parser.parse_args())
+        if kwarg['mode'] == 'snapshot':
+            if kwarg['snapshot'] is None:
+                parser.error('the snapshot mode requires --snapshot')
+        elif kwarg['mode'] == 'serve':
+            if kwarg['server'] is None:
+                kwarg['server'] = DEFAULT_ADDRESS
+        elif kwarg['mode'] == 'query':
+            from pokeretriever.index import Clause
+
+            if not kwarg['where']:
+                parser.error('the query mode requires --where')
+            try:
+                for clause in kwarg['where']:
+                    Clause.parse(clause)
+            except ValueError as e:
+                parser.error(f'argument --where: {e}')
+        elif kwarg['input_file'] is None and kwarg['input_data'] is None \
+                and not kwarg['merge_shards']:
+            parser.error('one of the arguments --inputfile --inputdata is '
+                         'required')
+        if kwarg['refresh']:
+            from poke_refresh import REFRESH_FORMATS
+
+            if kwarg['output_file'] is None \
+                    or kwarg['output_format'] not in REFRESH_FORMATS \
+                    or kwarg['snapshot'] is not None \
+                    or kwarg['mode'] == 'query':
+                parser.error('--refresh requires --output, the text or '
+                             'ndjson format, no --snapshot and another '
+                             'mode than query')
+        if kwarg['shards'] < 1 or kwarg['shard_index'] is not None and (
+                not 0 <= kwarg['shard_index'] < kwarg['shards']
+                or kwarg['shard_dir'] is None):
+            parser.error('--shard-index must be from 0 to --shards - 1 and '
+                         'requires --shard-dir')
+        if kwarg['merge_shards'] and kwarg['shard_dir'] is None:
+            parser.error('--merge-shards requires --shard-dir')
+        if kwarg['shards'] > 1 and (kwarg['mode'] in ('snapshot', 'serve',
+                                                      'query')
+                                    or kwarg['refresh']
+                                    or kwarg['unordered']):
+            parser.error('--shards cannot be used with the snapshot, serve '
+                         'and query modes, --refresh or --unordered')
+        if kwarg['transport'] == 'fixtures' and (
+                kwarg['fixtures_dir'] is None
+                or not os.path.isdir(kwarg['fixtures_dir'])):
+            parser.error('the fixtures transport requires an existing '
+                         '--fixtures-dir')
+        try:
+            expanded_sections(kwarg['expand'])
+        except ValueError as e:
+            parser.error(f'argument --expand: {e}')
         req = Arguments(**kwarg)
         return req
 
+    @classmethod
+    def option_strings(cls) -> list:
+        """
+        Gets the option strings of the command line, e.g. to tell the
+        abbreviations of the options in sys.argv.
+        :return: list of str
+        """
+        return [option for action in cls._make_parser()._actions
+                for option in action.option_strings]
+
+
+# an input spec range of ids, e.g. 1-151
+ID_RANGE = re.compile(r'(\d+)-(\d+)')
+
 
 class Driver:
     """
@@ -91,6 +479,7 @@ class Driver:
         """
         self.pokedex_objects = None  # PokedexObject
         self.arguments = None  # Arguments
+        self.list_transport = None  # transport resolving 'all'
 
     def start(self):
         """
@@ -98,55 +487,624 @@ class Driver:
         data in specified format.
         """
         self.arguments = ArgumentParser.setup_commandline_request()
+        from pokeretriever.instrumentation import metrics, timed_iter
+        from pokeretriever.resilience import RequestFailed
+
+        if self.arguments.stats or self.arguments.stats_json is not None:
+            metrics.enable()
+        if self.arguments.mode == 'snapshot':
+            self._make_snapshot()
+            return
+        if self.arguments.mode == 'serve':
+            self._serve()
+            return
+        if self.arguments.shards > 1 and self.arguments.shard_index is None:
+            self._run_shards()
+            return
+
+        snapshot = None
+        if self.arguments.snapshot is not None:
+            from pokeretriever.snapshot import SnapshotStore
+
+            try:
+                snapshot = SnapshotStore(self.arguments.snapshot)
+            except FileNotFoundError:
+                print(f'Could not find the snapshot '
+                      f'"{self.arguments.snapshot}", create it with the '
+                      f'snapshot mode')
+                sys.exit(1)
 
-        if self.arguments.input_file is not None:
+        input_file = None
+        if self.arguments.mode == 'query':
+            # the matches are reported like an input of the kind found
+            lines = self._query(snapshot)
+            self.arguments.mode = self.arguments.find
+        elif self.arguments.input_file is not None:
             try:
-                name_id_list = self._get_name_id_list(
-                    self.arguments.input_file)
+                input_file = open(self.arguments.input_file, mode='r',
+                                  encoding='utf-8')
             except FileNotFoundError:
                 print("Could not find your file "
                       ":( ensure it is at project level")
                 sys.exit(1)
+            lines = input_file
         else:
-            name_id_list = [self.arguments.input_data]
-        pokedex_requests = []
-        # append requests to list
-        for name_id in name_id_list:
-            pokedex_requests.append(PokedexRequest(
-                self.arguments.mode,
-                name_id,
-                self.arguments.expanded,
-                4  # number of threads each request can expand to
-            ))
-        # download the objects
-        downloader = PokeObjectDownloader(pokedex_requests,
-                                          multiprocessing.cpu_count())
+            lines = [self.arguments.input_data]
+        name_ids = self._iter_name_ids(
+            lines, self.arguments.dedupe_window,
+            functools.partial(self._list_ids, self.arguments.mode, snapshot))
+        # --expand picks the sections, --expanded expands all of them
+        expanded = self.arguments.expand \
+            if self.arguments.expand is not None else self.arguments.expanded
+        seqs = collections.deque()  # input positions of the shard's requests
+        if self.arguments.shard_index is not None:
+            name_ids = self._take_shard(name_ids, seqs)
+        if self.arguments.refresh:
+            try:
+                failures = self._refresh(name_ids, expanded)
+            finally:
+                if input_file is not None:
+                    input_file.close()
+                self._report_stats()
+            if failures:
+                self._report_failures(failures)
+                sys.exit(2)
+            return
+        # requests are created lazily as the downloader has room for them
+        pokedex_requests = (PokedexRequest(
+            self.arguments.mode,
+            name_id,
+            expanded,
+            self.arguments.expand_threads,
+            self.arguments.lazy
+        ) for name_id in name_ids)
+        # download the objects, through a running server when there is one,
+        # the shards do it themselves to keep their failures in place
+        server = self.arguments.server \
+            if self.arguments.shard_index is None else None
+        cache = None
+        sync_transport = None  # closed here, the async engine closes its own
+        prefetcher = None
+        remote = False
+        if server is not None:
+            from poke_server import RemotePokeObjectDownloader
+
+            remote = RemotePokeObjectDownloader.is_running(server)
+        if remote:
+            downloader = RemotePokeObjectDownloader(pokedex_requests, server,
+                                                    self.arguments.unordered)
+            # the errors writing the report can raise
+            errors = (RequestFailed,)
+            missing = ()
+        else:
+            from pokedex_maker import InvalidPokeObject
+            from pokeretriever.scheduler import RequestScheduler
+            from pokeretriever.transport import ClientMissing
+
+            if server is not None:
+                print(f'No poke_maker server is running on {server}, '
+                      f'looking up locally', file=sys.stderr)
+            maker = self._maker()
+            errors = (InvalidPokeObject, RequestFailed)
+            # only raised when a lookup needs the network, runs answered
+            # from a snapshot or the cache do not need the HTTP client
+            missing = (ClientMissing,)
+            cache = self._make_cache() if snapshot is None else None
+            scheduler = RequestScheduler(self.arguments.max_in_flight,
+                                         self.arguments.rate_limit)
+            if self.arguments.engine == 'async':
+                from async_pokedex_maker import AsyncPokedexMaker, \
+                    AsyncPokeObjectDownloader
+
+                AsyncPokedexMaker.base_url = maker.base_url
+                AsyncPokedexMaker.retry_policy = maker.retry_policy
+                downloader = AsyncPokeObjectDownloader(
+                    pokedex_requests, scheduler, cache,
+                    self.arguments.unordered, snapshot,
+                    self._make_transport(asynchronous=True))
+            elif self.arguments.engine == 'processes':
+                from poke_downloaders import ProcessPokeObjectDownloader
+
+                sync_transport = self._make_transport()
+                downloader = ProcessPokeObjectDownloader(
+                    pokedex_requests, self.arguments.workers,
+                    self.arguments.processes, self.arguments.batch_size,
+                    'text' if self.arguments.output_format == 'text'
+                    else 'data', cache, scheduler,
+                    self.arguments.unordered, snapshot, sync_transport)
+            else:
+                from poke_downloaders import PokeObjectDownloader
+
+                sync_transport = self._make_transport()
+                downloader = PokeObjectDownloader(pokedex_requests,
+                                                  self.arguments.workers,
+                                                  cache, scheduler,
+                                                  self.arguments.unordered,
+                                                  snapshot, sync_transport)
+            prefetcher = self._make_prefetcher(cache)
+            if prefetcher is not None and sync_transport is None:
+                # prefetches run on threads through PokedexMaker, which the
+                # async engine does not set up
+                sync_transport = self._make_transport()
+                maker(sync_transport, cache, scheduler)
+        # objects are downloaded while the report consumes them
+        self.pokedex_objects = timed_iter('download', downloader.download())
+        if prefetcher is not None:
+            self.pokedex_objects = prefetcher.follow(
+                self.pokedex_objects, self.arguments.prefetch_wait)
+        shard_writer = None
+        if self.arguments.shard_index is not None:
+            from poke_shards import ShardWriter
+
+            shard_writer = ShardWriter(
+                self.arguments.shard_dir, self.arguments.shards,
+                self.arguments.shard_index,
+                'text' if self.arguments.output_format == 'text' else 'data')
+        else:
+            report = Report(self.pokedex_objects, self._make_formatter())
+        profiler = self._make_profiler()
         try:
-            self.pokedex_objects = downloader.download()
-        except InvalidPokeObject as e:
+            if profiler is not None:
+                profiler.enable()
+            if shard_writer is not None:
+                shard_writer.write(self.pokedex_objects, downloader.failures,
+                                   seqs)
+            else:
+                report.export()
+        except errors as e:
+            # only lazy sections fail while the report is being written
             print(e)
             sys.exit(2)
+        except missing as e:
+            print(f'The {self.arguments.engine} engine is not available: {e}')
+            sys.exit(1)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.arguments.profile)
+            self.pokedex_objects.close()
+            if sync_transport is not None:
+                sync_transport.close()
+            if self.list_transport is not None:
+                self.list_transport.close()
+            if input_file is not None:
+                input_file.close()
+            if cache is not None:
+                cache.close()
+            if snapshot is not None:
+                snapshot.close()
+            self._report_stats()
+        if shard_writer is not None:
+            # the failures are in the shard file, the merge reports them
+            print(shard_writer, file=sys.stderr)
+            return
+        # the report holds every object that could be made, the rest is
+        # listed separately and makes the exit status non zero
+        if downloader.failures:
+            self._report_failures(downloader.failures)
+            sys.exit(2)
+
+    def _make_profiler(self):
+        """
+        Helper method to create the profiler of the run when --profile was
+        given.
+        :return: cProfile.Profile or None
+        """
+        if self.arguments.profile is None:
+            return None
+        import cProfile
+
+        return cProfile.Profile()
+
+    def _maker(self):
+        """
+        Helper method to import the PokedexMaker facade on the code paths
+        that look resources up in this process, pointed at the api url and
+        with the retry policy of the arguments.
+        :return: the PokedexMaker class
+        """
+        from pokedex_maker import PokedexMaker
+        from pokeretriever.resilience import RetryPolicy
+
+        PokedexMaker.base_url = self.arguments.api_url.rstrip('/')
+        PokedexMaker.retry_policy = RetryPolicy(self.arguments.retries)
+        return PokedexMaker
+
+    def _report_failures(self, failures: list):
+        """
+        Helper method to write the failed requests to the errors file, or
+        to stderr when there is none.
+        :param failures: list of FailedRequest
+        """
+        if self.arguments.errors_file is not None:
+            with open(self.arguments.errors_file, mode='w',
+                      encoding='utf-8') as file:
+                for failure in failures:
+                    file.write(json.dumps(failure.to_dict()) + '\n')
+            print(f'{len(failures)} request(s) failed, see '
+                  f'{self.arguments.errors_file}', file=sys.stderr)
+            return
+        print(f'Errors ({len(failures)} request(s) failed)', file=sys.stderr)
+        for failure in failures:
+            print(failure, file=sys.stderr)
+
+    def _report_stats(self):
+        """
+        Helper method to print and save the run statistics when they were
+        asked for.
+        """
+        from pokeretriever.instrumentation import metrics
 
-        if self.arguments.output_file is not None:
-            file_reporter = TextFileReporter(self.arguments.output_file)
-            report = Report(self.pokedex_objects, file_reporter.make_report)
-            report.export()
+        if not metrics.enabled:
+            return
+        if self.arguments.stats:
+            print(metrics.summary(), file=sys.stderr)
+        if self.arguments.stats_json is not None:
+            with open(self.arguments.stats_json, mode='w',
+                      encoding='utf-8') as file:
+                json.dump(metrics.to_dict(), file, indent=2)
+
+    def _make_formatter(self):
+        """
+        Helper method to pick the report strategy from the output format
+        and output file arguments.
+        :return: a make_report method
+        """
+        data_reporters = {
+            'ndjson': NDJSONReporter,
+            'json': JSONReporter,
+            'csv': CSVReporter
+        }
+        if self.arguments.output_format in data_reporters:
+            reporter = data_reporters[self.arguments.output_format](
+                self.arguments.output_file)
+        elif self.arguments.output_file is not None:
+            reporter = TextFileReporter(self.arguments.output_file)
         else:
-            terminal_reporter = TerminalReporter()
-            report = Report(self.pokedex_objects,
-                            terminal_reporter.make_report)
-            report.export()
+            reporter = TerminalReporter()
+        return reporter.make_report
+
+    def _make_snapshot(self):
+        """
+        Downloads every pokemon, ability, move and stat into the snapshot
+        file. The snapshot is written next to its final path and only
+        replaces an older snapshot once it is complete.
+        """
+        from pokedex_maker import InvalidPokeObject
+        from pokeretriever.resilience import RequestFailed
+        from pokeretriever.scheduler import RequestScheduler
+        from pokeretriever.snapshot import SnapshotStore
+
+        maker = self._maker()
+        partial_path = f'{self.arguments.snapshot}.part'
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        cache = self._make_cache()
+        scheduler = RequestScheduler(self.arguments.max_in_flight,
+                                     self.arguments.rate_limit)
+        try:
+            with self._make_transport() as transport, \
+                    SnapshotStore(partial_path, read_only=False) as snapshot:
+                maker(transport, cache, scheduler)
+                counts = maker.download_snapshot(
+                    snapshot, max_workers=self.arguments.workers)
+        except (InvalidPokeObject, RequestFailed) as e:
+            print(e)
+            os.remove(partial_path)
+            sys.exit(2)
+        finally:
+            if cache is not None:
+                cache.close()
+        os.replace(partial_path, self.arguments.snapshot)
+        print(f'Snapshot {self.arguments.snapshot}: ' +
+              ', '.join(f'{count} {kind}' for kind, count in counts.items()))
+
+    def _serve(self):
+        """
+        Answers the lookups of other poke_maker.py runs on the --server
+        address until stopped with Ctrl-C. One transport and its connection
+        pool, the response cache and the sub-resource memo stay warm
+        between lookups.
+        """
+        from poke_downloaders import PokeObjectDownloader
+        from poke_server import PokeServer
+        from pokeretriever.scheduler import RequestScheduler
+
+        self._maker()
+        snapshot = None
+        if self.arguments.snapshot is not None:
+            from pokeretriever.snapshot import SnapshotStore
+
+            try:
+                snapshot = SnapshotStore(self.arguments.snapshot)
+            except FileNotFoundError:
+                print(f'Could not find the snapshot '
+                      f'"{self.arguments.snapshot}", create it with the '
+                      f'snapshot mode')
+                sys.exit(1)
+        cache = self._make_cache() if snapshot is None else None
+        scheduler = RequestScheduler(self.arguments.max_in_flight,
+                                     self.arguments.rate_limit)
+        transport = self._make_transport()
+
+        def make_downloader(pokedex_requests, unordered):
+            return PokeObjectDownloader(pokedex_requests,
+                                        self.arguments.workers, cache,
+                                        scheduler, unordered, snapshot,
+                                        transport)
+
+        make_prefetcher = None
+        if self.arguments.prefetch and cache is None:
+            print('Prefetching needs the response cache, not prefetching',
+                  file=sys.stderr)
+        elif self.arguments.prefetch:
+            make_prefetcher = functools.partial(self._make_prefetcher, cache)
+        server = PokeServer(self.arguments.server, make_downloader,
+                            make_prefetcher)
+        print(f'Serving lookups on {self.arguments.server}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            transport.close()
+            if cache is not None:
+                cache.close()
+            if snapshot is not None:
+                snapshot.close()
+
+    def _run_shards(self):
+        """
+        Runs every shard on this machine, unless --merge-shards was given,
+        and merges the shard files into the report in input order. The
+        files of the run, e.g. --stats-json, are only written here, for the
+        merge.
+        """
+        import tempfile
+
+        from poke_shards import ShardMerger, run_shards, shard_argv
+        from pokeretriever.instrumentation import metrics
+
+        shard_dir = self.arguments.shard_dir
+        temporary_dir = None
+        if shard_dir is None:
+            temporary_dir = tempfile.TemporaryDirectory(prefix='poke-shards-')
+            shard_dir = temporary_dir.name
+        profiler = self._make_profiler()
+        try:
+            if not self.arguments.merge_shards:
+                incomplete = run_shards(
+                    shard_dir, self.arguments.shards,
+                    shard_argv(sys.argv[1:], ArgumentParser.option_strings()))
+                if incomplete:
+                    print(f'Shard(s) {", ".join(map(str, incomplete))} did '
+                          f'not complete', file=sys.stderr)
+                    sys.exit(1)
+            try:
+                merger = ShardMerger(
+                    shard_dir, self.arguments.shards,
+                    'text' if self.arguments.output_format == 'text'
+                    else 'data')
+            except (FileNotFoundError, ValueError) as e:
+                print(f'Could not merge the shards: {e}')
+                sys.exit(1)
+            if profiler is not None:
+                profiler.enable()
+            with metrics.phase('merge'):
+                Report(merger.objects(), self._make_formatter()).export()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.arguments.profile)
+            if temporary_dir is not None:
+                temporary_dir.cleanup()
+            self._report_stats()
+        if merger.failures:
+            self._report_failures(merger.failures)
+            sys.exit(2)
+
+    def _query(self, snapshot=None) -> list:
+        """
+        Helper method to find what matches the --where clauses of the query
+        mode, once the index is brought up to date with the response cache
+        and the snapshot.
+        :param snapshot: SnapshotStore or None
+        :return: list of the names or ids to look the matches up with
+        """
+        from pokeretriever.index import Clause, PokedexIndex
+        from pokeretriever.instrumentation import metrics
+
+        index_path = self.arguments.index
+        if index_path is None:
+            index_path = os.path.join(self.arguments.cache_dir,
+                                      PokedexIndex.DB_NAME)
+        clauses = [Clause.parse(clause) for clause in self.arguments.where]
+        with PokedexIndex(index_path) as index:
+            with metrics.phase('index'):
+                cache = self._make_cache()
+                if cache is not None:
+                    with cache:
+                        index.update_from_cache(cache)
+                if snapshot is not None:
+                    index.update_from_snapshot(snapshot)
+            try:
+                with metrics.phase('query'):
+                    matches = index.find(self.arguments.find, clauses)
+            except ValueError as e:
+                print(f'Invalid query: {e}')
+                sys.exit(1)
+            print(f'{len(matches)} {self.arguments.find} match(es), '
+                  f'{index}', file=sys.stderr)
+        return matches
+
+    def _take_shard(self, name_ids, seqs):
+        """
+        Helper method to pick the names or ids of the shard of this run.
+        :param name_ids: iterable of names or ids, in input order
+        :param seqs: collections.deque the input position of every name or
+        id is appended to as it is taken
+        :return: generator of names or ids
+        """
+        from poke_shards import select_shard
+
+        for seq, name_id in select_shard(name_ids, self.arguments.shards,
+                                         self.arguments.shard_index):
+            seqs.append(seq)
+            yield name_id
+
+    def _refresh(self, name_ids, expanded) -> list:
+        """
+        Helper method to refresh the output file through its manifest.
+        :param name_ids: iterable of names or ids
+        :param expanded: the expanded sections, see expanded_sections()
+        :return: list of FailedRequest
+        """
+        from poke_refresh import Refresher
+        from pokeretriever.scheduler import RequestScheduler
+
+        maker = self._maker()
+        refresher = Refresher(self.arguments.output_file,
+                              self.arguments.output_format,
+                              self.arguments.mode, expanded,
+                              self.arguments.workers,
+                              self.arguments.expand_threads)
+        scheduler = RequestScheduler(self.arguments.max_in_flight,
+                                     self.arguments.rate_limit)
+        with self._make_transport() as transport:
+            maker(transport, None, scheduler)
+            changed = refresher.refresh(name_ids)
+        print(f'{refresher}, report '
+              f'{"patched" if changed else "unchanged"}', file=sys.stderr)
+        return refresher.failures
+
+    def _make_prefetcher(self, cache):
+        """
+        Helper method to create the prefetcher from the arguments.
+        :param cache: ResponseCache the prefetches warm, or None
+        :return: Prefetcher, or None when there is nothing to prefetch into
+        """
+        if not self.arguments.prefetch:
+            return None
+        if cache is None:
+            print('Prefetching needs the response cache, not prefetching',
+                  file=sys.stderr)
+            return None
+        from pokeretriever.prefetch import Prefetcher
+        from pokeretriever.scheduler import PREFETCH
+
+        return Prefetcher(functools.partial(self._maker()._get_body,
+                                            priority=PREFETCH),
+                          self.arguments.prefetch)
+
+    def _make_transport(self, asynchronous: bool = False):
+        """
+        Helper method to create the transport from the arguments, its
+        connection pool sized for the max requests in flight.
+        :param asynchronous: bool, True for a transport of the async engine,
+        which is opened with `async with` inside its event loop
+        :return: a transport
+        """
+        from pokeretriever.transport import CONNECT_TIMEOUT, READ_TIMEOUT, \
+            AiohttpTransport, AsyncFixtureTransport, FixtureTransport, \
+            RequestsTransport
+
+        if self.arguments.transport == 'fixtures':
+            fixture_transport = AsyncFixtureTransport if asynchronous \
+                else FixtureTransport
+            return fixture_transport(self.arguments.fixtures_dir)
+        http_transport = AiohttpTransport if asynchronous \
+            else RequestsTransport
+        connect_timeout = self.arguments.connect_timeout
+        read_timeout = self.arguments.read_timeout
+        return http_transport(
+            self.arguments.max_in_flight,
+            CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            READ_TIMEOUT if read_timeout is None else read_timeout)
+
+    def _make_cache(self):
+        """
+        Helper method to create the response cache from the arguments.
+        :return: ResponseCache or None if caching is disabled
+        """
+        if self.arguments.no_cache:
+            return None
+        from pokeretriever.cache import ResponseCache
+
+        return ResponseCache(self.arguments.cache_dir,
+                             self.arguments.cache_ttl,
+                             self.arguments.cache_max_size * 1024 * 1024)
 
     @staticmethod
-    def _get_name_id_list(file_name) -> list:
+    def _iter_name_ids(lines, dedupe_window: int, list_ids=None):
         """
-        Helper method to get a list of pokeObject names or ids.
-        :param file_name: str, the file name.
-        :return: list of pokeObject names
+        Helper method to lazily get pokeObject names or ids from the lines
+        of an input file, each line being an input spec. Blank lines and
+        lines starting with # are skipped, and an id seen within the last
+        dedupe_window ids is skipped as well, so memory stays bounded by
+        the window.
+        :param lines: iterable of str, e.g. an open file
+        :param dedupe_window: int, how many recent ids are remembered
+        :param list_ids: callable returning every id for the 'all' spec
+        :return: generator of pokeObject names or ids
         """
+        recent = collections.OrderedDict()
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            for name_id in Driver._expand_spec(line, list_ids):
+                if name_id in recent:
+                    recent.move_to_end(name_id)
+                    continue
+                recent[name_id] = None
+                if len(recent) > dedupe_window:
+                    recent.popitem(last=False)
+                yield name_id
 
-        with open(file_name, mode='r', encoding='utf-8') as file:
-            return [line.strip('\n') for line in file]
+    @staticmethod
+    def _expand_spec(spec: str, list_ids=None):
+        """
+        Helper method to get the names or ids of an input spec: a comma
+        separated list of names, ids, id ranges such as 1-151 and 'all'.
+        Ids lose their leading zeros so they de-duplicate with ranges.
+        :param spec: str
+        :param list_ids: callable returning every id for 'all'
+        :return: generator of names or ids
+        """
+        for token in spec.split(','):
+            token = token.strip()
+            match = ID_RANGE.fullmatch(token)
+            if not token:
+                continue
+            elif token.lower() == 'all' and list_ids is not None:
+                yield from list_ids()
+            elif match is not None:
+                start, stop = int(match[1]), int(match[2])
+                step = 1 if start <= stop else -1
+                yield from map(str, range(start, stop + step, step))
+            elif token.isdigit():
+                yield str(int(token))
+            else:
+                yield token
+
+    def _list_ids(self, mode: str, snapshot=None) -> list:
+        """
+        Helper method to list the id of every resource of a mode for the
+        'all' input spec, from the snapshot when there is one and otherwise
+        through the paginated list endpoint, a page of 1000 per request.
+        :param mode: str, e.g. 'pokemon'
+        :param snapshot: SnapshotStore or None
+        :return: list of ids as str
+        """
+        from pokeretriever.scheduler import RequestScheduler
+
+        if snapshot is not None:
+            return snapshot.ids(mode)
+        maker = self._maker()
+        if maker.transport is None:
+            # the async engine and the server do not set PokedexMaker up
+            self.list_transport = self._make_transport()
+            maker(self.list_transport, None, RequestScheduler(
+                self.arguments.max_in_flight, self.arguments.rate_limit))
+        return list(maker.list_resources(mode, ids=True))
 
 
 class Report:
@@ -155,11 +1113,12 @@ class Report:
     Uses a strategy pattern for the export method.
     """
 
-    def __init__(self, pokedex_objects: list, formatter):
+    def __init__(self, pokedex_objects, formatter):
         """
         Initialized a Report with the supplied parameters.
-        :param pokedex_objects: list of PokedexObjects
-        :param formatter: a method that takes a list of PokedexObjects
+        :param pokedex_objects: iterable of PokedexObjects, may be a
+        generator that downloads them while the report is written
+        :param formatter: a method that takes an iterable of PokedexObjects
         """
         self.pokedex_objects = pokedex_objects
         self.formatter = formatter
@@ -169,7 +1128,10 @@ class Report:
         Exports the pokedex objects to the appropriate formatter.
         :return:
         """
-        self.formatter(self.pokedex_objects)
+        from pokeretriever.instrumentation import metrics
+
+        with metrics.phase('report'):
+            self.formatter(self.pokedex_objects)
 
 
 class TerminalReporter:
@@ -185,14 +1147,17 @@ class TerminalReporter:
         """
         pass
 
-    def make_report(self, pokedex_objects: list):
+    def make_report(self, pokedex_objects):
         """
-        Makes a terminal report.
-        :param pokedex_objects: list of PokeObjects
+        Makes a terminal report, printing each PokeObject as soon as it
+        is ready.
+        :param pokedex_objects: iterable of PokeObjects
         """
-        print('Terminal Report')
+        print('Terminal Report', flush=True)
         for pokedex in pokedex_objects:
-            print(pokedex)
+            pokedex.write_to(sys.stdout)
+            sys.stdout.write('\n')
+            sys.stdout.flush()
 
 
 class TextFileReporter:
@@ -201,6 +1166,7 @@ class TextFileReporter:
     text file.
     Part of a strategy pattern for Report.
     """
+    BUFFER_SIZE = 64 * 1024
 
     def __init__(self, file_name: str):
         """
@@ -209,48 +1175,121 @@ class TextFileReporter:
         """
         self.file_name = file_name
 
-    def make_report(self, pokedex_objects: list):
+    def make_report(self, pokedex_objects):
         """
-        Makes a text file report.
-        :param pokedex_objects: list of PokeObjects
+        Makes a text file report, writing each PokeObject as soon as it
+        is ready.
+        :param pokedex_objects: iterable of PokeObjects
         """
-        with open(self.file_name, 'w') as file:
+        with open(self.file_name, 'w', buffering=self.BUFFER_SIZE) as file:
             for pokedex in pokedex_objects:
-                file.write(str(pokedex))
+                pokedex.write_to(file)
 
 
-class PokeObjectDownloader:
+class DataReporter(abc.ABC):
     """
-    PokeObjectDownloader takes requests for PokedexObjects and gets
-    them.
+    Base class of the reporters that write PokeObjects as data for other
+    tools, to a file or to the terminal. Each PokeObject is written as
+    soon as it is ready. Subclasses must implement _write_report().
+    Part of a strategy pattern for Report.
     """
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, file_name: str = None):
+        """
+        Initialize a DataReporter.
+        :param file_name: str, the output file name, or None to write to
+        the terminal.
+        """
+        self.file_name = file_name
 
-    def __init__(self, pokedex_requests: list, max_workers: int):
+    def make_report(self, pokedex_objects):
         """
-        Initialize a PokeObjectDownloader.
-        Note: the max threads the downloader can use is the max request
-        objects it can process at a time. Each request object has a
-        parameter of how many threads it can use as well (multiplying
-        the threads total).
-        :param pokedex_requests: list of requests
-        :param max_workers: the max threads the downloader can use.
+        Makes the report.
+        :param pokedex_objects: iterable of PokeObjects
         """
-        self.pokedex_requests = pokedex_requests
-        self.max_workers = max_workers
+        if self.file_name is None:
+            self._write_report(sys.stdout, pokedex_objects)
+            sys.stdout.flush()
+            return
+        with open(self.file_name, 'w', buffering=self.BUFFER_SIZE,
+                  encoding='utf-8', newline='') as file:
+            self._write_report(file, pokedex_objects)
 
-    def download(self):
+    @abc.abstractmethod
+    def _write_report(self, sink, pokedex_objects):
         """
-        Processes each request in the list.
-        :return: list of PokeObjects.
+        Writes every PokeObject to the sink.
+        :param sink: a file-like object
+        :param pokedex_objects: iterable of PokeObjects
         """
-        with concurrent.futures.ThreadPoolExecutor(
-                max_workers=self.max_workers) as executor:
-            with requests.Session() as session:
-                pokedex_maker = PokedexMaker(session)
-                result = executor.map(pokedex_maker.execute_request,
-                                      self.pokedex_requests)
 
-        return list(result)
+
+class NDJSONReporter(DataReporter):
+    """
+    Writes one JSON document per line per PokeObject.
+    """
+
+    def _write_report(self, sink, pokedex_objects):
+        for pokedex in pokedex_objects:
+            json.dump(pokedex.to_dict(), sink, ensure_ascii=False)
+            sink.write('\n')
+
+
+class JSONReporter(DataReporter):
+    """
+    Writes a JSON array of PokeObjects, one element at a time.
+    """
+
+    def _write_report(self, sink, pokedex_objects):
+        separator = '\n'
+        sink.write('[')
+        for pokedex in pokedex_objects:
+            sink.write(separator)
+            json.dump(pokedex.to_dict(), sink, ensure_ascii=False)
+            separator = ',\n'
+        sink.write('\n]\n')
+
+
+class CSVReporter(DataReporter):
+    """
+    Writes one CSV row per PokeObject, with a header row taken from the
+    first one. Lists are joined with ';', and nested objects are written
+    by name, or as name=value when they carry a single value such as a
+    base stat or the level a move is learned at.
+    """
+
+    def _write_report(self, sink, pokedex_objects):
+        import csv
+
+        writer = None
+        for pokedex in pokedex_objects:
+            row = {key: self._flatten(value)
+                   for key, value in pokedex.to_dict().items()}
+            if writer is None:
+                writer = csv.DictWriter(sink, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+
+    @staticmethod
+    def _flatten(value):
+        """
+        Helper method to turn a value of to_dict() into a CSV cell.
+        :param value: a value of PokedexObject.to_dict()
+        :return: str, int, bool or None
+        """
+        if not isinstance(value, list):
+            return value
+        cells = []
+        for item in value:
+            if isinstance(item, dict):
+                others = [other for key, other in item.items()
+                          if key != 'name']
+                cells.append(f'{item["name"]}={others[0]}'
+                             if len(others) == 1 else item['name'])
+            else:
+                cells.append(str(item))
+        return ';'.join(cells)
 
 
 def main():
@@ -0,0 +1,421 @@
+"""
+Module contains the incremental refresh of a report file. A manifest kept
+next to the report (<output>.manifest.json) records where each object was
+written and the validators and content hash of every resource it was made
+from. A refresh revalidates those resources with conditional requests,
+only rebuilds the objects whose resources changed or that are new, and
+patches the report with the unchanged objects of the previous one.
+"""
+import collections
+import concurrent.futures
+import hashlib
+import io
+import itertools
+import json
+import os
+
+from pokedex_maker import InvalidPokeObject, PokedexMaker
+from pokeretriever import parsing
+from pokeretriever.instrumentation import metrics
+from pokeretriever.memo import SingleFlightMemo
+from pokeretriever.pokeretriever import SECTIONS, expanded_sections
+from pokeretriever.resilience import FailedRequest, RequestFailed
+from pokeretriever.scheduler import EXPANSION, TOP_LEVEL
+
+MANIFEST_VERSION = 1
+# the formats a report can be patched in, one chunk of bytes per object
+REFRESH_FORMATS = ('text', 'ndjson')
+
+
+class RefreshManifest:
+    """
+    What a report was made of: the settings it was made with, the byte
+    span of each object in the report and the validators and content hash
+    of every resource the objects were made from.
+    """
+
+    def __init__(self, settings: dict, entries: list = None,
+                 resources: dict = None):
+        """
+        Initialize a RefreshManifest.
+        :param settings: dict, the mode, expanded sections, format and api
+        url the report was made with
+        :param entries: list of dicts of the input, offset, length and
+        resource keys of each object, in report order
+        :param resources: dict of each resource key, e.g. 'move/tackle', to
+        its [etag, last_modified, content hash]
+        """
+        self.settings = settings
+        self.entries = entries if entries is not None else []
+        self.resources = resources if resources is not None else {}
+
+    @staticmethod
+    def path_for(output_file: str) -> str:
+        """
+        Gets the manifest path of a report.
+        :param output_file: str
+        :return: str
+        """
+        return f'{output_file}.manifest.json'
+
+    @classmethod
+    def load(cls, path: str, settings: dict):
+        """
+        Loads a manifest made with the same settings.
+        :param path: str
+        :param settings: dict, the settings of the refresh
+        :return: RefreshManifest, or None when there is no usable one
+        """
+        try:
+            with open(path, encoding='utf-8') as file:
+                document = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if document.get('version') != MANIFEST_VERSION \
+                or document.get('settings') != settings:
+            return None
+        return cls(settings, document['entries'], document['resources'])
+
+    def save(self, path: str):
+        """
+        Writes the manifest, replacing the previous one once complete.
+        :param path: str
+        """
+        with open(f'{path}.part', 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION, 'settings': self.settings,
+                       'entries': self.entries,
+                       'resources': self.resources}, file)
+        os.replace(f'{path}.part', path)
+
+    def __str__(self):
+        """Returns the current state of the RefreshManifest"""
+        return f'RefreshManifest({len(self.entries)} entries, ' \
+               f'{len(self.resources)} resources)'
+
+
+class _ReportPatcher:
+    """
+    Writes a refreshed report. While the objects are the unchanged start
+    of the previous report nothing is written. From the first difference
+    on, the report is written next to the previous one, copying the bytes
+    of unchanged objects, and replaces it on close().
+    """
+
+    def __init__(self, path: str, has_previous: bool):
+        """
+        :param path: str, the report file
+        :param has_previous: bool, True when the previous report is used
+        """
+        self.path = path
+        self.previous = open(path, 'rb') if has_previous else None
+        self.part = None  # the new report once it differs
+        self.position = 0  # bytes of the new report so far
+
+    def copy(self, offset: int, length: int) -> int:
+        """
+        Adds an object of the previous report.
+        :param offset: int, where it starts in the previous report
+        :param length: int, its bytes
+        :return: int, where it starts in the new report
+        """
+        start = self.position
+        if self.part is not None or offset != start:
+            self._diverge()
+            self.previous.seek(offset)
+            self.part.write(self.previous.read(length))
+        self.position += length
+        return start
+
+    def write(self, data: bytes) -> int:
+        """
+        Adds a rebuilt object.
+        :param data: bytes
+        :return: int, where it starts in the new report
+        """
+        self._diverge()
+        self.part.write(data)
+        start = self.position
+        self.position += len(data)
+        return start
+
+    def _diverge(self):
+        """Helper method to start writing the new report."""
+        if self.part is not None:
+            return
+        self.part = open(f'{self.path}.part', 'wb')
+        if self.position:
+            self.previous.seek(0)
+            self.part.write(self.previous.read(self.position))
+
+    def close(self) -> bool:
+        """
+        Finishes the report.
+        :return: bool, True when the report changed
+        """
+        if self.part is None and self.previous is not None \
+                and os.fstat(self.previous.fileno()).st_size \
+                == self.position:
+            self.previous.close()
+            return False
+        self._diverge()
+        self.part.close()
+        if self.previous is not None:
+            self.previous.close()
+        os.replace(f'{self.path}.part', self.path)
+        return True
+
+    def abort(self):
+        """Leaves the previous report as it was."""
+        if self.previous is not None:
+            self.previous.close()
+        if self.part is not None:
+            self.part.close()
+            os.remove(f'{self.path}.part')
+
+
+class Refresher:
+    """
+    Refreshes a report through its manifest, or makes the report and its
+    manifest when there is no usable one. Each resource is revalidated at
+    most once however many objects were made from it.
+    """
+
+    def __init__(self, output_file: str, output_format: str, mode: str,
+                 expanded, max_workers: int, expand_threads: int):
+        """
+        Initialize a Refresher, PokedexMaker must be set up before
+        refresh() is called.
+        :param output_file: str, the report file
+        :param output_format: str, one of REFRESH_FORMATS
+        :param mode: str, e.g. 'pokemon'
+        :param expanded: the expanded sections, see expanded_sections()
+        :param max_workers: int, max objects refreshed at once
+        :param expand_threads: int, max threads each object revalidates or
+        fetches its sub-resources with
+        """
+        self.output_file = output_file
+        self.output_format = output_format
+        self.mode = mode
+        self.sections = expanded_sections(expanded) \
+            if mode == 'pokemon' else frozenset()
+        self.max_workers = max_workers
+        self.expand_threads = expand_threads
+        self.settings = {'mode': mode, 'expanded': sorted(self.sections),
+                         'format': output_format,
+                         'api_url': PokedexMaker.base_url}
+        self.failures = []  # FailedRequest of every request that failed
+        # unchanged, changed, new and removed objects of the last refresh
+        self.counts = collections.Counter()
+        self._old = None  # the RefreshManifest of the previous report
+        self._records = {}  # resource key -> [etag, last_modified, hash]
+        self._bodies = {}  # resource key -> body that changed
+        self._checks = SingleFlightMemo(max_size=1 << 20)
+        self._fetches = SingleFlightMemo(max_size=4096)
+
+    def refresh(self, name_ids) -> bool:
+        """
+        Refreshes the report for the names or ids, in their order.
+        :param name_ids: iterable of names or ids
+        :return: bool, True when the report changed
+        """
+        path = RefreshManifest.path_for(self.output_file)
+        self._old = RefreshManifest.load(path, self.settings) \
+            if os.path.exists(self.output_file) else None
+        old_entries = {entry['input']: entry for entry in self._old.entries} \
+            if self._old is not None else {}
+        manifest = RefreshManifest(self.settings)
+        patcher = _ReportPatcher(self.output_file, self._old is not None)
+        try:
+            for result in self._results(name_ids, old_entries):
+                if isinstance(result, FailedRequest):
+                    self.failures.append(result)
+                    continue
+                name_id, chunk, keys = result
+                old_entry = old_entries.get(name_id)
+                if chunk is None:
+                    self.counts['unchanged'] += 1
+                    length = old_entry['length']
+                    offset = patcher.copy(old_entry['offset'], length)
+                else:
+                    self.counts['changed' if old_entry else 'new'] += 1
+                    data = chunk.encode('utf-8')
+                    length = len(data)
+                    offset = patcher.write(data)
+                manifest.entries.append({'input': name_id, 'offset': offset,
+                                         'length': length,
+                                         'resources': keys})
+            changed = patcher.close()
+        except BaseException:
+            patcher.abort()
+            raise
+        inputs = {entry['input'] for entry in manifest.entries}
+        self.counts['removed'] = sum(name_id not in inputs
+                                     for name_id in old_entries)
+        manifest.resources = {key: self._records[key]
+                              for entry in manifest.entries
+                              for key in entry['resources']}
+        manifest.save(path)
+        return changed
+
+    def _results(self, name_ids, old_entries: dict):
+        """
+        Helper method to refresh the objects with a thread pool, keeping
+        at most 2 * max_workers pending at a time.
+        :param name_ids: iterable of names or ids
+        :param old_entries: dict of input to manifest entry
+        :return: generator of tuples of the input, the rendered object or
+        None when it is unchanged and its resource keys, or FailedRequests,
+        in input order
+        """
+        name_ids = iter(name_ids)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers) as executor:
+            pending = collections.deque(
+                executor.submit(self._refresh_entry, name_id,
+                                old_entries.get(name_id))
+                for name_id in itertools.islice(name_ids,
+                                                2 * self.max_workers))
+            try:
+                while pending:
+                    future = pending.popleft()
+                    for name_id in itertools.islice(name_ids, 1):
+                        pending.append(executor.submit(
+                            self._refresh_entry, name_id,
+                            old_entries.get(name_id)))
+                    yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _refresh_entry(self, name_id: str, old_entry: dict):
+        """
+        Helper method to refresh one object, turning the failures of that
+        one object into its outcome so the rest of the report carries on.
+        :param name_id: str
+        :param old_entry: dict, its manifest entry, or None when it is new
+        :return: tuple of the input, the rendered object or None when it is
+        unchanged and its resource keys, or FailedRequest
+        """
+        try:
+            if old_entry is not None:
+                with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.expand_threads) as executor:
+                    unchanged = list(executor.map(self._check,
+                                                  old_entry['resources']))
+                if all(unchanged):
+                    return name_id, None, old_entry['resources']
+            chunk, keys = self._build(name_id)
+            return name_id, chunk, keys
+        except (InvalidPokeObject, RequestFailed) as e:
+            metrics.count('failed_requests')
+            return FailedRequest(self.mode, name_id, e)
+
+    def _check(self, key: str) -> bool:
+        """
+        Helper method to check once if a resource of the previous report
+        is unchanged.
+        :param key: str, e.g. 'move/tackle'
+        :return: bool
+        """
+        return self._checks.get_or_load(key, self._revalidate, key)
+
+    def _revalidate(self, key: str) -> bool:
+        """
+        Helper method to revalidate a resource with a conditional request.
+        Servers without validators answer the whole body, which is
+        compared with the content hash instead.
+        :param key: str, e.g. 'move/tackle'
+        :return: bool, True when it is unchanged
+        """
+        record = self._old.resources.get(key)
+        if record is None:
+            return False
+        etag, last_modified, digest = record
+        body, etag, last_modified = PokedexMaker.get_validated(
+            *key.split('/', 1), etag, last_modified, self._priority(key))
+        unchanged = body is None or self._digest(body) == digest
+        if not unchanged:
+            self._bodies[key] = body
+            digest = self._digest(body)
+        self._records[key] = [etag, last_modified, digest]
+        return unchanged
+
+    def _build(self, name_id: str) -> tuple:
+        """
+        Helper method to build and render an object that changed or is new.
+        :param name_id: str
+        :return: tuple of the rendered object and its resource keys
+        """
+        key = f'{self.mode}/{name_id}'
+        body = self._bodies.pop(key, None)
+        if body is None:
+            body = self._fetch(key)
+        keys = [key]
+        section_bodies = {}
+        if self.sections:
+            names = PokedexMaker._section_names(parsing.loads(body))
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.expand_threads) as executor:
+                for section in SECTIONS:
+                    if section not in self.sections:
+                        continue
+                    kind = PokedexMaker.section_kinds[section]
+                    section_keys = [f'{kind}/{name}'
+                                    for name in names[section]]
+                    section_bodies[section] = list(executor.map(
+                        self._get_sub_body, section_keys))
+                    keys.extend(section_keys)
+        pokedex = PokedexMaker.build_from_bodies(self.mode, body,
+                                                 section_bodies)
+        if self.output_format == 'ndjson':
+            return json.dumps(pokedex.to_dict(), ensure_ascii=False) \
+                + '\n', keys
+        text = io.StringIO()
+        pokedex.write_to(text)
+        return text.getvalue(), keys
+
+    def _get_sub_body(self, key: str) -> bytes:
+        """
+        Helper method to get the body of a sub-resource once however many
+        objects are made from it.
+        :param key: str, e.g. 'move/tackle'
+        :return: bytes
+        """
+        return self._fetches.get_or_load(key, self._get_changed_or_fetch,
+                                         key)
+
+    def _get_changed_or_fetch(self, key: str) -> bytes:
+        """
+        Helper method to get a body fetched while revalidating, or else to
+        fetch it.
+        :param key: str
+        :return: bytes
+        """
+        body = self._bodies.get(key)
+        return body if body is not None else self._fetch(key)
+
+    def _fetch(self, key: str) -> bytes:
+        """
+        Helper method to fetch a resource and record its validators.
+        :param key: str
+        :return: bytes
+        """
+        body, etag, last_modified = PokedexMaker.get_validated(
+            *key.split('/', 1), priority=self._priority(key))
+        self._records[key] = [etag, last_modified, self._digest(body)]
+        return body
+
+    def _priority(self, key: str) -> int:
+        """Helper method to get the scheduler priority of a resource."""
+        return TOP_LEVEL if key.startswith(f'{self.mode}/') else EXPANSION
+
+    @staticmethod
+    def _digest(body: bytes) -> str:
+        """Helper method to get the content hash of a lean body."""
+        return hashlib.sha256(body).hexdigest()
+
+    def __str__(self):
+        """Returns the current state of the Refresher"""
+        return f'Refresher({self.output_file}: ' + ', '.join(
+            f'{self.counts[outcome]} {outcome}' for outcome in
+            ('unchanged', 'changed', 'new', 'removed')) + ')'
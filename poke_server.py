@@ -0,0 +1,399 @@
+"""
+Module contains the poke_maker server and its client. The server keeps a
+warm PokedexMaker alive (its requests.Session and connection pool, the
+response cache and the sub-resource memo) and answers lookups over
+localhost HTTP or a Unix socket. The client forwards the requests of a
+poke_maker.py run to it and gets the rendered objects back, so a lookup
+does not pay for cold connections and caches.
+
+Addresses are written as http://127.0.0.1:8766 (or 127.0.0.1:8766) or as
+unix:/path/to/socket. The http modules are imported by the server and the
+client when they are created, so runs that use neither do not load them.
+"""
+import json
+import os
+import threading
+import urllib.parse
+
+from pokeretriever.pokeretriever import PokedexRequest, RenderedObject, \
+    expanded_sections
+from pokeretriever.resilience import FailedRequest, RequestFailed
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Parses a server address.
+    :param address: str, e.g. 'http://127.0.0.1:8766' or 'unix:/tmp/s'
+    :return: tuple, ('unix', path) or ('tcp', host, port)
+    """
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    if '://' not in address:
+        address = f'http://{address}'
+    parsed = urllib.parse.urlsplit(address)
+    return 'tcp', parsed.hostname or '127.0.0.1', parsed.port or 8766
+
+
+class RemoteError(Exception):
+    """Exception for a request that failed on the server."""
+
+    def __init__(self, error_type: str, message: str):
+        """
+        Initialize the exception.
+        :param error_type: str, the name of the exception on the server
+        :param message: str, its message
+        """
+        super().__init__()
+        self.error_type = error_type
+        self.message = message
+
+    def __str__(self):
+        """display the message of the server side exception."""
+        return self.message
+
+
+def _unix_http_server(path: str, handler):
+    """
+    Helper function to create a threaded HTTP server listening on a Unix
+    socket.
+    :param path: str, the socket path
+    :param handler: the request handler class
+    :return: socketserver.ThreadingUnixStreamServer
+    """
+    import socketserver
+
+    class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        """A threaded HTTP server listening on a Unix socket."""
+        daemon_threads = True
+
+        def get_request(self):
+            # the handler logs client_address[0], Unix sockets have no
+            # address
+            request, _ = super().get_request()
+            return request, ('unix', 0)
+
+    return UnixHTTPServer(path, handler)
+
+
+def _read_lines(rfile):
+    """
+    Helper function to read the JSON lines of a chunked request body as
+    they arrive.
+    :param rfile: the binary file of the connection
+    :return: generator of bytes, one line each
+    :raises ValueError: when the body is cut short
+    """
+    pending = b''
+    while True:
+        size = int(rfile.readline().split(b';')[0], 16)
+        if not size:
+            rfile.readline()
+            break
+        chunk = rfile.read(size)
+        rfile.readline()
+        if len(chunk) < size:
+            raise ValueError('the request body is cut short')
+        *lines, pending = (pending + chunk).split(b'\n')
+        yield from lines
+    if pending.strip():
+        yield pending
+
+
+def _connect(address: str, timeout: float = None):
+    """
+    Helper function to open an HTTP connection to a server address.
+    :param address: str
+    :param timeout: float, seconds, or None to wait forever
+    :return: http.client.HTTPConnection
+    """
+    import http.client
+    import socket
+
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        """An HTTP connection over a Unix socket."""
+
+        def __init__(self, path: str, timeout: float = None):
+            super().__init__('localhost', timeout=timeout)
+            self.unix_path = path
+
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.unix_path)
+
+    parsed = parse_address(address)
+    if parsed[0] == 'unix':
+        return UnixHTTPConnection(parsed[1], timeout)
+    return http.client.HTTPConnection(parsed[1], parsed[2], timeout=timeout)
+
+
+class PokeServer:
+    """
+    Serves lookups with a downloader that is created for each query but
+    shares the warm session, cache and memo of the process.
+    POST /lookup[?unordered=1] takes a chunked body of one JSON line per
+    request ([mode, name_or_id, expanded sections, num_threads, lazy]) and
+    streams one JSON line per object ({"text": ..., "data": ...}) while the
+    requests still arrive, followed by one line per failed request
+    ({"failure": ...}). GET /health answers {"status": "ok"}.
+    """
+
+    def __init__(self, address: str, make_downloader,
+                 make_prefetcher=None):
+        """
+        Initialize a PokeServer, it starts answering on serve_forever().
+        :param address: str, where to listen
+        :param make_downloader: callable taking an iterable of
+        PokedexRequests and the unordered flag, returning a downloader
+        :param make_prefetcher: callable returning the Prefetcher of a
+        lookup, whose prefetches finish in the background after it, or None
+        """
+        self.address = address
+        self.make_downloader = make_downloader
+        self.make_prefetcher = make_prefetcher
+        parsed = parse_address(address)
+        handler = self._make_handler()
+        if parsed[0] == 'unix':
+            if os.path.exists(parsed[1]):
+                os.remove(parsed[1])
+            self._server = _unix_http_server(parsed[1], handler)
+        else:
+            import http.server
+
+            self._server = http.server.ThreadingHTTPServer(
+                (parsed[1], parsed[2]), handler)
+            self._server.daemon_threads = True
+
+    def serve_forever(self):
+        """
+        Answers lookups until shutdown() is called, Ctrl-C or SIGTERM.
+        """
+        import signal
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._stop)
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            parsed = parse_address(self.address)
+            if parsed[0] == 'unix' and os.path.exists(parsed[1]):
+                os.remove(parsed[1])
+
+    @staticmethod
+    def _stop(signum, frame):
+        """Signal handler stopping serve_forever() like Ctrl-C does."""
+        raise KeyboardInterrupt
+
+    def shutdown(self):
+        """Stops serve_forever() from another thread."""
+        self._server.shutdown()
+
+    def lookup(self, lines, unordered: bool = False):
+        """
+        Runs the requests of a query, reading them as the downloader asks
+        for more.
+        :param lines: iterable of JSON lines, one per request
+        :param unordered: bool, yield the objects as soon as they complete
+        :return: generator of JSON lines as bytes
+        """
+        pokedex_requests = (PokedexRequest(mode, name_or_id, expanded,
+                                           num_threads, lazy)
+                            for mode, name_or_id, expanded, num_threads, lazy
+                            in map(json.loads, lines))
+        downloader = self.make_downloader(pokedex_requests, unordered)
+        pokedex_objects = downloader.download()
+        if self.make_prefetcher is not None:
+            pokedex_objects = self.make_prefetcher().follow(pokedex_objects)
+        for pokedex in pokedex_objects:
+            yield json.dumps({'text': pokedex._render(),
+                              'data': pokedex.to_dict()},
+                             ensure_ascii=False).encode() + b'\n'
+        for failure in downloader.failures:
+            yield json.dumps({'failure': failure.to_dict()}).encode() \
+                + b'\n'
+
+    def _make_handler(self):
+        """Creates the request handler class bound to this server."""
+        import http.server
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            # the body of a lookup is streamed and ends when the
+            # connection is closed
+            protocol_version = 'HTTP/1.0'
+
+            def do_GET(self):
+                if self.path != '/health':
+                    return self.send_error(404)
+                body = b'{"status": "ok"}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path != '/lookup':
+                    return self.send_error(404)
+                if self.headers.get('Transfer-Encoding') != 'chunked':
+                    return self.send_error(411, 'Send the requests chunked')
+                unordered = urllib.parse.parse_qs(url.query).get(
+                    'unordered') == ['1']
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                try:
+                    for line in server.lookup(_read_lines(self.rfile),
+                                              unordered):
+                        self.wfile.write(line)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except Exception as e:
+                    self.wfile.write(json.dumps(
+                        {'error': f'{type(e).__name__}: {e}'}).encode()
+                        + b'\n')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class RemotePokeObjectDownloader:
+    """
+    RemotePokeObjectDownloader sends requests for PokedexObjects to a
+    poke_maker server and yields what it answers.
+    """
+
+    def __init__(self, pokedex_requests, address: str,
+                 unordered: bool = False):
+        """
+        Initialize a RemotePokeObjectDownloader.
+        :param pokedex_requests: iterable of requests
+        :param address: str, the server address
+        :param unordered: bool, when True the server yields objects as
+        soon as they complete instead of in request order
+        """
+        self.pokedex_requests = pokedex_requests
+        self.address = address
+        self.unordered = unordered
+        self.failures = []  # FailedRequest of every request that failed
+
+    @staticmethod
+    def is_running(address: str, timeout: float = 0.5) -> bool:
+        """
+        Checks if a server answers at an address.
+        :param address: str
+        :param timeout: float, seconds
+        :return: bool
+        """
+        import http.client
+
+        connection = _connect(address, timeout)
+        try:
+            connection.request('GET', '/health')
+            response = connection.getresponse()
+            response.read()
+            return response.status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def download(self):
+        """
+        Streams the requests to the server while yielding the objects it
+        streams back, so neither side holds every request and the first
+        objects come before the last request is sent. Failed requests are
+        added to failures.
+        :return: generator of RenderedObjects
+        """
+        import http.client
+
+        connection = _connect(self.address)
+        try:
+            connection.putrequest(
+                'POST', '/lookup?unordered=1' if self.unordered
+                else '/lookup')
+            connection.putheader('Content-Type', 'application/x-ndjson')
+            connection.putheader('Transfer-Encoding', 'chunked')
+            connection.endheaders()
+            errors = []
+            # the requests are written on a thread of their own while this
+            # one reads the answers, or both sides could block on a full
+            # socket buffer
+            sender = threading.Thread(target=self._send,
+                                      args=(connection.sock, errors),
+                                      daemon=True)
+            sender.start()
+            try:
+                response = connection.getresponse()
+            except http.client.HTTPException as e:
+                raise RequestFailed(self.address, repr(e))
+            if response.status != 200:
+                raise RequestFailed(self.address, f'HTTP {response.status}')
+            for line in response:
+                item = json.loads(line)
+                if 'failure' in item:
+                    failure = item['failure']
+                    self.failures.append(FailedRequest(
+                        failure['mode'], failure['input'],
+                        RemoteError(failure['error'], failure['message'])))
+                elif 'error' in item:
+                    if errors:
+                        raise errors[0]
+                    raise RequestFailed(self.address, item['error'])
+                else:
+                    yield RenderedObject(item['text'], item['data'])
+            sender.join()
+            if errors:
+                raise errors[0]
+        finally:
+            connection.close()
+
+    def _send(self, sock, errors: list):
+        """
+        Helper method to write the requests to the server as they come, one
+        chunk of the body per request.
+        :param sock: socket.socket of the connection
+        :param errors: list, gets the exception raised by the requests
+        """
+        import socket
+
+        try:
+            for request in self.pokedex_requests:
+                line = json.dumps([request.mode, request.name_or_id,
+                                   sorted(expanded_sections(request.expanded)),
+                                   request.num_threads, request.lazy]
+                                  ).encode() + b'\n'
+                chunk = b'%x\r\n%s\r\n' % (len(line), line)
+                if not self._write(sock, chunk):
+                    return
+            self._write(sock, b'0\r\n\r\n')
+        except BaseException as e:
+            errors.append(e)
+            try:
+                # the body cut short ends the answer of the server
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write(sock, data: bytes) -> bool:
+        """
+        Helper method to write to the server.
+        :param sock: socket.socket
+        :param data: bytes
+        :return: bool, False when the server stopped reading, its answer
+        says why
+        """
+        try:
+            sock.sendall(data)
+        except OSError:
+            return False
+        return True
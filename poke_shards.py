@@ -0,0 +1,235 @@
+"""
+Module contains the sharded runs of poke_maker. The input is split by
+position across N shards: shard i takes the specs at positions i, i + N,
+i + 2N, ... so every shard gets a similar share of any input. Each shard is
+a poke_maker.py process, possibly on another machine, that writes what it
+made to a shard file in a shared directory, every line tagged with the
+input position. The merge reads the shard files side by side and hands the
+objects to the report in input order again.
+
+A shard file is named shard-<i>-of-<N>.ndjson. Its first line describes
+the shard ({"shards": N, "index": i, "render": "text" or "data"}), every
+other line is an object ({"seq": n, "text": ...} or {"seq": n, "data":
+...}) or a failed request ({"seq": n, "failure": ...}). It is written next
+to its final path and only moved there once complete.
+"""
+import heapq
+import json
+import os
+import subprocess
+import sys
+
+from poke_server import RemoteError
+from pokeretriever.pokeretriever import RenderedObject
+from pokeretriever.resilience import FailedRequest
+
+# options naming the files of a run, only the merging run writes them
+RUN_FILE_OPTIONS = ('--output', '--stats-json', '--profile', '--errors-file',
+                    '--shard-dir')
+
+
+def shard_path(shard_dir: str, shards: int, index: int) -> str:
+    """
+    Gets the path of a shard file.
+    :param shard_dir: str
+    :param shards: int, how many shards the input is split across
+    :param index: int, the shard, from 0 to shards - 1
+    :return: str
+    """
+    return os.path.join(shard_dir, f'shard-{index}-of-{shards}.ndjson')
+
+
+def select_shard(name_ids, shards: int, index: int):
+    """
+    Picks the names or ids of a shard, with their input position.
+    :param name_ids: iterable of names or ids, in input order
+    :param shards: int
+    :param index: int
+    :return: generator of tuples of the position and the name or id
+    """
+    for seq, name_id in enumerate(name_ids):
+        if seq % shards == index:
+            yield seq, name_id
+
+
+class ShardWriter:
+    """
+    Writes the outcome of every request of a shard to its shard file.
+    """
+
+    def __init__(self, shard_dir: str, shards: int, index: int,
+                 render: str = 'text'):
+        """
+        Initialize a ShardWriter.
+        :param shard_dir: str, the directory shared by the shards
+        :param shards: int
+        :param index: int
+        :param render: str, 'text' to keep what write_to() writes or 'data'
+        to keep what to_dict() returns, whichever the report needs
+        """
+        self.path = shard_path(shard_dir, shards, index)
+        self.shards = shards
+        self.index = index
+        self.render = render
+        self.written = 0
+        self.failed = 0
+
+    def write(self, pokedex_objects, failures: list, seqs):
+        """
+        Writes the objects of the shard to its file as they are downloaded.
+        The downloader must yield in request order and add each failure in
+        its turn, so the outcomes can be matched with the positions of the
+        requests it took.
+        :param pokedex_objects: iterable of PokedexObjects, the download of
+        the shard's requests
+        :param failures: list the downloader adds its FailedRequests to
+        :param seqs: collections.deque the position of every request is
+        appended to as the downloader takes it
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        partial_path = f'{self.path}.part'
+        with open(partial_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'shards': self.shards,
+                                   'index': self.index,
+                                   'render': self.render}) + '\n')
+            for pokedex in pokedex_objects:
+                # failures are recorded as their turn comes, before the
+                # objects of the requests that came after them
+                self._write_failures(file, failures, seqs)
+                if self.render == 'text':
+                    item = {'seq': seqs.popleft(), 'text': pokedex._render()}
+                else:
+                    item = {'seq': seqs.popleft(), 'data': pokedex.to_dict()}
+                file.write(json.dumps(item, ensure_ascii=False) + '\n')
+                self.written += 1
+            self._write_failures(file, failures, seqs)
+        os.replace(partial_path, self.path)
+
+    def _write_failures(self, file, failures: list, seqs):
+        """
+        Helper method to write the failures not written yet.
+        """
+        for failure in failures[self.failed:]:
+            file.write(json.dumps({'seq': seqs.popleft(),
+                                   'failure': failure.to_dict()}) + '\n')
+        self.failed = len(failures)
+
+    def __str__(self):
+        """Returns the current state of the ShardWriter"""
+        return f'Shard {self.index + 1}/{self.shards}: {self.written} ' \
+               f'object(s), {self.failed} failed, written to {self.path}'
+
+
+class ShardMerger:
+    """
+    Reads the shard files of a run back in input order. Only one line of
+    each shard file is held at a time.
+    """
+
+    def __init__(self, shard_dir: str, shards: int, render: str = 'text'):
+        """
+        Initialize a ShardMerger.
+        :param shard_dir: str
+        :param shards: int
+        :param render: str, what the report needs, 'text' or 'data'
+        :raises FileNotFoundError: when a shard file is missing
+        :raises ValueError: when a shard file was rendered for another
+        report
+        """
+        self.paths = [shard_path(shard_dir, shards, index)
+                      for index in range(shards)]
+        for path in self.paths:
+            with open(path, encoding='utf-8') as file:
+                header = json.loads(file.readline())
+            if header['render'] != render:
+                raise ValueError(
+                    f'{path} holds the {header["render"]} of the objects, '
+                    f'use the format it was made for')
+        self.failures = []  # FailedRequest of every request that failed
+
+    def objects(self):
+        """
+        Merges the shard files, adding their failed requests to failures.
+        :return: generator of RenderedObjects, in input order
+        """
+        files = [open(path, encoding='utf-8') for path in self.paths]
+        try:
+            for file in files:
+                file.readline()
+            items = heapq.merge(*(map(json.loads, file) for file in files),
+                                key=lambda item: item['seq'])
+            for item in items:
+                if 'failure' in item:
+                    failure = item['failure']
+                    self.failures.append(FailedRequest(
+                        failure['mode'], failure['input'],
+                        RemoteError(failure['error'], failure['message'])))
+                else:
+                    yield RenderedObject(item.get('text'), item.get('data'))
+        finally:
+            for file in files:
+                file.close()
+
+    def __str__(self):
+        """Returns the current state of the ShardMerger"""
+        return f'ShardMerger({len(self.paths)} shard(s), ' \
+               f'{len(self.failures)} failed)'
+
+
+def shard_argv(argv: list, options: list) -> list:
+    """
+    Gets the command line arguments of the shards from the ones of the run,
+    without the RUN_FILE_OPTIONS and their values, so the shards do not
+    write over the files of the run.
+    :param argv: list of str, the command line arguments of the run
+    :param options: list of str, every option of the command line, to tell
+    the abbreviations argparse accepts, e.g. --out for --output
+    :return: list of str
+    """
+    shard_args = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--':
+            shard_args.append(arg)
+            shard_args.extend(args)
+            break
+        name, equals, _ = arg.partition('=')
+        if name.startswith('--') and name not in options:
+            matches = [option for option in options
+                       if option.startswith(name)]
+            if len(matches) == 1:
+                name = matches[0]
+        if name not in RUN_FILE_OPTIONS:
+            shard_args.append(arg)
+        elif not equals:
+            next(args, None)  # the value
+    return shard_args
+
+
+def run_shards(shard_dir: str, shards: int, argv: list) -> list:
+    """
+    Runs every shard as a poke_maker.py process on this machine, at the
+    same time, and waits for them.
+    :param shard_dir: str, the directory the shard files are written to
+    :param shards: int
+    :param argv: list of str, the command line arguments of the shards,
+    see shard_argv(), each shard gets them with its --shard-index and
+    --shard-dir
+    :return: list of the indexes of the shards that did not complete
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'poke_maker.py')
+    for index in range(shards):
+        if os.path.exists(shard_path(shard_dir, shards, index)):
+            os.remove(shard_path(shard_dir, shards, index))
+    processes = [subprocess.Popen([sys.executable, script, *argv,
+                                   '--shard-index', str(index),
+                                   '--shard-dir', shard_dir])
+                 for index in range(shards)]
+    incomplete = []
+    for index, process in enumerate(processes):
+        process.wait()
+        # failed requests make the exit status 2 but are in the shard file
+        if not os.path.exists(shard_path(shard_dir, shards, index)):
+            incomplete.append(index)
+    return incomplete
@@ -1,9 +1,18 @@
 """
 Module contains a facade to create PokeObjects from a request.
 """
-import concurrent
+import concurrent.futures
+import functools
+import time
 
-from pokeretriever.pokeretriever import *
+from pokeretriever import parsing
+from pokeretriever.instrumentation import metrics, timed
+from pokeretriever.memo import FlyweightRegistry, SingleFlightMemo
+from pokeretriever.resilience import CircuitBreaker, RequestFailed, \
+    RetryPolicy
+from pokeretriever.pokeretriever import SECTIONS, Ability, LazyPokemon, \
+    Move, PokedexObject, PokedexRequest, Pokemon, Stat, expanded_sections
+from pokeretriever.scheduler import EXPANSION, TOP_LEVEL, RequestScheduler
 
 
 class InvalidPokeObject(Exception):
@@ -23,16 +32,48 @@ class PokedexMaker:
     """
     Facade to create PokeObjects from a request.
     """
-    session = None
+    base_url = 'https://pokeapi.co/api/v2'
+    transport = None
+    cache = None
+    scheduler = None
+    snapshot = None
+    # transient errors are retried with backoff, and requests fail fast
+    # while the upstream looks down
+    retry_policy = RetryPolicy()
+    breaker = CircuitBreaker()
+    # statuses PokeAPI answers with for names or ids that do not exist
+    invalid_statuses = (400, 404)
+    # the sub-resources being loaded, shared by every expanded Pokemon that
+    # asks for one at the same time
+    memo = SingleFlightMemo(max_size=0)
+    # the one live instance of each loaded sub-resource, for as long as a
+    # Pokemon holds it
+    flyweights = FlyweightRegistry()
+    # process wide memo of sub-resource bodies for fetch_bodies()
+    body_memo = SingleFlightMemo(max_size=4096)
+    # the kind of the sub-resources in each expandable Pokemon section
+    section_kinds = {'stats': 'stat', 'abilities': 'ability', 'moves': 'move'}
 
-    def __init__(self, session):
+    def __init__(self, transport, cache=None, scheduler=None,
+                 snapshot=None):
         """
         Initialize a PokedexMaker.
-        :param session: a requests.Session()
+        :param transport: the transport requests are sent through, e.g. a
+        RequestsTransport
+        :param cache: a ResponseCache, or None to always use the network
+        :param scheduler: the RequestScheduler every fetch goes through,
+        defaults to one without a rate limit
+        :param snapshot: a SnapshotStore to answer every lookup offline, or
+        None to use the cache and network
         """
-        PokedexMaker.session = session
+        PokedexMaker.transport = transport
+        PokedexMaker.cache = cache
+        PokedexMaker.snapshot = snapshot
+        PokedexMaker.scheduler = scheduler if scheduler is not None \
+            else RequestScheduler()
 
     @classmethod
+    @timed('execute_request')
     def execute_request(cls, pokedex_request: PokedexRequest) -> PokedexObject:
         """
         Creates a PokeObject from a request.
@@ -42,7 +83,8 @@ class PokedexMaker:
         if pokedex_request.mode == 'pokemon':
             return cls._get_pokemon(pokedex_request.name_or_id,
                                     pokedex_request.expanded,
-                                    pokedex_request.num_threads)
+                                    pokedex_request.num_threads,
+                                    pokedex_request.lazy)
         elif pokedex_request.mode == 'stat':
             return cls._get_stats(pokedex_request.name_or_id)
         elif pokedex_request.mode == 'ability':
@@ -51,128 +93,533 @@ class PokedexMaker:
             return cls._get_move(pokedex_request.name_or_id)
 
     @classmethod
-    def _get_pokemon(cls, name: str, expanded=False, num_threads=1):
+    def fetch_bodies(cls, pokedex_request: PokedexRequest) -> tuple:
+        """
+        Gets the lean response bodies a request needs without building any
+        object, for pipelines that build the objects somewhere else, e.g.
+        in another process. See build_from_bodies().
+        :param pokedex_request: PokedexRequest
+        :return: tuple of the body and a dict of each expanded section to
+        the bodies of its sub-resources
+        """
+        body = cls._get_body(pokedex_request.mode,
+                             pokedex_request.name_or_id)
+        sections = expanded_sections(pokedex_request.expanded) \
+            if pokedex_request.mode == 'pokemon' else frozenset()
+        if not sections:
+            return body, {}
+        names = cls._section_names(parsing.loads(body))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=pokedex_request.num_threads) as executor:
+            return body, {
+                section: list(executor.map(
+                    functools.partial(cls._get_sub_body,
+                                      cls.section_kinds[section]),
+                    names[section]))
+                for section in SECTIONS if section in sections}
+
+    @classmethod
+    def build_from_bodies(cls, mode: str, body: bytes,
+                          section_bodies: dict) -> PokedexObject:
+        """
+        Creates a PokeObject from what fetch_bodies() returned. It only
+        uses the static builders, so it runs in any process.
+        :param mode: str, the request mode
+        :param body: bytes, the lean body of the requested resource
+        :param section_bodies: dict of each expanded section to the lean
+        bodies of its sub-resources
+        :return: PokedexObject
+        """
+        json_response = parsing.loads(body)
+        if mode != 'pokemon':
+            return cls._build_sub_resource(mode, json_response)
+        names = cls._section_names(json_response) if section_bodies else {}
+        expansions = {section: [cls._build_from_body(
+            cls.section_kinds[section], name, sub_body)
+            for name, sub_body in zip(names[section], bodies)]
+            for section, bodies in section_bodies.items()}
+        return cls._build_pokemon(json_response, frozenset(section_bodies),
+                                  expansions.get('stats'),
+                                  expansions.get('abilities'),
+                                  expansions.get('moves'))
+
+    @classmethod
+    def get_validated(cls, kind: str, name: str, etag: str = None,
+                      last_modified: str = None,
+                      priority=TOP_LEVEL) -> tuple:
+        """
+        Gets the lean body of a resource with its validators, bypassing
+        the snapshot and the response cache. When validators are given the
+        request is conditional and the server may answer that the resource
+        did not change.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param etag: str, the ETag the resource was last fetched with
+        :param last_modified: str, its Last-Modified
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: tuple of the body, or None when it did not change, its
+        ETag and its Last-Modified
+        :raises InvalidPokeObject: when the resource does not exist
+        :raises RequestFailed: when the resource could not be fetched
+        """
+        url = f'{cls.base_url}/{kind}/{name}'
+        headers = {}
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        response = cls._send(kind, name, url, headers, priority)
+        with response:
+            metrics.count('bytes_downloaded', len(response.content))
+            if headers and response.status_code == 304:
+                metrics.count('refresh.not_modified')
+                return None, response.headers.get('ETag', etag), \
+                    response.headers.get('Last-Modified', last_modified)
+            if response.status_code in cls.invalid_statuses:
+                raise InvalidPokeObject(name)
+            if response.status_code >= 400:
+                raise RequestFailed(name, f'HTTP {response.status_code}')
+            with metrics.phase('lean'):
+                body = parsing.lean_body(kind, response.content)
+            return body, response.headers.get('ETag'), \
+                response.headers.get('Last-Modified')
+
+    @classmethod
+    def list_resources(cls, kind: str, page_size: int = 1000,
+                       ids: bool = False):
+        """
+        Lists the names of every resource of a kind through the paginated
+        PokeAPI list endpoint.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param page_size: int, names requested per page
+        :param ids: bool, when True the ids are listed instead, taken from
+        the resource urls
+        :return: generator of names, or of ids as str
+        """
+        offset = 0
+        while True:
+            url = f'{cls.base_url}/{kind}?limit={page_size}&offset={offset}'
+            response = cls._send(kind, kind, url, {})
+            with response:
+                if response.status_code >= 400:
+                    raise RequestFailed(kind, f'HTTP {response.status_code}')
+                page = parsing.loads(response.content)
+            for result in page['results']:
+                yield result['url'].rstrip('/').rsplit('/', 1)[-1] if ids \
+                    else result['name']
+            offset += page_size
+            if not page.get('next'):
+                return
+
+    @classmethod
+    def download_snapshot(cls, snapshot, kinds=('pokemon', 'ability',
+                                                'move', 'stat'),
+                          max_workers: int = 8):
+        """
+        Downloads every resource of the given kinds into a snapshot.
+        :param snapshot: a writable SnapshotStore
+        :param kinds: iterable of resource kinds
+        :param max_workers: int, the max threads the download uses
+        :return: dict of kind to the number of resources stored
+        """
+        counts = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers) as executor:
+            for kind in kinds:
+                bodies = executor.map(functools.partial(cls._get_body, kind),
+                                      cls.list_resources(kind))
+                counts[kind] = 0
+                for body in bodies:
+                    json_response = parsing.loads(body)
+                    snapshot.put(kind, json_response['name'],
+                                 json_response['id'], body)
+                    counts[kind] += 1
+        return counts
+
+    @classmethod
+    def _get_json(cls, kind: str, name: str, priority=TOP_LEVEL) -> dict:
+        """
+        Helper method to get the json of a PokeAPI resource.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: dict
+        """
+        body = cls._get_body(kind, name, priority)
+        with metrics.phase('parse'):
+            return parsing.loads(body)
+
+    @classmethod
+    def _get_body(cls, kind: str, name: str, priority=TOP_LEVEL) -> bytes:
+        """
+        Helper method to get the response body of a PokeAPI resource,
+        trimmed to the fields the model classes use. When a snapshot is set
+        it answers every lookup without the network. Otherwise the response
+        cache is used when one is set, and stale cache entries are
+        revalidated with a conditional request.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: bytes
+        :raises InvalidPokeObject: when the resource does not exist
+        :raises RequestFailed: when the resource could not be fetched
+        """
+        if cls.snapshot is not None:
+            metrics.count('snapshot.lookup')
+            body = cls.snapshot.get(kind, name)
+            if body is None:
+                raise InvalidPokeObject(name)
+            return body
+        url = f'{cls.base_url}/{kind}/{name}'
+        entry = cls.cache.get(url) if cls.cache is not None else None
+        if entry is not None and entry.is_fresh(cls.cache.ttl):
+            metrics.count('cache.hit')
+            return entry.body
+        if cls.cache is not None:
+            metrics.count('cache.miss')
+        headers = entry.validators() if entry is not None else {}
+        response = cls._send(kind, name, url, headers, priority)
+        with response:
+            metrics.count('bytes_downloaded', len(response.content))
+            if entry is not None and response.status_code == 304:
+                metrics.count('cache.revalidated')
+                cls.cache.revalidated(
+                    url, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'))
+                return entry.body
+            if response.status_code in cls.invalid_statuses:
+                raise InvalidPokeObject(name)
+            if response.status_code >= 400:
+                raise RequestFailed(name, f'HTTP {response.status_code}')
+            with metrics.phase('lean'):
+                body = parsing.lean_body(kind, response.content)
+            if cls.cache is not None:
+                cls.cache.put(url, body, response.headers.get('ETag'),
+                              response.headers.get('Last-Modified'))
+            return body
+
+    @classmethod
+    def _send(cls, kind: str, name: str, url: str, headers: dict,
+              priority=TOP_LEVEL):
+        """
+        Helper method to send a request through the scheduler. Connection
+        errors, timeouts and transient statuses are retried after the
+        Retry-After the server asked for, or else with exponential backoff.
+        :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+        :param name: name or id of the resource
+        :param url: str
+        :param headers: dict, the request headers
+        :param priority: int, TOP_LEVEL or EXPANSION
+        :return: the response, its status is not a transient one
+        :raises RequestFailed: when every attempt failed or the circuit
+        breaker is open
+        """
+        policy = cls.retry_policy
+        for attempt in range(policy.max_retries + 1):
+            cls.breaker.before_request(name)
+            retry_after = None
+            try:
+                with cls.scheduler.slot(priority):
+                    metrics.count(f'requests.{kind}')
+                    with metrics.phase('network'):
+                        response = cls.transport.get(url, headers)
+            except OSError as e:
+                # transports raise connection errors and timeouts as
+                # OSErrors
+                reason = type(e).__name__
+            else:
+                if not policy.is_transient(response.status_code):
+                    cls.breaker.record_success()
+                    return response
+                reason = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+            cls.breaker.record_failure()
+            if attempt == policy.max_retries:
+                break
+            metrics.count('retries')
+            if retry_after is not None:
+                cls.scheduler.retry_after(retry_after)
+            else:
+                time.sleep(policy.delay(attempt))
+        raise RequestFailed(name, reason)
+
+    @classmethod
+    @timed('get.pokemon')
+    def _get_pokemon(cls, name: str, expanded=False, num_threads=1,
+                     lazy=False):
         """
         Helper method to get a Pokemon.
         :param name: name or id of the pokemon
-        :param expanded: bool
-        :param num_threads: int max number of threads for request
+        :param expanded: bool for every section or none, or the names of
+        the SECTIONS to expand, only their sub-resources are fetched
+        :param num_threads: int max number of threads the pokemon's
+        stats, abilities and moves are requested with, the scheduler still
+        caps the requests on the wire
+        :param lazy: bool, when True a LazyPokemon is returned that fetches
+        its expanded sections when they are first accessed
         :return: Pokemon
         """
-        url = f'https://pokeapi.co/api/v2/pokemon/{name}'
-        with cls.session.get(url) as response:
-            if str(response.content) == "b'Not Found'":
-                raise InvalidPokeObject(name)
-            json_response = response.json()
-            if expanded:
-                with concurrent.futures.ThreadPoolExecutor(
-                        max_workers=num_threads) as executor:
-                    stats_param = [stat['stat']['name'] for stat in
-                                   json_response['stats']]
-                    stats_list = list(executor.map(cls._get_stats,
-                                                   stats_param))
-                    abilities_param = [ability['ability']['name']
-                                       for ability in
-                                       json_response['abilities']]
-                    ability_list = list(executor.map(cls._get_abilities,
-                                                     abilities_param))
-                    moves_param = [move['move']['name'] for move in
-                                   json_response['moves']]
-                    moves_list = list(executor.map(cls._get_move,
-                                                   moves_param))
-
-                return Pokemon(
-                    name=json_response['name'],
-                    id_=json_response['id'],
-                    height=json_response['height'],
-                    weight=json_response['weight'],
-                    stats=stats_list,
-                    types=[a_type['type']['name'] for a_type
-                           in json_response['types']],
-                    abilities=ability_list,
-                    move=moves_list,
-                    expanded=expanded
-                )
-            else:
-                return Pokemon(
-                    name=json_response['name'],
-                    id_=json_response['id'],
-                    height=json_response['height'],
-                    weight=json_response['weight'],
-                    stats=[(stat['stat']['name'], stat['base_stat'])
-                           for stat in json_response['stats']],
-                    types=[a_type['type']['name'] for a_type
-                           in json_response['types']],
-                    abilities=[ability['ability']['name'] for
-                               ability in json_response['abilities']],
-                    move=[(move['move']['name'],
-                           move['version_group_details'][0][
-                               'level_learned_at'])
-                          for move in json_response['moves']],
-                    expanded=expanded
-                )
-
-    @classmethod
-    def _get_stats(cls, name: str):
+        json_response = cls._get_json('pokemon', name)
+        sections = expanded_sections(expanded)
+        if lazy and sections:
+            return cls._build_pokemon(json_response, sections,
+                                      loader=functools.partial(
+                                          cls._get_section,
+                                          num_threads=num_threads))
+        names = cls._section_names(json_response)
+        expansions = {section: cls._get_section(section, names[section],
+                                                num_threads)
+                      for section in SECTIONS if section in sections}
+        return cls._build_pokemon(json_response, sections,
+                                  expansions.get('stats'),
+                                  expansions.get('abilities'),
+                                  expansions.get('moves'))
+
+    @classmethod
+    def _get_section(cls, section: str, names: list, num_threads=1) -> list:
+        """
+        Helper method to get the sub-resources of an expanded Pokemon
+        section.
+        :param section: str, one of SECTIONS
+        :param names: list of the names of its sub-resources
+        :param num_threads: int, max number of threads they are requested
+        with
+        :return: list of Stat, Ability or Move
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_threads) as executor:
+            return list(executor.map(
+                functools.partial(cls._get_sub_resource,
+                                  cls.section_kinds[section]), names))
+
+    @staticmethod
+    def _section_names(json_response: dict) -> dict:
+        """
+        Helper method to get the sub-resource names of each section of a
+        pokemon json.
+        :param json_response: dict, the pokemon json
+        :return: dict of section name to list of names
+        """
+        return {
+            'stats': [stat['stat']['name'] for stat in
+                      json_response['stats']],
+            'abilities': [ability['ability']['name'] for ability in
+                          json_response['abilities']],
+            'moves': [move['move']['name'] for move in
+                      json_response['moves']]
+        }
+
+    @classmethod
+    def _get_sub_body(cls, kind: str, name: str) -> bytes:
+        """
+        Helper method to get the body of a Stat, Ability or Move through
+        the shared body memo, like _get_sub_resource does for objects.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: the name of the sub-resource
+        :return: bytes
+        """
+        return cls.body_memo.get_or_load((kind, name), cls._get_body, kind,
+                                         name, EXPANSION)
+
+    @classmethod
+    def _get_sub_resource(cls, kind: str, name: str):
+        """
+        Helper method to get a Stat, Ability or Move through the shared
+        memo, so a sub-resource is only fetched once when several threads
+        ask for it at the same time, and the flyweights, so it is not
+        fetched again while a Pokemon holds it.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: the name of the sub-resource
+        :return: Stat, Ability or Move
+        """
+        return cls.memo.get_or_load((kind, name), cls._load_sub_resource,
+                                    kind, name)
+
+    @classmethod
+    def _load_sub_resource(cls, kind: str, name: str):
+        """
+        Helper method to get the live instance of a Stat, Ability or Move
+        from the flyweight registry, or else to fetch and register it.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: the name of the sub-resource
+        :return: Stat, Ability or Move
+        """
+        live = cls.flyweights.get((kind, name))
+        if live is not None:
+            return live
+        getters = {
+            'stat': cls._get_stats,
+            'ability': cls._get_abilities,
+            'move': cls._get_move
+        }
+        return cls.flyweights.canonical((kind, name),
+                                        getters[kind](name, EXPANSION))
+
+    @classmethod
+    @timed('get.stat')
+    def _get_stats(cls, name: str, priority=TOP_LEVEL):
         """
         Helper method to get Stats.
         :param name: the name of the stat
+        :param priority: int, TOP_LEVEL or EXPANSION
         :return: Stat
         """
-        url = f'https://pokeapi.co/api/v2/stat/{name}'
-        with cls.session.get(url) as response:
-            if str(response.content) == "b'Not Found'":
-                raise InvalidPokeObject(name)
-            json_response = response.json()
-            return Stat(
-                name=json_response['name'],
-                id_=json_response['id'],
-                is_battle_only=json_response['is_battle_only']
-            )
+        return cls._build_stat(cls._get_json('stat', name, priority))
 
     @classmethod
-    def _get_abilities(cls, name: str):
+    @timed('get.ability')
+    def _get_abilities(cls, name: str, priority=TOP_LEVEL):
         """
         Helper method to get Ability.
         :param name: the name of the Ability
+        :param priority: int, TOP_LEVEL or EXPANSION
         :return: Ability
         """
-        url = f'https://pokeapi.co/api/v2/ability/{name}'
-        with cls.session.get(url) as response:
-            if str(response.content) == "b'Not Found'":
-                raise InvalidPokeObject(name)
-            json_response = response.json()
-            return Ability(
-                name=json_response['name'],
-                id_=json_response['id'],
-                generation=json_response['generation']['name'],
-                effect=json_response['effect_entries'][0]['effect'],
-                effect_short=json_response['effect_entries'][0]
-                ['short_effect'],
-                pokemon=[pokemon['pokemon']['name']
-                         for pokemon in json_response['pokemon']]
-            )
+        return cls._build_ability(cls._get_json('ability', name, priority))
 
     @classmethod
-    def _get_move(cls, name: str):
+    @timed('get.move')
+    def _get_move(cls, name: str, priority=TOP_LEVEL):
         """
         Helper method to get Move.
         :param name: the name of the Move
+        :param priority: int, TOP_LEVEL or EXPANSION
         :return: Move
         """
-        url = f'https://pokeapi.co/api/v2/move/{name}'
-        with cls.session.get(url) as response:
-            if str(response.content) == "b'Not Found'":
-                raise InvalidPokeObject(name)
-            json_response = response.json()
-            return Move(
-                name=json_response['name'],
-                id_=json_response['id'],
-                generation=json_response['generation']['name'],
-                accuracy=json_response['accuracy'],
-                pp=json_response['pp'],
-                power=json_response['power'],
-                type_=json_response['type']['name'],
-                damage_class=json_response['damage_class']['name'],
-                effect_short=json_response['effect_entries'][0]['short_effect']
-            )
+        return cls._build_move(cls._get_json('move', name, priority))
+
+    @staticmethod
+    @timed('build')
+    def _build_pokemon(json_response: dict, expanded, stats=None,
+                       abilities=None, moves=None, loader=None):
+        """
+        Helper method to create a Pokemon from its json. The expanded
+        sections use the already fetched Stat, Ability and Move objects,
+        the others are taken from the json.
+        :param json_response: dict, the pokemon json
+        :param expanded: bool for every section or none, or the names of
+        the expanded SECTIONS
+        :param stats: list of Stat, only used when stats are expanded
+        :param abilities: list of Ability, only used when abilities are
+        expanded
+        :param moves: list of Move, only used when moves are expanded
+        :param loader: callable fetching a section, when given a
+        LazyPokemon is created that fetches its expanded sections with it
+        :return: Pokemon
+        """
+        sections = expanded_sections(expanded)
+        if loader is not None:
+            sections = frozenset()
+        if 'stats' not in sections:
+            stats = [(stat['stat']['name'], stat['base_stat'])
+                     for stat in json_response['stats']]
+        if 'abilities' not in sections:
+            abilities = [ability['ability']['name'] for
+                         ability in json_response['abilities']]
+        if 'moves' not in sections:
+            moves = [(move['move']['name'],
+                      move['version_group_details'][0]['level_learned_at'])
+                     for move in json_response['moves']]
+        fields = dict(
+            name=json_response['name'],
+            id_=json_response['id'],
+            height=json_response['height'],
+            weight=json_response['weight'],
+            stats=stats,
+            types=[a_type['type']['name'] for a_type
+                   in json_response['types']],
+            abilities=abilities,
+            move=moves
+        )
+        if loader is not None:
+            return LazyPokemon(expanded=expanded, loader=loader, **fields)
+        return Pokemon(expanded=sections, **fields)
+
+    @staticmethod
+    def _build_from_body(kind: str, name: str, body: bytes):
+        """
+        Helper method to create a Stat, Ability or Move from its lean body.
+        The body is only parsed when the flyweights have no live object of
+        that name, so a sub-resource shared by many Pokemon is parsed once
+        for as long as they are around.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param name: str, the name of the sub-resource
+        :param body: bytes
+        :return: Stat, Ability or Move
+        """
+        sub_resource = PokedexMaker.flyweights.get((kind, name))
+        if sub_resource is not None:
+            return sub_resource
+        return PokedexMaker._build_sub_resource(kind, parsing.loads(body))
+
+    @staticmethod
+    def _build_sub_resource(kind: str, json_response: dict):
+        """
+        Helper method to create a Stat, Ability or Move from its json, the
+        shared instance of the flyweights when there is a live one.
+        :param kind: str, one of 'stat', 'ability' or 'move'
+        :param json_response: dict
+        :return: Stat, Ability or Move
+        """
+        builders = {
+            'stat': PokedexMaker._build_stat,
+            'ability': PokedexMaker._build_ability,
+            'move': PokedexMaker._build_move
+        }
+        sub_resource = builders[kind](json_response)
+        return PokedexMaker.flyweights.canonical((kind, sub_resource.name),
+                                                 sub_resource)
+
+    @staticmethod
+    @timed('build')
+    def _build_stat(json_response: dict) -> Stat:
+        """
+        Helper method to create a Stat from its json.
+        :param json_response: dict, the stat json
+        :return: Stat
+        """
+        return Stat(
+            name=json_response['name'],
+            id_=json_response['id'],
+            is_battle_only=json_response['is_battle_only']
+        )
+
+    @staticmethod
+    @timed('build')
+    def _build_ability(json_response: dict) -> Ability:
+        """
+        Helper method to create an Ability from its json.
+        :param json_response: dict, the ability json
+        :return: Ability
+        """
+        return Ability(
+            name=json_response['name'],
+            id_=json_response['id'],
+            generation=json_response['generation']['name'],
+            effect=json_response['effect_entries'][0]['effect'],
+            effect_short=json_response['effect_entries'][0]
+            ['short_effect'],
+            pokemon=[pokemon['pokemon']['name']
+                     for pokemon in json_response['pokemon']]
+        )
+
+    @staticmethod
+    @timed('build')
+    def _build_move(json_response: dict) -> Move:
+        """
+        Helper method to create a Move from its json.
+        :param json_response: dict, the move json
+        :return: Move
+        """
+        return Move(
+            name=json_response['name'],
+            id_=json_response['id'],
+            generation=json_response['generation']['name'],
+            accuracy=json_response['accuracy'],
+            pp=json_response['pp'],
+            power=json_response['power'],
+            type_=json_response['type']['name'],
+            damage_class=json_response['damage_class']['name'],
+            effect_short=json_response['effect_entries'][0]['short_effect']
+        )
@@ -0,0 +1,214 @@
+"""
+This module contains a persistent, on-disk cache of PokeAPI responses.
+Responses are stored in a SQLite database so repeated runs can be served
+from local disk instead of the network.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class CacheEntry:
+    """
+    A single cached response body and the validators needed to revalidate
+    it with the server.
+    """
+
+    def __init__(self, url: str, body: bytes, etag: str,
+                 last_modified: str, fetched_at: float):
+        """
+        Initialize a CacheEntry.
+        :param url: str, the url the body was downloaded from
+        :param body: bytes, the raw response body
+        :param etag: str, the ETag header sent with the response or None
+        :param last_modified: str, the Last-Modified header sent with the
+        response or None
+        :param fetched_at: float, epoch seconds of the last (re)validation
+        """
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl: float) -> bool:
+        """
+        Checks if the entry can be used without asking the server.
+        :param ttl: float, seconds an entry stays fresh after validation
+        :return: bool
+        """
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self) -> dict:
+        """
+        Builds the conditional request headers for this entry.
+        :return: dict of headers, empty if the server sent no validators
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def __str__(self):
+        """Returns the current state of the CacheEntry"""
+        return f'CacheEntry(url={self.url}, size={len(self.body)}, ' \
+               f'etag={self.etag}, last_modified={self.last_modified})'
+
+
+class ResponseCache:
+    """
+    A SQLite backed response cache with a time to live and size based
+    least recently used eviction. Safe to share between threads.
+    """
+    DB_NAME = 'responses.sqlite3'
+
+    def __init__(self, cache_dir: str, ttl: float = 86400,
+                 max_size: int = 256 * 1024 * 1024):
+        """
+        Initialize a ResponseCache, creating the cache directory and
+        database if they do not exist.
+        :param cache_dir: str, directory holding the cache database
+        :param ttl: float, seconds a response is used before it is
+        revalidated with the server
+        :param max_size: int, max total bytes of bodies kept on disk
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, self.DB_NAME), check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, '
+            'last_modified TEXT, fetched_at REAL NOT NULL, '
+            'accessed_at REAL NOT NULL, size INTEGER NOT NULL)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_accessed_at '
+            'ON responses (accessed_at)')
+        self._connection.commit()
+        self._size = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url: str):
+        """
+        Gets the cached entry for a url, fresh or not.
+        :param url: str
+        :return: CacheEntry or None if the url is not cached
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT body, etag, last_modified, fetched_at '
+                'FROM responses WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                'UPDATE responses SET accessed_at = ? WHERE url = ?',
+                (time.time(), url))
+            self._connection.commit()
+        return CacheEntry(url, *row)
+
+    def put(self, url: str, body: bytes, etag: str = None,
+            last_modified: str = None):
+        """
+        Stores a response body, evicting the least recently used entries
+        if the cache grows past its max size.
+        :param url: str
+        :param body: bytes, the raw response body
+        :param etag: str, the ETag header or None
+        :param last_modified: str, the Last-Modified header or None
+        """
+        now = time.time()
+        with self._lock:
+            old = self._connection.execute(
+                'SELECT size FROM responses WHERE url = ?',
+                (url,)).fetchone()
+            if old is not None:
+                self._size -= old[0]
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, '
+                '?)', (url, body, etag, last_modified, now, now, len(body)))
+            self._size += len(body)
+            self._evict()
+            self._connection.commit()
+
+    def revalidated(self, url: str, etag: str = None,
+                    last_modified: str = None):
+        """
+        Marks an entry as fresh again after the server answered a
+        conditional request with 304 Not Modified.
+        :param url: str
+        :param etag: str, a new ETag header or None to keep the old one
+        :param last_modified: str, a new Last-Modified header or None to
+        keep the old one
+        """
+        with self._lock:
+            self._connection.execute(
+                'UPDATE responses SET fetched_at = ?, '
+                'etag = COALESCE(?, etag), '
+                'last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time(), etag, last_modified, url))
+            self._connection.commit()
+
+    def bodies(self, since: float = 0, page_size: int = 256):
+        """
+        Gets the cached bodies stored or revalidated since a time, oldest
+        first, e.g. to index what was fetched since the last run. They are
+        read a page at a time so the lock is not held between pages.
+        :param since: float, epoch seconds
+        :param page_size: int, bodies read at once
+        :return: generator of tuples of the url, the body and its
+        fetched_at
+        """
+        after = (since, '')
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    'SELECT url, body, fetched_at FROM responses '
+                    'WHERE (fetched_at, url) > (?, ?) '
+                    'ORDER BY fetched_at, url LIMIT ?',
+                    (*after, page_size)).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][2], rows[-1][0])
+
+    def close(self):
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self):
+        """
+        Helper method to delete the least recently used entries until the
+        cache fits in max_size. Must be called with the lock held.
+        """
+        while self._size > self.max_size:
+            rows = self._connection.execute(
+                'SELECT url, size FROM responses ORDER BY accessed_at '
+                'LIMIT 64').fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for url, size in rows:
+                self._connection.execute(
+                    'DELETE FROM responses WHERE url = ?', (url,))
+                self._size -= size
+                if self._size <= self.max_size:
+                    return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the ResponseCache"""
+        return f'ResponseCache(cache_dir={self.cache_dir}, ttl={self.ttl}, ' \
+               f'size={self._size}/{self.max_size})'
@@ -0,0 +1,305 @@
+"""
+This module contains the compact binary form of the PokedexObjects, for
+caching them, handing them to other processes and keeping them in a
+daemon. A blob holds one or more objects:
+
+    magic b'PKDX', version (u8), 3 reserved bytes
+    string table: count (u32), utf-8 size (u32), count + 1 character
+        offsets (u32), the strings joined and utf-8 encoded
+    shared objects: count (u32), records
+    objects: count (u32), records
+
+Every integer is little-endian. Strings are written once per blob and
+referred to by their index in the table. The Stats, Abilities and Moves
+of expanded Pokemon are shared objects, written once however many Pokemon
+of the blob have them and referred to by index, so the decoded Pokemon
+share them too. Records are laid out with fixed size struct fields, so a
+blob is decoded with struct.unpack_from straight from any buffer, e.g. a
+memoryview of an mmap, without copying it first.
+"""
+import struct
+import sys
+
+from pokeretriever.pokeretriever import SECTIONS, Ability, Move, Pokemon, \
+    Stat
+
+MAGIC = b'PKDX'
+VERSION = 1
+
+# an int field that is None, e.g. the power of a status move
+NONE_INT = -2 ** 31
+
+# record kinds
+STAT, ABILITY, MOVE, POKEMON = 1, 2, 3, 4
+
+_HEADER = struct.Struct('<4sB3x')
+_COUNT = struct.Struct('<I')
+_TABLE = struct.Struct('<II')
+# kind, name, id, then the fields of each kind
+_STAT = struct.Struct('<BIi?')
+_ABILITY = struct.Struct('<BIiIIII')
+_MOVE = struct.Struct('<BIiIiiiIII')
+_POKEMON = struct.Struct('<BIiiiB')
+_PAIR = struct.Struct('<Ii')
+
+
+def _int(value) -> int:
+    """Helper function to write an int field that may be None."""
+    return NONE_INT if value is None else value
+
+
+def _none(value: int):
+    """Helper function to read an int field that may be None."""
+    return None if value == NONE_INT else value
+
+
+class _Encoder:
+    """
+    Builds a blob, collecting its strings and shared objects as the
+    records are written.
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.shared = {}  # id of a shared object -> (index, object)
+        self.shared_records = []
+
+    def string(self, value: str) -> int:
+        """
+        Gets the index of a string in the string table.
+        :param value: str
+        :return: int
+        """
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def share(self, pokedex) -> int:
+        """
+        Gets the index of a shared object, writing it the first time.
+        :param pokedex: Stat, Ability or Move
+        :return: int
+        """
+        entry = self.shared.get(id(pokedex))
+        if entry is None:
+            record = self.record(pokedex)
+            entry = self.shared[id(pokedex)] = (len(self.shared_records),
+                                                pokedex)
+            self.shared_records.append(record)
+        return entry[0]
+
+    def record(self, pokedex) -> bytes:
+        """
+        Writes the record of an object.
+        :param pokedex: Pokemon, Ability, Move or Stat
+        :return: bytes
+        :raises TypeError: for other objects
+        """
+        if not isinstance(pokedex, (Stat, Move, Ability, Pokemon)):
+            raise TypeError(f'cannot encode {type(pokedex).__name__}')
+        name = self.string(pokedex.name)
+        if isinstance(pokedex, Stat):
+            return _STAT.pack(STAT, name, pokedex.id, pokedex.is_battle_only)
+        if isinstance(pokedex, Move):
+            return _MOVE.pack(MOVE, name, pokedex.id,
+                              self.string(pokedex.generation),
+                              _int(pokedex.accuracy), _int(pokedex.pp),
+                              _int(pokedex.power), self.string(pokedex.type),
+                              self.string(pokedex.damage_class),
+                              self.string(pokedex.effect_short))
+        if isinstance(pokedex, Ability):
+            return _ABILITY.pack(ABILITY, name, pokedex.id,
+                                 self.string(pokedex.generation),
+                                 self.string(pokedex.effect),
+                                 self.string(pokedex.effect_short),
+                                 len(pokedex.pokemon)) \
+                + self.indexes(map(self.string, pokedex.pokemon))
+        return self.pokemon(pokedex, name)
+
+    def pokemon(self, pokemon: Pokemon, name: int) -> bytes:
+        """
+        Helper method to write the record of a Pokemon, its expanded
+        sections as shared objects.
+        """
+        expanded = pokemon.expanded
+        mask = sum(1 << bit for bit, section in enumerate(SECTIONS)
+                   if section in expanded)
+        parts = [_POKEMON.pack(POKEMON, name, pokemon.id, pokemon.height,
+                               pokemon.weight, mask),
+                 _COUNT.pack(len(pokemon.types)),
+                 self.indexes(map(self.string, pokemon.types))]
+        for section, items in (('stats', pokemon.stats),
+                               ('abilities', pokemon.abilities),
+                               ('moves', pokemon.move)):
+            parts.append(_COUNT.pack(len(items)))
+            if section in expanded:
+                parts.append(self.indexes(map(self.share, items)))
+            elif section == 'abilities':
+                parts.append(self.indexes(map(self.string, items)))
+            else:
+                parts.extend(_PAIR.pack(self.string(item), _int(value))
+                             for item, value in items)
+        return b''.join(parts)
+
+    @staticmethod
+    def indexes(values) -> bytes:
+        """Helper method to write an array of u32."""
+        values = list(values)
+        return struct.pack(f'<{len(values)}I', *values)
+
+    def blob(self, records: list) -> bytes:
+        """
+        Puts a blob together.
+        :param records: list of bytes, the records of the objects
+        :return: bytes
+        """
+        strings = list(self.strings)
+        offsets = [0]
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        text = ''.join(strings).encode('utf-8')
+        return b''.join([
+            _HEADER.pack(MAGIC, VERSION),
+            _TABLE.pack(len(strings), len(text)),
+            struct.pack(f'<{len(offsets)}I', *offsets), text,
+            _COUNT.pack(len(self.shared_records)), *self.shared_records,
+            _COUNT.pack(len(records)), *records])
+
+
+class _Decoder:
+    """Reads the records of a blob one after another."""
+
+    def __init__(self, view: memoryview):
+        self.view = view
+        magic, version = _HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ValueError('not a PokedexObject blob')
+        if version != VERSION:
+            raise ValueError(f'unsupported PokedexObject blob version '
+                             f'{version}, expected {VERSION}')
+        self.offset = _HEADER.size
+        count, size = self.unpack(_TABLE)
+        offsets = self.indexes(count + 1)
+        text = str(self.view[self.offset:self.offset + size], 'utf-8')
+        self.offset += size
+        # interned once here, like the model constructors would
+        self.strings = [sys.intern(text[start:stop])
+                        for start, stop in zip(offsets, offsets[1:])]
+        self.shared = [self.record() for _ in range(self.count())]
+
+    def unpack(self, layout: struct.Struct) -> tuple:
+        """Helper method to read fixed size fields."""
+        values = layout.unpack_from(self.view, self.offset)
+        self.offset += layout.size
+        return values
+
+    def count(self) -> int:
+        """Helper method to read a count."""
+        return self.unpack(_COUNT)[0]
+
+    def indexes(self, count: int) -> tuple:
+        """Helper method to read an array of u32."""
+        values = struct.unpack_from(f'<{count}I', self.view, self.offset)
+        self.offset += 4 * count
+        return values
+
+    def record(self):
+        """
+        Reads the next record.
+        :return: Pokemon, Ability, Move or Stat
+        :raises ValueError: for an unknown record kind
+        """
+        kind = self.view[self.offset]
+        strings = self.strings
+        if kind == STAT:
+            _, name, id_, is_battle_only = self.unpack(_STAT)
+            return Stat(strings[name], id_, is_battle_only)
+        if kind == MOVE:
+            _, name, id_, generation, accuracy, pp, power, type_, \
+                damage_class, effect_short = self.unpack(_MOVE)
+            return Move(strings[name], id_, strings[generation],
+                        _none(accuracy), _none(pp), _none(power),
+                        strings[type_], strings[damage_class],
+                        strings[effect_short])
+        if kind == ABILITY:
+            _, name, id_, generation, effect, effect_short, count = \
+                self.unpack(_ABILITY)
+            return Ability(strings[name], id_, strings[generation],
+                           strings[effect], strings[effect_short],
+                           [strings[index] for index in self.indexes(count)])
+        if kind == POKEMON:
+            return self.pokemon()
+        raise ValueError(f'unknown record kind {kind}')
+
+    def pokemon(self) -> Pokemon:
+        """
+        Helper method to read the record of a Pokemon. Its slots are set
+        like unpickling does, the strings are interned already and the
+        constructor would only go over every move again.
+        """
+        strings = self.strings
+        _, name, id_, height, weight, mask = self.unpack(_POKEMON)
+        pokemon = Pokemon.__new__(Pokemon)
+        pokemon.name = strings[name]
+        pokemon.id = id_
+        pokemon.height = height
+        pokemon.weight = weight
+        pokemon.expanded = frozenset(
+            section for bit, section in enumerate(SECTIONS)
+            if mask & 1 << bit)
+        pokemon.types = tuple(map(strings.__getitem__,
+                                  self.indexes(self.count())))
+        sections = []
+        for section in SECTIONS:
+            count = self.count()
+            if section in pokemon.expanded:
+                sections.append(tuple(map(self.shared.__getitem__,
+                                          self.indexes(count))))
+            elif section == 'abilities':
+                sections.append(tuple(map(strings.__getitem__,
+                                          self.indexes(count))))
+            else:
+                pairs = struct.unpack_from(f'<{"Ii" * count}', self.view,
+                                           self.offset)
+                self.offset += _PAIR.size * count
+                values = pairs[1::2]
+                if NONE_INT in values:
+                    values = map(_none, values)
+                sections.append(tuple(zip(
+                    map(strings.__getitem__, pairs[0::2]), values)))
+        pokemon.stats, pokemon.abilities, pokemon.move = sections
+        return pokemon
+
+
+def encode(pokedex_objects) -> bytes:
+    """
+    Encodes PokedexObjects into one blob. The expanded sections of a
+    LazyPokemon are fetched first, it is decoded as a Pokemon.
+    :param pokedex_objects: iterable of Pokemon, Ability, Move or Stat
+    :return: bytes
+    :raises TypeError: for other objects
+    """
+    encoder = _Encoder()
+    records = [encoder.record(pokedex) for pokedex in pokedex_objects]
+    return encoder.blob(records)
+
+
+def decode(buffer) -> list:
+    """
+    Decodes the PokedexObjects of a blob.
+    :param buffer: bytes or any object supporting the buffer protocol,
+    e.g. a memoryview or an mmap
+    :return: list of Pokemon, Ability, Move or Stat
+    :raises ValueError: when the buffer is not a blob of this version or
+    is cut short
+    """
+    view = memoryview(buffer)
+    try:
+        decoder = _Decoder(view)
+        return [decoder.record() for _ in range(decoder.count())]
+    except (struct.error, IndexError):
+        raise ValueError('the PokedexObject blob is truncated') from None
+    finally:
+        # an mmap can only be closed once no view of it is left
+        view.release()
@@ -0,0 +1,407 @@
+"""
+This module contains the inverted indexes the query mode answers compound
+questions from, e.g. which Pokemon have the ability overgrow and a move of
+type fire with a power of 80 or more. They map
+
+    ability -> Pokemon, move -> Pokemon, type -> Pokemon,
+    type -> moves, generation -> moves, damage class -> moves,
+    generation -> abilities
+
+and keep the power, accuracy and pp of every move for range filters. They
+are built incrementally from the lean bodies the response cache and a
+snapshot already hold, so a query is a few index lookups and set
+intersections instead of one request per Pokemon. The indexes are kept in
+a SQLite file, or in memory for one run with the path ':memory:'.
+
+A query is a list of clauses that must all hold, each a field of the kind
+looked for, an operator (=, >=, <=, > or <) and a value. The fields of a
+related kind are prefixed with it and must all hold for the same related
+object, e.g. for Pokemon:
+
+    ability=overgrow  type=grass  move.type=fire  move.power>=80
+    ability.generation=generation-iii
+"""
+import os
+import re
+import sqlite3
+import zlib
+
+from pokeretriever import parsing
+from pokeretriever.instrumentation import metrics
+
+# a clause of a query, e.g. move.power>=80
+CLAUSE = re.compile(
+    r'\s*([a-z_]+(?:\.[a-z_]+)*)\s*(>=|<=|=|>|<)\s*(\S.*?)\s*')
+
+
+class Clause:
+    """
+    One condition of a query, e.g. move.power>=80.
+    """
+
+    def __init__(self, path: tuple, op: str, value: str, text: str = None):
+        """
+        Initialize a Clause.
+        :param path: tuple of str, the related kinds, if any, then the
+        field, e.g. ('move', 'power')
+        :param op: str, '=', '>=', '<=', '>' or '<'
+        :param value: str
+        :param text: str, the clause as it was written, for error messages
+        """
+        self.path = path
+        self.op = op
+        self.value = value
+        self.text = text if text is not None \
+            else f'{".".join(path)}{op}{value}'
+
+    @classmethod
+    def parse(cls, text: str):
+        """
+        Creates a Clause from its text.
+        :param text: str, e.g. 'ability=overgrow' or 'move.power>=80'
+        :return: Clause
+        :raises ValueError: when the text is not a clause
+        """
+        match = CLAUSE.fullmatch(text.lower())
+        if match is None:
+            raise ValueError(f'"{text}" is not a clause like type=grass or '
+                             f'move.power>=80')
+        return cls(tuple(match[1].split('.')), match[2], match[3], text)
+
+    def nested(self):
+        """
+        Gets the clause of the related kind it starts with, a clause on
+        the name of that kind when it has no field of its own.
+        :return: Clause
+        """
+        return Clause(self.path[1:] or ('name',), self.op, self.value,
+                      self.text)
+
+    def __str__(self):
+        """Returns the current state of the Clause"""
+        return self.text
+
+
+class PokedexIndex:
+    """
+    Inverted indexes over the Pokemon, abilities and moves fetched so far,
+    kept in SQLite. Each posting remembers the resource it was taken from,
+    so indexing a resource again replaces what it said before.
+    """
+    DB_NAME = 'index.sqlite3'
+    KINDS = ('pokemon', 'ability', 'move')
+    # the fields each kind is looked up by, with the postings they are in
+    FIELDS = {'pokemon': {'type': 'pokemon.type'},
+              'ability': {'generation': 'ability.generation'},
+              'move': {'type': 'move.type',
+                       'generation': 'move.generation',
+                       'damage_class': 'move.damage_class'}}
+    # the numeric fields of the moves, for range filters
+    MOVE_VALUES = ('power', 'accuracy', 'pp')
+    # the postings joining two kinds, the name of a posting is of the kind
+    # its field starts with and its key is of the other kind
+    RELATIONS = {('pokemon', 'ability'): 'pokemon.ability',
+                 ('pokemon', 'move'): 'pokemon.move',
+                 ('ability', 'pokemon'): 'pokemon.ability',
+                 ('move', 'pokemon'): 'pokemon.move'}
+    # max values bound to one statement
+    CHUNK_SIZE = 500
+
+    def __init__(self, path: str):
+        """
+        Initialize a PokedexIndex, creating the index file if it does not
+        exist.
+        :param path: str, the index file, or ':memory:' to keep the
+        indexes in memory
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS sources ('
+            'kind TEXT NOT NULL, name TEXT NOT NULL, id INTEGER, '
+            'lookup TEXT NOT NULL, stamp INTEGER NOT NULL, '
+            'PRIMARY KEY (kind, name));'
+            'CREATE TABLE IF NOT EXISTS postings ('
+            'field TEXT NOT NULL, key TEXT NOT NULL, name TEXT NOT NULL, '
+            'source_kind TEXT NOT NULL, source_name TEXT NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS postings_key '
+            'ON postings (field, key, name);'
+            'CREATE INDEX IF NOT EXISTS postings_name '
+            'ON postings (field, name, key);'
+            'CREATE INDEX IF NOT EXISTS postings_source '
+            'ON postings (source_kind, source_name);'
+            'CREATE TABLE IF NOT EXISTS move_values ('
+            'name TEXT PRIMARY KEY, power INTEGER, accuracy INTEGER, '
+            'pp INTEGER);'
+            'CREATE INDEX IF NOT EXISTS move_values_power '
+            'ON move_values (power);'
+            'CREATE TABLE IF NOT EXISTS meta ('
+            'key TEXT PRIMARY KEY, value REAL NOT NULL);')
+
+    def add_body(self, kind: str, body: bytes, lookup: str = None) -> bool:
+        """
+        Indexes a resource from its lean body, replacing what an older
+        body of it said. Call commit() once done adding.
+        :param kind: str, 'pokemon', 'ability' or 'move', other kinds are
+        not indexed
+        :param body: bytes, the lean body
+        :param lookup: str, the name or id it was fetched by, defaults to
+        its name
+        :return: bool, False when it was indexed with this body already
+        """
+        if kind not in self.KINDS:
+            return False
+        doc = parsing.loads(body)
+        name = doc['name']
+        stamp = zlib.crc32(body)
+        row = self._connection.execute(
+            'SELECT stamp FROM sources WHERE kind = ? AND name = ?',
+            (kind, name)).fetchone()
+        if row is not None and row[0] == stamp:
+            return False
+        self._connection.execute(
+            'DELETE FROM postings WHERE source_kind = ? AND source_name = ?',
+            (kind, name))
+        self._connection.execute(
+            'INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)',
+            (kind, name, doc['id'], lookup or name, stamp))
+        self._connection.executemany(
+            'INSERT INTO postings VALUES (?, ?, ?, ?, ?)',
+            [(field, key, posting_name, kind, name)
+             for field, key, posting_name in self._postings(kind, doc)
+             if key is not None])
+        if kind == 'move':
+            self._connection.execute(
+                'INSERT OR REPLACE INTO move_values VALUES (?, ?, ?, ?)',
+                (name, doc['power'], doc['accuracy'], doc['pp']))
+        metrics.count('index.indexed')
+        return True
+
+    @staticmethod
+    def _postings(kind: str, doc: dict) -> list:
+        """
+        Helper method to get the postings of a lean body.
+        :return: list of tuples of the field, the key and the name
+        """
+        name = doc['name']
+        if kind == 'pokemon':
+            return [('pokemon.type', a_type['type']['name'], name)
+                    for a_type in doc['types']] + \
+                [('pokemon.ability', ability['ability']['name'], name)
+                 for ability in doc['abilities']] + \
+                [('pokemon.move', move['move']['name'], name)
+                 for move in doc['moves']]
+        if kind == 'ability':
+            return [('ability.generation', doc['generation']['name'],
+                     name)] + \
+                [('pokemon.ability', name, pokemon['pokemon']['name'])
+                 for pokemon in doc['pokemon']]
+        return [(f'move.{field}', (doc[field] or {}).get('name'), name)
+                for field in ('type', 'generation', 'damage_class')]
+
+    def update_from_cache(self, cache) -> int:
+        """
+        Indexes the bodies the response cache got since the last update
+        from it.
+        :param cache: ResponseCache
+        :return: int, how many resources were (re)indexed
+        """
+        key = f'cache:{os.path.abspath(cache.cache_dir)}'
+        since = self._meta(key)
+        indexed = 0
+        for url, body, fetched_at in cache.bodies(since):
+            # urls are <base url>/<kind>/<name or id>
+            kind, lookup = url.rsplit('/', 2)[1:]
+            indexed += self.add_body(kind, body, lookup)
+            since = fetched_at
+        self._set_meta(key, since)
+        self.commit()
+        return indexed
+
+    def update_from_snapshot(self, snapshot) -> int:
+        """
+        Indexes every resource of a snapshot, unless it was indexed since
+        the snapshot was last written.
+        :param snapshot: SnapshotStore
+        :return: int, how many resources were (re)indexed
+        """
+        key = f'snapshot:{os.path.abspath(snapshot.path)}'
+        written = os.path.getmtime(snapshot.path)
+        if self._meta(key) == written:
+            return 0
+        indexed = 0
+        for kind in self.KINDS:
+            for id_, body in snapshot.bodies(kind):
+                indexed += self.add_body(kind, body, str(id_))
+        self._set_meta(key, written)
+        self.commit()
+        return indexed
+
+    def find(self, kind: str, clauses: list) -> list:
+        """
+        Finds the resources of a kind every clause holds for.
+        :param kind: str, 'pokemon', 'ability' or 'move'
+        :param clauses: list of Clause
+        :return: list of the names or ids to look the matches up with,
+        the ones fetched before in id order first, then the others by name
+        :raises ValueError: for a clause on a field the kind does not have
+        """
+        names = self._match(kind, clauses)
+        known = {}
+        for chunk in self._chunks(names):
+            known.update((name, (id_, lookup)) for name, id_, lookup
+                         in self._connection.execute(
+                             f'SELECT name, id, lookup FROM sources '
+                             f'WHERE kind = ? AND name IN '
+                             f'({", ".join("?" * len(chunk))})',
+                             (kind, *chunk)))
+        return [known[name][1] if name in known else name
+                for name in sorted(names, key=lambda name: (
+                    name not in known, known.get(name, (0,))[0], name))]
+
+    def _match(self, kind: str, clauses: list) -> set:
+        """
+        Helper method to get the names of the resources of a kind every
+        clause holds for. The clauses on a related kind are matched
+        together and joined through their postings, the resulting sets are
+        intersected smallest first.
+        :param kind: str
+        :param clauses: list of Clause
+        :return: set of str
+        """
+        related = {}
+        matches = []
+        for clause in clauses:
+            if len(clause.path) > 1 and clause.path[0] == kind:
+                # e.g. move.power>=80 when looking for moves
+                clause = clause.nested()
+            if len(clause.path) > 1 or (kind, clause.path[0]) \
+                    in self.RELATIONS:
+                if (kind, clause.path[0]) not in self.RELATIONS:
+                    raise ValueError(f'{kind} is not related to '
+                                     f'{clause.path[0]}, in {clause}')
+                related.setdefault(clause.path[0], []).append(
+                    clause.nested())
+            else:
+                matches.append(self._field(kind, clause))
+        for other, nested in related.items():
+            matches.append(self._join(kind, other,
+                                      self._match(other, nested)))
+        if not matches:
+            raise ValueError('a query needs at least one clause')
+        matches.sort(key=len)
+        result = matches[0]
+        for names in matches[1:]:
+            if not result:
+                break
+            result = result & names
+        return result
+
+    def _field(self, kind: str, clause: Clause) -> set:
+        """
+        Helper method to get the names of the resources of a kind a
+        clause on one of its own fields holds for.
+        :return: set of str
+        :raises ValueError: for a field the kind does not have, or a range
+        on a field that is not a number
+        """
+        field = clause.path[0]
+        if field in self.FIELDS[kind] or field == 'name':
+            if clause.op != '=':
+                raise ValueError(f'{kind} {field} can only be compared with '
+                                 f'=, in {clause}')
+            if field == 'name':
+                return {clause.value}
+            return {name for name, in self._connection.execute(
+                'SELECT name FROM postings WHERE field = ? AND key = ?',
+                (self.FIELDS[kind][field], clause.value))}
+        if kind == 'move' and field in self.MOVE_VALUES:
+            try:
+                value = int(clause.value)
+            except ValueError:
+                raise ValueError(f'move {field} is a number, in {clause}') \
+                    from None
+            # the field and operator were checked above, only the value
+            # is bound
+            return {name for name, in self._connection.execute(
+                f'SELECT name FROM move_values WHERE {field} {clause.op} ?',
+                (value,))}
+        fields = sorted({'name', *self.FIELDS[kind],
+                         *(self.MOVE_VALUES if kind == 'move' else ())})
+        raise ValueError(f'{kind} has no field {field}, expected one of '
+                         f'{", ".join(fields)}, in {clause}')
+
+    def _join(self, kind: str, other: str, names: set) -> set:
+        """
+        Helper method to get the resources of a kind related to any of the
+        given resources of another kind.
+        :param kind: str
+        :param other: str, the related kind
+        :param names: set of the names of the related resources
+        :return: set of str
+        """
+        field = self.RELATIONS[kind, other]
+        # the name of a posting is of the kind its field starts with
+        wanted, given = ('name', 'key') if field.startswith(f'{kind}.') \
+            else ('key', 'name')
+        result = set()
+        for chunk in self._chunks(names):
+            result.update(row[0] for row in self._connection.execute(
+                f'SELECT DISTINCT {wanted} FROM postings WHERE field = ? '
+                f'AND {given} IN ({", ".join("?" * len(chunk))})',
+                (field, *chunk)))
+        return result
+
+    def _chunks(self, names) -> list:
+        """
+        Helper method to split names into lists small enough to bind to
+        one statement.
+        :return: list of lists
+        """
+        names = list(names)
+        return [names[start:start + self.CHUNK_SIZE]
+                for start in range(0, len(names), self.CHUNK_SIZE)]
+
+    def _meta(self, key: str) -> float:
+        """Helper method to read a value of the meta table, 0 if unset."""
+        row = self._connection.execute(
+            'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _set_meta(self, key: str, value: float):
+        """Helper method to write a value of the meta table."""
+        self._connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                 (key, value))
+
+    def count(self, kind: str) -> int:
+        """
+        Counts the indexed resources of a kind.
+        :param kind: str
+        :return: int
+        """
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM sources WHERE kind = ?',
+            (kind,)).fetchone()[0]
+
+    def commit(self):
+        """Writes what was added to the index file."""
+        self._connection.commit()
+
+    def close(self):
+        """Commits pending writes and closes the index."""
+        self._connection.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the PokedexIndex"""
+        return f'PokedexIndex(path={self.path}, ' + ', '.join(
+            f'{self.count(kind)} {kind}' for kind in self.KINDS) + \
+            ' indexed)'
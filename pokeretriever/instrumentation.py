@@ -0,0 +1,200 @@
+"""
+This module contains the hot path instrumentation. The fetch pipeline
+records per phase timings and counters into the process wide `metrics`.
+Recording is off by default and every hook returns straight away until
+`metrics.enable()` is called, so it costs next to nothing in normal runs.
+"""
+import functools
+import threading
+import time
+
+
+class _Phase:
+    """Context manager timing one run of a phase."""
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+
+
+class _NullPhase:
+    """Context manager used while recording is off."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Metrics:
+    """
+    Thread safe phase timings and counters. A phase keeps its number of
+    runs, total and max seconds. Phases nest, e.g. the time of the 'network'
+    phase is also part of the 'get.pokemon' phase that caused it.
+    """
+
+    def __init__(self):
+        """Initialize an empty, disabled Metrics."""
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._phases = {}  # name -> [runs, total seconds, max seconds]
+        self._counters = {}
+        self._started = None
+
+    def enable(self):
+        """Starts recording and the wall clock of the run."""
+        self.enabled = True
+        self._started = time.perf_counter()
+
+    def reset(self):
+        """Forgets everything recorded so far and stops recording."""
+        with self._lock:
+            self._phases.clear()
+            self._counters.clear()
+        self.enabled = False
+        self._started = None
+
+    def phase(self, name: str):
+        """
+        Gets a context manager timing a run of a phase.
+        :param name: str
+        :return: context manager
+        """
+        return _Phase(self, name) if self.enabled else _NULL_PHASE
+
+    def add_time(self, name: str, seconds: float):
+        """
+        Records one run of a phase.
+        :param name: str
+        :param seconds: float
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            phase = self._phases.get(name)
+            if phase is None:
+                self._phases[name] = [1, seconds, seconds]
+            else:
+                phase[0] += 1
+                phase[1] += seconds
+                if seconds > phase[2]:
+                    phase[2] = seconds
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Adds to a counter.
+        :param name: str
+        :param amount: int
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def to_dict(self) -> dict:
+        """
+        Gets everything recorded so far.
+        :return: dict of wall_seconds, phases and counters
+        """
+        with self._lock:
+            phases = {name: {'runs': runs, 'total_seconds': total,
+                             'mean_seconds': total / runs,
+                             'max_seconds': longest}
+                      for name, (runs, total, longest)
+                      in sorted(self._phases.items())}
+            counters = dict(sorted(self._counters.items()))
+        wall = time.perf_counter() - self._started \
+            if self._started is not None else 0.0
+        return {'wall_seconds': wall, 'phases': phases, 'counters': counters}
+
+    def summary(self) -> str:
+        """
+        Gets a human readable summary of everything recorded so far.
+        :return: str
+        """
+        data = self.to_dict()
+        lines = [f'Run statistics ({data["wall_seconds"]:.3f}s wall clock)',
+                 f'{"phase":<24}{"runs":>8}{"total s":>11}{"mean ms":>11}'
+                 f'{"max ms":>11}']
+        for name, phase in data['phases'].items():
+            lines.append(f'{name:<24}{phase["runs"]:>8}'
+                         f'{phase["total_seconds"]:>11.3f}'
+                         f'{phase["mean_seconds"] * 1000:>11.2f}'
+                         f'{phase["max_seconds"] * 1000:>11.2f}')
+        counters = data['counters']
+        if counters:
+            lines.append(f'{"counter":<24}{"value":>8}')
+            lines.extend(f'{name:<24}{value:>8}'
+                         for name, value in counters.items())
+        hits = counters.get('cache.hit', 0)
+        lookups = hits + counters.get('cache.miss', 0)
+        if lookups:
+            lines.append(f'cache hit rate {hits / lookups:.1%}')
+        return '\n'.join(lines)
+
+    def __str__(self):
+        """Returns the current state of the Metrics"""
+        return f'Metrics(enabled={self.enabled}, phases={len(self._phases)},' \
+               f' counters={self._counters})'
+
+
+metrics = Metrics()
+
+
+def timed(name: str):
+    """
+    Decorator recording every call of a function as a run of a phase.
+    :param name: str, the phase name
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_iter(name: str, iterable):
+    """
+    Wraps an iterable so the time spent producing each item is recorded
+    as a run of a phase. Time the consumer spends between items is not
+    counted.
+    :param name: str, the phase name
+    :param iterable: iterable
+    :return: generator
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                metrics.add_time(name, time.perf_counter() - start)
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
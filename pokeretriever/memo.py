@@ -0,0 +1,133 @@
+"""
+This module contains an in-memory, thread safe memo of loaded objects with
+least recently used eviction and single-flight loading: concurrent lookups
+of the same key share one load instead of each doing their own. It also
+contains the flyweight registry that keeps one shared instance of each
+sub-resource for as long as anything still uses it.
+"""
+import collections
+import concurrent.futures
+import threading
+import weakref
+
+from pokeretriever.instrumentation import metrics
+
+
+class SingleFlightMemo:
+    """
+    A bounded least recently used memo. When several threads ask for a key
+    that is not loaded yet, only the first one calls the loader and the
+    others wait for its result. With a max_size of 0 it only shares the
+    loads in flight and keeps nothing once they are done.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        """
+        Initialize a SingleFlightMemo.
+        :param max_size: int, the max number of values kept in memory, 0 to
+        keep none
+        """
+        self.max_size = max_size
+        self._values = collections.OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader, *args):
+        """
+        Gets the value of a key, loading it with loader(*args) if it is not
+        memoized. Exceptions raised by the loader are passed on to every
+        waiting caller and are not memoized.
+        :param key: a hashable key, e.g. a (kind, name) tuple
+        :param loader: a callable that loads the value
+        :param args: arguments for the loader
+        :return: the value
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                return self._values[key]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader(*args)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if self.max_size:
+                self._values[key] = value
+                if len(self._values) > self.max_size:
+                    self._values.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """Removes every memoized value."""
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __str__(self):
+        """Returns the current state of the SingleFlightMemo"""
+        return f'SingleFlightMemo(size={len(self._values)}/{self.max_size}, ' \
+               f'in_flight={len(self._in_flight)})'
+
+
+class FlyweightRegistry:
+    """
+    A canonicalizing registry of immutable objects. The first object
+    registered for a key is handed out for that key for as long as
+    something else references it. The registry only holds weak references,
+    so it never keeps an object alive and long runs do not leak.
+    """
+
+    def __init__(self):
+        """Initialize an empty FlyweightRegistry."""
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Gets the live object of a key.
+        :param key: a hashable key, e.g. a (kind, name) tuple
+        :return: the object, or None when nothing references one anymore
+        """
+        with self._lock:
+            value = self._objects.get(key)
+        if value is not None:
+            metrics.count('flyweight.reused')
+        return value
+
+    def canonical(self, key, value):
+        """
+        Gets the shared instance of a key, registering value as it when
+        there is no live one.
+        :param key: a hashable key, e.g. a (kind, name) tuple
+        :param value: a weakly referenceable object
+        :return: the live object of the key, or value
+        """
+        with self._lock:
+            existing = self._objects.get(key)
+            if existing is None:
+                self._objects[key] = value
+                return value
+        metrics.count('flyweight.reused')
+        return existing
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __str__(self):
+        """Returns the current state of the FlyweightRegistry"""
+        return f'FlyweightRegistry(live={len(self._objects)})'
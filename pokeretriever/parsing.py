@@ -0,0 +1,124 @@
+"""
+This module contains the JSON handling for PokeAPI responses. Responses
+are trimmed down to the fields the Pokemon, Ability, Move and Stat classes
+use before they are cached, so later parses only read those fields. orjson
+is used as the JSON backend when it is installed.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+    dumps = orjson.dumps
+else:
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        """Serializes obj to compact JSON bytes."""
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _named(resource) -> dict:
+    """Keeps only the name of a PokeAPI named resource reference."""
+    return None if resource is None else {'name': resource['name']}
+
+
+def lean_pokemon(doc: dict) -> dict:
+    """
+    Trims a pokemon response. Only the first version group detail of each
+    move is kept.
+    :param doc: dict, the full response
+    :return: dict with the same shape as the response
+    """
+    return {
+        'name': doc['name'],
+        'id': doc['id'],
+        'height': doc['height'],
+        'weight': doc['weight'],
+        'stats': [{'stat': _named(stat['stat']),
+                   'base_stat': stat['base_stat']}
+                  for stat in doc['stats']],
+        'types': [{'type': _named(a_type['type'])}
+                  for a_type in doc['types']],
+        'abilities': [{'ability': _named(ability['ability'])}
+                      for ability in doc['abilities']],
+        'moves': [{'move': _named(move['move']),
+                   'version_group_details': [{
+                       'level_learned_at':
+                           move['version_group_details'][0][
+                               'level_learned_at']}]}
+                  for move in doc['moves']]
+    }
+
+
+def lean_ability(doc: dict) -> dict:
+    """
+    Trims an ability response.
+    :param doc: dict, the full response
+    :return: dict with the same shape as the response
+    """
+    return {
+        'name': doc['name'],
+        'id': doc['id'],
+        'generation': _named(doc['generation']),
+        'effect_entries': doc['effect_entries'][:1],
+        'pokemon': [{'pokemon': _named(pokemon['pokemon'])}
+                    for pokemon in doc['pokemon']]
+    }
+
+
+def lean_move(doc: dict) -> dict:
+    """
+    Trims a move response.
+    :param doc: dict, the full response
+    :return: dict with the same shape as the response
+    """
+    return {
+        'name': doc['name'],
+        'id': doc['id'],
+        'generation': _named(doc['generation']),
+        'accuracy': doc['accuracy'],
+        'pp': doc['pp'],
+        'power': doc['power'],
+        'type': _named(doc['type']),
+        'damage_class': _named(doc['damage_class']),
+        'effect_entries': doc['effect_entries'][:1]
+    }
+
+
+def lean_stat(doc: dict) -> dict:
+    """
+    Trims a stat response.
+    :param doc: dict, the full response
+    :return: dict with the same shape as the response
+    """
+    return {
+        'name': doc['name'],
+        'id': doc['id'],
+        'is_battle_only': doc['is_battle_only']
+    }
+
+
+LEAN_PARSERS = {
+    'pokemon': lean_pokemon,
+    'ability': lean_ability,
+    'move': lean_move,
+    'stat': lean_stat
+}
+
+
+def lean_body(kind: str, body: bytes) -> bytes:
+    """
+    Trims a raw response body to the fields the model classes use.
+    :param kind: str, the resource kind, e.g. 'pokemon' or 'move'
+    :param body: bytes, the raw response body
+    :return: bytes, the trimmed body, or body itself for unknown kinds
+    """
+    lean = LEAN_PARSERS.get(kind)
+    if lean is None:
+        return body
+    return dumps(lean(loads(body)))
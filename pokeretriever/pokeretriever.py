@@ -2,7 +2,44 @@
 This module contains the code required to create an aiohttp session and
 execute requests, parse the JSON and instantiate the appropriate object,
 and houses the Pokemon, Ability, Move, and Stat classes.
+
+The PokedexObject classes use __slots__, store their collections as tuples
+and intern their repetitive strings (names, types, generations, damage
+classes) so bulk downloads keep one copy of each string in memory. They
+are weakly referenceable, so the makers can share one instance of each
+Stat, Ability and Move between every Pokemon through a flyweight registry.
+They render themselves straight into a file-like sink with write_to(),
+to plain data with to_dict() and to the compact binary form of the codec
+module with to_bytes().
 """
+import io
+import sys
+
+# the sections of a Pokemon that can be expanded into full objects
+SECTIONS = ('stats', 'abilities', 'moves')
+
+
+def expanded_sections(expanded) -> frozenset:
+    """
+    Gets the sections of a Pokemon an expanded value stands for.
+    :param expanded: bool, True for every section and False for none, or
+    the section names as an iterable or a comma separated str
+    :return: frozenset of section names
+    :raises ValueError: for names that are not in SECTIONS
+    """
+    if expanded is True:
+        return frozenset(SECTIONS)
+    if not expanded:
+        return frozenset()
+    if isinstance(expanded, str):
+        expanded = [section.strip() for section in expanded.split(',')
+                    if section.strip()]
+    sections = frozenset(expanded)
+    unknown = sections.difference(SECTIONS)
+    if unknown:
+        raise ValueError(f'unknown sections {", ".join(sorted(unknown))}, '
+                         f'expected some of {", ".join(SECTIONS)}')
+    return sections
 
 
 class PokedexRequest:
@@ -10,21 +47,27 @@ class PokedexRequest:
     Request has the values needed to make a request to get pokemon data.
     """
 
-    def __init__(self, mode: str, name_or_id: str, expanded: bool,
-                 num_threads=1):
+    def __init__(self, mode: str, name_or_id: str, expanded,
+                 num_threads=1, lazy=False):
         """
         Initialize a request.
         :param mode string (but wil be enum on final assignment)
         name of the id of the object being queried
         :param name_or_id the name or id number of the Pokemon
         :param expanded bool an optional flag that prompts the pokedex to do a
-        sub-query to get more information about a particular attribute
-        :param num_threads the number of threads the request can use.
+        sub-query to get more information about a particular attribute, or
+        the names of the SECTIONS to expand
+        :param num_threads the max number of threads an expanded request
+        fetches its sub-resources with. Requests on the wire are still
+        capped by the RequestScheduler.
+        :param lazy bool, when True the expanded sections of a Pokemon are
+        only fetched when they are first accessed or rendered
         """
         self.mode = mode
         self.name_or_id = name_or_id
         self.expanded = expanded
         self.num_threads = num_threads
+        self.lazy = lazy
 
     def __str__(self):
         """Returns the current state of the request"""
@@ -32,89 +75,296 @@ class PokedexRequest:
 
 
 class PokedexObject:
+    __slots__ = ('name', 'id', '__weakref__')
+
     def __init__(self, name: str, id_: int):
         """Initialize moves."""
-        self.name = name
+        self.name = sys.intern(name)
         self.id = id_
 
+    def fields(self) -> dict:
+        """
+        Gets the attributes of the object, since slotted objects have no
+        __dict__ for vars().
+        :return: dict of attribute name to value
+        """
+        return {slot: getattr(self, slot)
+                for cls in reversed(type(self).__mro__)
+                for slot in getattr(cls, '__slots__', ())
+                if slot != '__weakref__'}
+
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the text form of the object to a file-like sink, without
+        building the whole text as one string first.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line, used to nest
+        objects
+        """
+        sink.write(str(self).replace('\n', '\n' + indent))
+
+    def to_dict(self) -> dict:
+        """
+        Gets the object as plain data for the json and csv reports.
+        :return: dict
+        """
+        return self.fields()
+
+    def _render(self) -> str:
+        """
+        Helper method to render the object with write_to.
+        :return: str
+        """
+        buffer = io.StringIO()
+        self.write_to(buffer)
+        return buffer.getvalue()
+
+    def to_bytes(self) -> bytes:
+        """
+        Gets the object in the compact binary form of the codec module.
+        :return: bytes
+        """
+        from pokeretriever import codec
+        return codec.encode([self])
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """
+        Creates an object from its binary form.
+        :param buffer: bytes, memoryview, mmap or any other buffer holding
+        what to_bytes() returned
+        :return: PokedexObject
+        :raises ValueError: when the buffer does not hold one object of
+        this class
+        """
+        from pokeretriever import codec
+        pokedex_objects = codec.decode(buffer)
+        if len(pokedex_objects) != 1 \
+                or not isinstance(pokedex_objects[0], cls):
+            raise ValueError(f'the buffer does not hold one {cls.__name__}')
+        return pokedex_objects[0]
+
     def __str__(self):
         """Returns the current state of the Move"""
-        return f'PokedexObject={str(vars(self))}'
+        return f'PokedexObject={str(self.fields())}'
 
 
 class Pokemon(PokedexObject):
+    __slots__ = ('height', 'weight', 'stats', 'types', 'abilities', 'move',
+                 'expanded')
+
     def __init__(self, name: str, id_: int, height: int, weight: int, stats,
-                 types: list, abilities, move, expanded: bool):
+                 types: list, abilities, move, expanded):
         """
         :param height: int, the height of the Pokemon
         :param weight: int, the weight of the Pokemon
-        :param stats: a list of stats the Pokemon has
+        :param stats: a list of stats the Pokemon has, Stat objects when
+        expanded or (name, base stat) tuples
         :param types: a list of the types the Pokemon has
-        :param abilities: a list of the Pokemon's abilities
-        :param move: a list of the Pokemon's moves
+        :param abilities: a list of the Pokemon's abilities, Ability objects
+        when expanded or names
+        :param move: a list of the Pokemon's moves, Move objects when
+        expanded or (name, level learned at) tuples
+        :param expanded: bool for every section or none, or the names of
+        the expanded SECTIONS, it is kept as a frozenset of them
         """
         super().__init__(name, id_)
         self.height = height
         self.weight = weight
-        self.stats = stats
-        self.types = types
-        self.abilities = abilities
-        self.move = move
-        self.expanded = expanded
+        self.types = tuple(sys.intern(a_type) for a_type in types)
+        self.expanded = expanded_sections(expanded)
+        if 'stats' in self.expanded:
+            self.stats = tuple(stats)
+        else:
+            self.stats = tuple((sys.intern(stat), base)
+                               for stat, base in stats)
+        if 'abilities' in self.expanded:
+            self.abilities = tuple(abilities)
+        else:
+            self.abilities = tuple(sys.intern(ability)
+                                   for ability in abilities)
+        if 'moves' in self.expanded:
+            self.move = tuple(move)
+        else:
+            self.move = tuple((sys.intern(move_name), level)
+                              for move_name, level in move)
+
+    def expanded_label(self):
+        """
+        Gets how the expanded sections are reported: True for every
+        section, False for none, or the comma separated section names.
+        :return: bool or str
+        """
+        if len(self.expanded) == len(SECTIONS):
+            return True
+        if not self.expanded:
+            return False
+        return ','.join(section for section in SECTIONS
+                        if section in self.expanded)
 
     def types_str(self):
-        result = ''
-        for a_type in self.types:
-            result += f'\n\t\t Name: {a_type}'
-        return result
+        return self._render_part(self._write_types)
 
     def stats_str(self):
-        result = ''
-        if self.expanded:
-            for stat in self.stats:
-                stat = str(stat).replace('\n', "\n\t\t")
-                result += f'\n\t\t{stat}'
-            return result
+        if 'stats' in self.expanded:
+            return self._render_part(self._write_stats)
 
     def abilities_str(self):
-        result = ''
-        if self.expanded:
+        return self._render_part(self._write_abilities)
+
+    def move_str(self):
+        return self._render_part(self._write_moves)
+
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the Pokemon piece by piece, nested objects included.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line
+        """
+        new_line = '\n' + indent
+        sink.write(f'Pokemon: {self.name} '
+                   f'{new_line}\tId: {self.id}'
+                   f'{new_line}\tHeight: {self.height}'
+                   f'{new_line}\tWeight: {self.weight}'
+                   f'{new_line}\tStats: ')
+        if 'stats' in self.expanded:
+            self._write_stats(sink, indent)
+        else:
+            # unexpanded stats have always been reported as None
+            sink.write('None')
+        sink.write(f'{new_line}\tTypes: ')
+        self._write_types(sink, indent)
+        sink.write(f'{new_line}\tAbility: ')
+        self._write_abilities(sink, indent)
+        sink.write(f'{new_line}\tMoves: ')
+        self._write_moves(sink, indent)
+        sink.write(f'{new_line}\tExpanded: {self.expanded_label()}')
+
+    def to_dict(self) -> dict:
+        """
+        Gets the Pokemon as plain data, nested objects included.
+        :return: dict
+        """
+        if 'stats' in self.expanded:
+            stats = [stat.to_dict() for stat in self.stats]
+        else:
+            stats = [{'name': stat, 'base_stat': base}
+                     for stat, base in self.stats]
+        if 'abilities' in self.expanded:
+            abilities = [ability.to_dict() for ability in self.abilities]
+        else:
+            abilities = list(self.abilities)
+        if 'moves' in self.expanded:
+            moves = [move.to_dict() for move in self.move]
+        else:
+            moves = [{'name': move_name, 'level': level}
+                     for move_name, level in self.move]
+        return {'name': self.name, 'id': self.id, 'height': self.height,
+                'weight': self.weight, 'types': list(self.types),
+                'stats': stats, 'abilities': abilities, 'moves': moves,
+                'expanded': self.expanded_label()}
+
+    def _render_part(self, writer) -> str:
+        """
+        Helper method to render one section of the Pokemon to a string.
+        :param writer: one of the _write_* methods
+        :return: str
+        """
+        buffer = io.StringIO()
+        writer(buffer)
+        return buffer.getvalue()
+
+    def _write_types(self, sink, indent: str = ''):
+        for a_type in self.types:
+            sink.write(f'\n{indent}\t\t Name: {a_type}')
+
+    def _write_stats(self, sink, indent: str = ''):
+        nested = indent + '\t\t'
+        for stat in self.stats:
+            sink.write('\n' + nested)
+            stat.write_to(sink, nested)
+
+    def _write_abilities(self, sink, indent: str = ''):
+        nested = indent + '\t\t'
+        if 'abilities' in self.expanded:
             for ability in self.abilities:
-                ability = str(ability).replace('\n', "\n\t\t")
-                result += f'{ability}'
-            return result
+                ability.write_to(sink, nested)
         else:
             for ability in self.abilities:
-                result += f'\n\t\tName: {ability}'
-            return result
+                sink.write(f'\n{nested}Name: {ability}')
 
-    def move_str(self):
-        result = ''
-        if self.expanded:
+    def _write_moves(self, sink, indent: str = ''):
+        nested = indent + '\t\t'
+        if 'moves' in self.expanded:
             for move in self.move:
-                move = str(move).replace('\n', "\n\t\t")
-                result += f'\n\t\t{move}'
-            return result
+                sink.write('\n' + nested)
+                move.write_to(sink, nested)
         else:
-            result = ''
-            for move in self.move:
-                result += f'\n\t\tName: {move[0]}, Level: {move[1]}'
-            return result
+            for move_name, level in self.move:
+                sink.write(f'\n{nested}Name: {move_name}, Level: {level}')
 
     def __str__(self):
         """Returns the current state of the Pokemon"""
-        return f'Pokemon: {self.name} ' \
-               f'\n\tId: {self.id}' \
-               f'\n\tHeight: {self.height}' \
-               f'\n\tWeight: {self.weight}' \
-               f'\n\tStats: {self.stats_str()}' \
-               f'\n\tTypes: {self.types_str()}' \
-               f'\n\tAbility: {self.abilities_str()}' \
-               f'\n\tMoves: {self.move_str()}' \
-               f'\n\tExpanded: {self.expanded}'
+        return self._render()
+
+
+class LazyPokemon(Pokemon):
+    """
+    A Pokemon whose expanded sections are only fetched the first time they
+    are accessed or rendered, so sections nobody looks at cost no requests.
+    """
+    __slots__ = ('loader', 'pending')
+
+    # the slots of Pokemon that hold the sections
+    _section_slots = {'stats': Pokemon.stats,
+                      'abilities': Pokemon.abilities,
+                      'moves': Pokemon.move}
+
+    def __init__(self, name: str, id_: int, height: int, weight: int, stats,
+                 types: list, abilities, move, expanded, loader):
+        """
+        :param stats: list of (name, base stat) tuples
+        :param abilities: list of ability names
+        :param move: list of (name, level learned at) tuples
+        :param expanded: the SECTIONS to fetch on first access
+        :param loader: callable taking a section name and the names of its
+        sub-resources, returning the Stat, Ability or Move objects
+        """
+        super().__init__(name, id_, height, weight, stats, types, abilities,
+                         move, False)
+        self.expanded = expanded_sections(expanded)
+        self.loader = loader
+        self.pending = set(self.expanded)
+
+    def _section(self, section: str):
+        """
+        Helper method to get a section, fetching it first if it is pending.
+        :param section: str, one of SECTIONS
+        :return: tuple
+        """
+        slot = self._section_slots[section]
+        value = slot.__get__(self)
+        if section in self.pending:
+            names = [item if isinstance(item, str) else item[0]
+                     for item in value]
+            value = tuple(self.loader(section, names))
+            slot.__set__(self, value)
+            self.pending.discard(section)
+        return value
+
+    stats = property(
+        lambda self: self._section('stats'),
+        lambda self, value: Pokemon.stats.__set__(self, value))
+    abilities = property(
+        lambda self: self._section('abilities'),
+        lambda self, value: Pokemon.abilities.__set__(self, value))
+    move = property(
+        lambda self: self._section('moves'),
+        lambda self, value: Pokemon.move.__set__(self, value))
 
 
 class Ability(PokedexObject):
+    __slots__ = ('generation', 'effect', 'effect_short', 'pokemon')
 
     def __init__(self, name: str, id_: int, generation: str, effect: str,
                  effect_short: str, pokemon: list):
@@ -127,30 +377,51 @@ class Ability(PokedexObject):
         this ability
         """
         super().__init__(name, id_)
-        self.generation = generation
+        self.generation = sys.intern(generation)
         self.effect = effect
         self.effect_short = effect_short
-        self.pokemon = pokemon
+        self.pokemon = tuple(sys.intern(pokemon_name)
+                             for pokemon_name in pokemon)
 
-    def __str__(self):
-        """Returns the current state of the Ability"""
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the Ability piece by piece.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line
+        """
+        new_line = '\n' + indent
         effect = self.effect.replace("\n", " ")
         effect_short = self.effect_short.replace('\n', ' ')
-        result = f'\nName: {self.name}' \
-                 f'\nId: {self.id}' \
-                 f'\nGeneration: {self.generation}' \
-                 f'\nEffect: {effect}, ' \
-                 f'\nEffect short: {effect_short}' \
-                 f'\nPokemon:'
+        sink.write(f'{new_line}Name: {self.name}'
+                   f'{new_line}Id: {self.id}'
+                   f'{new_line}Generation: {self.generation}'
+                   f'{new_line}Effect: {effect}, '
+                   f'{new_line}Effect short: {effect_short}'
+                   f'{new_line}Pokemon:')
         for pokemon in self.pokemon:
-            result += f' {pokemon}'
-        return result
+            sink.write(f' {pokemon}')
+
+    def to_dict(self) -> dict:
+        """
+        Gets the Ability as plain data.
+        :return: dict
+        """
+        return {'name': self.name, 'id': self.id,
+                'generation': self.generation, 'effect': self.effect,
+                'effect_short': self.effect_short,
+                'pokemon': list(self.pokemon)}
+
+    def __str__(self):
+        """Returns the current state of the Ability"""
+        return self._render()
 
 
 class Move(PokedexObject):
     """
     Moves are the skills of Pokemon in battle.
     """
+    __slots__ = ('generation', 'accuracy', 'pp', 'power', 'type',
+                 'damage_class', 'effect_short')
 
     def __init__(self, name: str, id_: int, generation: str, accuracy: int,
                  pp: int, power: int, type_: str, damage_class: str,
@@ -168,27 +439,47 @@ class Move(PokedexObject):
         :param effect_short: str, a short description of the Pokemon's effect
         """
         super().__init__(name, id_)
-        self.generation = generation
+        self.generation = sys.intern(generation)
         self.accuracy = accuracy
         self.pp = pp
         self.power = power
-        self.type = type_
-        self.damage_class = damage_class
-        self.effect_short = effect_short
+        self.type = sys.intern(type_)
+        self.damage_class = sys.intern(damage_class)
+        self.effect_short = sys.intern(effect_short)
+
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the Move piece by piece.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line
+        """
+        new_line = '\n' + indent
+        sink.write(f'{new_line}Name: {self.name}'
+                   f'{new_line}Id: {self.id}'
+                   f'{new_line}Generation: {self.generation}'
+                   f'{new_line}Accuracy: {self.accuracy}'
+                   f'{new_line}PP: {self.pp}'
+                   f'{new_line}Power: {self.power}'
+                   f'{new_line}Type: {self.type}'
+                   f'{new_line}Damage Class: {self.damage_class}'
+                   f'{new_line}Effect Short: ')
+        sink.write(self.effect_short.replace('\n', new_line)
+                   if indent else self.effect_short)
+
+    def to_dict(self) -> dict:
+        """
+        Gets the Move as plain data.
+        :return: dict
+        """
+        return {'name': self.name, 'id': self.id,
+                'generation': self.generation, 'accuracy': self.accuracy,
+                'pp': self.pp, 'power': self.power, 'type': self.type,
+                'damage_class': self.damage_class,
+                'effect_short': self.effect_short}
 
     def __str__(self):
         """Returns the current state of the Move"""
-        effect_short = self.effect_short.replace('\n', ' ')
-        result = f'\nName: {self.name}' \
-                 f'\nId: {self.id}' \
-                 f'\nGeneration: {self.generation}' \
-                 f'\nAccuracy: {self.accuracy}' \
-                 f'\nPP: {self.pp}' \
-                 f'\nPower: {self.power}' \
-                 f'\nType: {self.type}' \
-                 f'\nDamage Class: {self.damage_class}' \
-                 f'\nEffect Short: {self.effect_short}'
-        return result
+        return self._render()
 
 
 class Stat(PokedexObject):
@@ -197,6 +488,7 @@ class Stat(PokedexObject):
     about the stat of the Pokemon. The stat of the Pokemon grows as they gain
     levels.
     """
+    __slots__ = ('is_battle_only',)
 
     def __init__(self, name: str, id_: int, is_battle_only: bool):
         """
@@ -206,9 +498,74 @@ class Stat(PokedexObject):
         super().__init__(name, id_)
         self.is_battle_only = is_battle_only
 
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the Stat.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line
+        """
+        new_line = '\n' + indent
+        sink.write(f'{new_line}Name: {self.name}'
+                   f'{new_line}ID: {self.id}'
+                   f'{new_line}Battle only: {self.is_battle_only}')
+
+    def to_dict(self) -> dict:
+        """
+        Gets the Stat as plain data.
+        :return: dict
+        """
+        return {'name': self.name, 'id': self.id,
+                'is_battle_only': self.is_battle_only}
+
     def __str__(self):
         """Returns the current state of the Move"""
-        result = f'\nName: {self.name}' \
-                 f'\nID: {self.id}' \
-                 f'\nBattle only: {self.is_battle_only}'
-        return result
+        return self._render()
+
+
+class RenderedObject:
+    """
+    A PokedexObject that was rendered somewhere else, e.g. by a poke_maker
+    server. It keeps the text and the data of the object, so the reports
+    can write it like the object itself.
+    """
+    __slots__ = ('name', 'id', 'text', 'data')
+
+    def __init__(self, text: str, data: dict):
+        """
+        :param text: str, what write_to() of the object wrote, or None if
+        only the data was rendered
+        :param data: dict, what to_dict() of the object returned, or None
+        if only the text was rendered
+        """
+        self.name = data.get('name') if data is not None else None
+        self.id = data.get('id') if data is not None else None
+        self.text = text
+        self.data = data
+
+    def write_to(self, sink, indent: str = ''):
+        """
+        Writes the text of the object.
+        :param sink: a file-like object with a write(str) method
+        :param indent: str, written after every new line
+        """
+        sink.write(self.text.replace('\n', '\n' + indent)
+                   if indent else self.text)
+
+    def _render(self) -> str:
+        """
+        Helper method to get the text of the object, like the _render of a
+        PokedexObject.
+        :return: str
+        """
+        return self.text
+
+    def to_dict(self) -> dict:
+        """
+        Gets the data of the object.
+        :return: dict
+        """
+        return self.data
+
+    def __str__(self):
+        """Returns the current state of the RenderedObject"""
+        return self.text
@@ -0,0 +1,133 @@
+"""
+This module contains the speculative prefetch of related resources. Once
+an object is ready, the resources it references are fetched in the
+background so the follow-up queries for them hit a warm cache: the
+abilities and moves listed in a Pokemon, and the Pokemon listed in an
+Ability. Prefetches run on their own small thread pool at the PREFETCH
+priority, so they only use request slots real requests are not waiting
+for, and stop once their budget is spent or they are cancelled.
+"""
+import concurrent.futures
+import threading
+
+from pokeretriever.instrumentation import metrics
+from pokeretriever.pokeretriever import Ability, Pokemon
+
+
+class Prefetcher:
+    """
+    Fetches the resources referenced by the objects it is offered, at
+    most budget of them, each one once.
+    """
+
+    def __init__(self, fetch, budget: int, max_workers: int = 2):
+        """
+        Initialize a Prefetcher.
+        :param fetch: callable taking a kind and a name, e.g. a partial of
+        PokedexMaker._get_body with the PREFETCH priority
+        :param budget: int, max resources prefetched
+        :param max_workers: int, max prefetches running at once
+        """
+        self.fetch = fetch
+        self.budget = budget
+        self._seen = set()
+        self._futures = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers)
+
+    @staticmethod
+    def related(pokedex) -> list:
+        """
+        Gets the resources an object references that it does not hold
+        already. Only sections that were not expanded are followed, so a
+        lazy Pokemon is never made to load.
+        :param pokedex: PokedexObject
+        :return: list of (kind, name) tuples
+        """
+        if isinstance(pokedex, Pokemon):
+            related = []
+            if 'abilities' not in pokedex.expanded:
+                related.extend(('ability', ability)
+                               for ability in pokedex.abilities)
+            if 'moves' not in pokedex.expanded:
+                related.extend(('move', move_name)
+                               for move_name, _ in pokedex.move)
+            return related
+        if isinstance(pokedex, Ability):
+            return [('pokemon', pokemon) for pokemon in pokedex.pokemon]
+        return []
+
+    def offer(self, pokedex):
+        """
+        Queues the prefetch of the resources an object references, while
+        budget is left.
+        :param pokedex: PokedexObject
+        """
+        with self._lock:
+            for key in self.related(pokedex):
+                if self._cancelled or len(self._seen) >= self.budget:
+                    return
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                self._futures.append(self._executor.submit(
+                    self._prefetch, *key))
+
+    def follow(self, pokedex_objects, timeout: float = None):
+        """
+        Offers every object of an iterable as it passes through. Once the
+        iterable is done the prefetcher is closed, and it is cancelled if
+        the consumer stops early or fails.
+        :param pokedex_objects: iterable of PokedexObjects
+        :param timeout: float, seconds close() waits, see close()
+        :return: generator of the same PokedexObjects
+        """
+        try:
+            for pokedex in pokedex_objects:
+                self.offer(pokedex)
+                yield pokedex
+        except BaseException:
+            self.cancel()
+            raise
+        self.close(timeout)
+
+    def _prefetch(self, kind: str, name: str):
+        """
+        Helper method to fetch one resource. A failed prefetch is only
+        counted, the real request for it reports its error if there is one.
+        :param kind: str
+        :param name: str
+        """
+        if self._cancelled:
+            return
+        try:
+            self.fetch(kind, name)
+        except Exception:
+            metrics.count('prefetch.failed')
+        else:
+            metrics.count('prefetch.fetched')
+
+    def close(self, timeout: float = None):
+        """
+        Stops taking offers and lets the queued prefetches finish.
+        :param timeout: float, seconds to wait for them before the rest is
+        cancelled, or None to let them finish in the background
+        """
+        if timeout is None:
+            self._executor.shutdown(wait=False)
+            return
+        concurrent.futures.wait(self._futures, timeout)
+        self.cancel()
+
+    def cancel(self):
+        """Cancels the queued prefetches and waits for the running ones."""
+        with self._lock:
+            self._cancelled = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __str__(self):
+        """Returns the current state of the Prefetcher"""
+        return f'Prefetcher({len(self._seen)}/{self.budget} queued, ' \
+               f'cancelled={self._cancelled})'
@@ -0,0 +1,175 @@
+"""
+This module contains the failure handling of the fetch pipeline: a retry
+policy with exponential backoff and jitter for transient errors, a circuit
+breaker that fails requests fast while the upstream is down, and the
+per-request failure records that let a batch finish with partial results.
+"""
+import random
+import threading
+import time
+
+# statuses worth retrying, the server or a proxy in front of it is
+# overloaded or briefly unavailable
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RequestFailed(Exception):
+    """Exception for requests that could not be completed."""
+
+    def __init__(self, name: str, reason: str):
+        """
+        Initialize the exception.
+        :param name: str, name or id of the resource that failed
+        :param reason: str, what went wrong
+        """
+        super().__init__()
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        """display the name and the reason of the failure."""
+        return f'Request failed: "{self.name}" ({self.reason})'
+
+
+class CircuitOpenError(RequestFailed):
+    """Exception for requests refused while the circuit breaker is open."""
+
+    def __init__(self, name: str):
+        super().__init__(name, 'upstream unavailable, circuit breaker open')
+
+
+class RetryPolicy:
+    """
+    How often and how long to wait before retrying a transient failure.
+    Delays grow exponentially and use full jitter, so clients that failed
+    together do not retry together.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.25,
+                 max_delay: float = 8.0):
+        """
+        Initialize a RetryPolicy.
+        :param max_retries: int, retries after the first attempt
+        :param base_delay: float, seconds, the cap of the first delay
+        :param max_delay: float, seconds, the cap of every delay
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random()
+
+    def delay(self, attempt: int) -> float:
+        """
+        Gets how long to wait before retrying.
+        :param attempt: int, 0 for the first retry
+        :return: float, seconds
+        """
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self._random.uniform(0, cap)
+
+    @staticmethod
+    def is_transient(status: int) -> bool:
+        """
+        Checks if a response status is worth retrying.
+        :param status: int
+        :return: bool
+        """
+        return status in TRANSIENT_STATUSES
+
+    def __str__(self):
+        """Returns the current state of the RetryPolicy"""
+        return f'RetryPolicy(max_retries={self.max_retries}, ' \
+               f'base_delay={self.base_delay}, max_delay={self.max_delay})'
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after failure_threshold transient failures in a
+    row. After reset_timeout seconds one trial request is let through, and
+    its outcome closes the circuit again or keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int = 10,
+                 reset_timeout: float = 30.0):
+        """
+        Initialize a closed CircuitBreaker.
+        :param failure_threshold: int, failures in a row that open it
+        :param reset_timeout: float, seconds before a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while requests are refused."""
+        return self._opened_at is not None
+
+    def before_request(self, name: str):
+        """
+        Checks that a request may be sent.
+        :param name: str, name or id of the resource about to be requested
+        :raises CircuitOpenError: while the circuit is open
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self._trial_running and time.monotonic() \
+                    - self._opened_at >= self.reset_timeout:
+                self._trial_running = True
+                return
+        raise CircuitOpenError(name)
+
+    def record_success(self):
+        """Closes the circuit and forgets earlier failures."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Counts a transient failure, opening the circuit if needed."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures \
+                    >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def __str__(self):
+        """Returns the current state of the CircuitBreaker"""
+        return f'CircuitBreaker(open={self.is_open}, ' \
+               f'failures={self._failures}/{self.failure_threshold})'
+
+
+class FailedRequest:
+    """
+    The outcome of a top level request that failed, kept so the rest of a
+    batch can still be reported.
+    """
+    __slots__ = ('mode', 'name_or_id', 'error')
+
+    def __init__(self, mode: str, name_or_id: str, error: Exception):
+        """
+        Initialize a FailedRequest.
+        :param mode: str, the request mode, e.g. 'pokemon'
+        :param name_or_id: str, the requested name or id
+        :param error: Exception, why it failed
+        """
+        self.mode = mode
+        self.name_or_id = name_or_id
+        self.error = error
+
+    def to_dict(self) -> dict:
+        """Returns the failure as a JSON friendly dict."""
+        return {'mode': self.mode, 'input': self.name_or_id,
+                'error': getattr(self.error, 'error_type',
+                                 type(self.error).__name__),
+                'message': str(self.error)}
+
+    def __str__(self):
+        """Returns the current state of the FailedRequest"""
+        return f'{self.mode} "{self.name_or_id}": {self.error}'
@@ -0,0 +1,269 @@
+"""
+This module contains the request scheduler every PokeAPI fetch goes
+through. It caps the number of requests in flight, rate limits them with a
+token bucket, lets top level requests go before expansion sub-requests,
+and both before speculative prefetches, and pauses everything when the
+server answers with a Retry-After header.
+
+asyncio is only imported by the coroutine methods, which run inside an
+event loop that imported it already, so the threads engines do not pay
+for loading it.
+"""
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+from pokeretriever.instrumentation import metrics
+
+# request priorities, lower values are scheduled first
+TOP_LEVEL = 0
+EXPANSION = 1
+PREFETCH = 2
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket rate limiter.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        """
+        Initialize a TokenBucket that starts full.
+        :param rate: float, tokens added per second
+        :param burst: int, max tokens the bucket holds, defaults to one
+        second worth of tokens
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token, going into debt if the bucket is empty.
+        :return: float, seconds the caller must wait before using the token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def __str__(self):
+        """Returns the current state of the TokenBucket"""
+        return f'TokenBucket(rate={self.rate}, burst={self.burst})'
+
+
+class RequestScheduler:
+    """
+    Central scheduler that every fetch goes through, from threads with
+    slot() or from coroutines with async_slot(). A slot must be held while
+    a request is on the wire.
+    """
+
+    def __init__(self, max_in_flight: int = 16, rate_limit: float = None,
+                 burst: int = None):
+        """
+        Initialize a RequestScheduler.
+        :param max_in_flight: int, max requests on the wire at once across
+        every thread and coroutine
+        :param rate_limit: float, max requests started per second, or None
+        for no rate limit
+        :param burst: int, max requests started back to back when the rate
+        limiter is idle, defaults to one second worth of requests
+        """
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = TokenBucket(rate_limit, burst) \
+            if rate_limit else None
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._waiters = []  # heap of (priority, order) for threads
+        # heap of (priority, order, loop, future) for coroutines
+        self._async_waiters = []
+
+    @contextlib.contextmanager
+    def slot(self, priority: int = TOP_LEVEL):
+        """
+        Blocks until the calling thread may send a request.
+        :param priority: int, TOP_LEVEL, EXPANSION or PREFETCH
+        """
+        start = time.perf_counter()
+        delay = self._delay()
+        while True:
+            # the delay is waited out before taking a slot, so it is not
+            # kept from a request that could be sent
+            time.sleep(delay)
+            self._acquire(priority)
+            delay = self._paused()
+            if not delay:
+                break
+            # a Retry-After came while waiting for the slot
+            self._release()
+        try:
+            metrics.add_time('queue_wait', time.perf_counter() - start)
+            yield
+        finally:
+            self._release()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self, priority: int = TOP_LEVEL):
+        """
+        Waits until the calling coroutine may send a request.
+        :param priority: int, TOP_LEVEL or EXPANSION
+        """
+        import asyncio
+
+        start = time.perf_counter()
+        delay = self._delay()
+        while True:
+            await asyncio.sleep(delay)
+            await self._async_acquire(priority)
+            delay = self._paused()
+            if not delay:
+                break
+            self._release()
+        try:
+            metrics.add_time('queue_wait', time.perf_counter() - start)
+            yield
+        finally:
+            self._release()
+
+    def retry_after(self, value):
+        """
+        Pauses every new request until the time given by a Retry-After
+        header.
+        :param value: str, seconds or an HTTP date, as sent by the server
+        :return: float, the seconds the scheduler is paused for
+        """
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            import email.utils
+
+            try:
+                seconds = email.utils.parsedate_to_datetime(value) \
+                              .timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = 1.0
+        seconds = max(0.0, seconds)
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     time.monotonic() + seconds)
+        return seconds
+
+    def _delay(self) -> float:
+        """
+        Helper method to get how long a request must wait for a
+        Retry-After pause and the rate limiter before it takes a slot.
+        :return: float, seconds
+        """
+        paused = self._paused()
+        if self.rate_limiter is None:
+            return paused
+        return max(paused, self.rate_limiter.reserve())
+
+    def _paused(self) -> float:
+        """
+        Helper method to get how long the Retry-After pause lasts.
+        :return: float, seconds, 0 when there is none
+        """
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def _acquire(self, priority: int):
+        """
+        Helper method to take a slot from a thread, letting waiters with a
+        lower priority value go first.
+        :param priority: int
+        """
+        waiter = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiters, waiter)
+            while self._in_flight >= self.max_in_flight \
+                    or self._waiters[0] != waiter:
+                self._condition.wait()
+            heapq.heappop(self._waiters)
+            self._in_flight += 1
+            self._condition.notify_all()
+
+    async def _async_acquire(self, priority: int):
+        """
+        Helper method to take a slot from a coroutine. When no slot is
+        free the coroutine waits until a released slot is handed to it.
+        :param priority: int
+        """
+        import asyncio
+
+        with self._lock:
+            if self._in_flight < self.max_in_flight \
+                    and not self._async_waiters:
+                self._in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            heapq.heappush(self._async_waiters,
+                           (priority, next(self._counter), loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        """
+        Helper method to give a slot back to the waiter with the lowest
+        priority value, the oldest first among equals. A waiting thread
+        takes it once woken up, a waiting coroutine is handed it straight
+        away. Threads release slots too, e.g. the prefetches of the async
+        engine, and asyncio futures are not thread safe, so the slot is
+        handed over on the event loop of the waiter.
+        """
+        with self._condition:
+            if not self._async_waiters or (
+                    self._waiters
+                    and self._waiters[0] < self._async_waiters[0][:2]):
+                self._in_flight -= 1
+                self._condition.notify_all()
+                return
+            _, _, loop, future = heapq.heappop(self._async_waiters)
+        import asyncio
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._hand_over(future)
+            return
+        try:
+            loop.call_soon_threadsafe(self._hand_over, future)
+        except RuntimeError:
+            # the loop is closed, nobody waits on it anymore
+            self._release()
+
+    def _hand_over(self, future):
+        """
+        Helper method to wake a waiting coroutine with the slot, run on its
+        event loop. The slot goes to the next waiter if it was cancelled.
+        :param future: asyncio.Future the coroutine waits on
+        """
+        if future.done():
+            self._release()
+        else:
+            future.set_result(None)
+
+    def __str__(self):
+        """Returns the current state of the RequestScheduler"""
+        return f'RequestScheduler(in_flight={self._in_flight}/' \
+               f'{self.max_in_flight}, rate_limiter={self.rate_limiter})'
@@ -0,0 +1,130 @@
+"""
+This module contains an indexed, local store of PokeAPI responses. A
+snapshot holds every Pokemon, ability, move and stat so queries can be
+answered offline with an indexed lookup instead of a network round trip.
+"""
+import os
+import sqlite3
+import threading
+import zlib
+
+
+class SnapshotStore:
+    """
+    A SQLite file of zlib compressed PokeAPI responses, indexed by kind and
+    name and by kind and id. Readers memory map the file.
+    """
+    MMAP_SIZE = 1024 * 1024 * 1024
+
+    def __init__(self, path: str, read_only: bool = True):
+        """
+        Initialize a SnapshotStore.
+        :param path: str, the snapshot file
+        :param read_only: bool, when True the snapshot must exist and is
+        opened for lookups only
+        :raises FileNotFoundError: if a read only snapshot does not exist
+        """
+        if read_only and not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self._connection = sqlite3.connect(
+                f'file:{path}?mode=ro&immutable=1', uri=True,
+                check_same_thread=False)
+        else:
+            self._connection = sqlite3.connect(path,
+                                               check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS resources ('
+                'kind TEXT NOT NULL, name TEXT NOT NULL, '
+                'id INTEGER NOT NULL, body BLOB NOT NULL, '
+                'PRIMARY KEY (kind, name))')
+            self._connection.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS resources_kind_id '
+                'ON resources (kind, id)')
+        self._connection.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+
+    def get(self, kind: str, name_or_id: str):
+        """
+        Gets the response body of a resource.
+        :param kind: str, e.g. 'pokemon' or 'move'
+        :param name_or_id: str, the name or id of the resource
+        :return: bytes or None if the snapshot does not have it
+        """
+        name_or_id = str(name_or_id)
+        if name_or_id.isdigit():
+            query = 'SELECT body FROM resources WHERE kind = ? AND id = ?'
+            key = int(name_or_id)
+        else:
+            query = 'SELECT body FROM resources WHERE kind = ? AND name = ?'
+            key = name_or_id
+        with self._lock:
+            row = self._connection.execute(query, (kind, key)).fetchone()
+        return zlib.decompress(row[0]) if row is not None else None
+
+    def put(self, kind: str, name: str, id_: int, body: bytes):
+        """
+        Stores the response body of a resource.
+        :param kind: str, e.g. 'pokemon' or 'move'
+        :param name: str, the name of the resource
+        :param id_: int, the id of the resource
+        :param body: bytes, the raw response body
+        """
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)',
+                (kind, name, id_, zlib.compress(body)))
+
+    def count(self, kind: str) -> int:
+        """
+        Counts the resources of a kind.
+        :param kind: str
+        :return: int
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM resources WHERE kind = ?',
+                (kind,)).fetchone()[0]
+
+    def ids(self, kind: str) -> list:
+        """
+        Lists the ids of every resource of a kind.
+        :param kind: str
+        :return: list of ids as str, in id order
+        """
+        with self._lock:
+            return [str(row[0]) for row in self._connection.execute(
+                'SELECT id FROM resources WHERE kind = ? ORDER BY id',
+                (kind,))]
+
+    def bodies(self, kind: str):
+        """
+        Gets the response body of every resource of a kind.
+        :param kind: str
+        :return: generator of tuples of the id and the body, in id order
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, body FROM resources WHERE kind = ? ORDER BY id',
+                (kind,)).fetchall()
+        for id_, body in rows:
+            yield id_, zlib.decompress(body)
+
+    def close(self):
+        """Commits pending writes and closes the snapshot."""
+        with self._lock:
+            if not self.read_only:
+                self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the SnapshotStore"""
+        return f'SnapshotStore(path={self.path}, read_only={self.read_only})'
@@ -0,0 +1,375 @@
+"""
+This module contains the transports the makers send their requests
+through. A transport owns the connections: its pool is sized from the
+configured concurrency so every request in flight reuses a keep-alive
+socket, it negotiates compressed responses and applies the connect and
+read timeouts. RequestsTransport backs the threads and processes engines,
+AiohttpTransport the async engine, and the fixture transports answer from
+recorded responses on disk for tests and benchmarks.
+
+requests and aiohttp are imported when a transport first needs them, so
+runs answered from the cache, a snapshot or fixtures never load them, nor
+need them installed. A transport whose client is missing raises
+ClientMissing when it is first used.
+"""
+import importlib.util
+import json
+import os
+import threading
+import urllib.parse
+
+# seconds to wait for a connection, and for each read from it
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+# seconds an idle pooled connection is kept open by the async transport
+KEEPALIVE_TIMEOUT = 30.0
+
+
+class ClientMissing(Exception):
+    """Exception for an HTTP transport whose client is not installed."""
+
+    def __init__(self, client: str):
+        """
+        Initialize the exception.
+        :param client: str, the module of the client, e.g. 'requests'
+        """
+        super().__init__()
+        self.client = client
+
+    def __str__(self):
+        """display the client that is missing."""
+        return f'{self.client} is not installed'
+
+
+def _import_client(client: str):
+    """
+    Helper function to import the module of an HTTP client.
+    :param client: str, 'requests' or 'aiohttp'
+    :return: the module
+    :raises ClientMissing: when it is not installed
+    """
+    try:
+        return importlib.import_module(client)
+    except ModuleNotFoundError as e:
+        if e.name != client:
+            # the client is there, something it needs is not
+            raise
+        raise ClientMissing(client) from None
+
+
+def accept_encoding() -> str:
+    """
+    Gets the Accept-Encoding header to send. Brotli is only asked for when
+    a decoder for it is installed, both clients decode it transparently
+    then.
+    :return: str
+    """
+    if importlib.util.find_spec('brotli') is not None \
+            or importlib.util.find_spec('brotlicffi') is not None:
+        return 'gzip, deflate, br'
+    return 'gzip, deflate'
+
+
+class TransportResponse:
+    """
+    A fully read response, what the async and fixture transports return.
+    It has the attributes of a requests.Response the makers use.
+    """
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        """
+        Initialize a TransportResponse.
+        :param status_code: int
+        :param headers: dict-like, the response headers
+        :param content: bytes, the decoded body
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def close(self):
+        """Nothing to release, the body was read already."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the TransportResponse"""
+        return f'TransportResponse(status_code={self.status_code}, ' \
+               f'{len(self.content)} bytes)'
+
+
+def _keep_alive_adapter(pool_size: int):
+    """
+    Creates an HTTPAdapter turning TCP keep-alive probes on, so pooled
+    connections the server or a NAT dropped while idle are noticed instead
+    of hanging.
+    :param pool_size: int, the connections kept per host
+    :return: requests.adapters.HTTPAdapter
+    """
+    import socket
+
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection
+
+    class KeepAliveAdapter(HTTPAdapter):
+
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs['socket_options'] = \
+                HTTPConnection.default_socket_options \
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            super().init_poolmanager(*args, **kwargs)
+
+    return KeepAliveAdapter(pool_connections=4, pool_maxsize=pool_size,
+                            pool_block=True)
+
+
+class RequestsTransport:
+    """
+    Transport backed by a requests.Session. The default adapter keeps 10
+    connections per host, so with more threads than that most requests
+    open a connection and discard it afterwards ("connection pool is
+    full"). This one keeps pool_size connections and makes a thread wait
+    for a free one instead of opening an extra one. The session is opened
+    by the first request.
+    """
+
+    def __init__(self, pool_size: int = 16,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT):
+        """
+        Initialize a RequestsTransport.
+        :param pool_size: int, the connections kept per host, at least the
+        max requests in flight
+        :param connect_timeout: float, seconds
+        :param read_timeout: float, seconds
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = None
+        self._lock = threading.Lock()
+
+    def get(self, url: str, headers: dict):
+        """
+        Sends a GET request.
+        :param url: str
+        :param headers: dict, extra request headers
+        :return: requests.Response
+        :raises OSError: on connection errors and timeouts
+        """
+        session = self.session
+        if session is None:
+            session = self._open()
+        return session.get(url, headers=headers, timeout=self.timeout)
+
+    def _open(self):
+        """
+        Helper method to open the session the first time it is needed.
+        :return: requests.Session
+        """
+        with self._lock:
+            if self.session is None:
+                requests = _import_client('requests')
+                session = requests.Session()
+                adapter = _keep_alive_adapter(self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept-Encoding'] = accept_encoding()
+                self.session = session
+            return self.session
+
+    def close(self):
+        """Closes every pooled connection."""
+        with self._lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the RequestsTransport"""
+        return f'RequestsTransport(pool_size={self.pool_size}, ' \
+               f'timeout={self.timeout})'
+
+
+class AiohttpTransport:
+    """
+    Transport backed by an aiohttp.ClientSession, used with `async with`
+    inside the event loop that sends the requests. The session is opened by
+    the first request. The connector keeps at most pool_size connections,
+    which also caps the requests on the wire.
+    """
+
+    def __init__(self, pool_size: int = 16,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT,
+                 keepalive_timeout: float = KEEPALIVE_TIMEOUT):
+        """
+        Initialize an AiohttpTransport, it is closed by `async with`.
+        :param pool_size: int, max connections open at once
+        :param connect_timeout: float, seconds
+        :param read_timeout: float, seconds
+        :param keepalive_timeout: float, seconds an idle connection is kept
+        """
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self._client_error = None
+        self._timeout_error = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _open(self):
+        """
+        Helper method to open the session the first time it is needed, in
+        the event loop of the requests.
+        :return: aiohttp.ClientSession
+        """
+        import asyncio
+
+        aiohttp = _import_client('aiohttp')
+        self._client_error = aiohttp.ClientError
+        self._timeout_error = asyncio.TimeoutError
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+        timeout = aiohttp.ClientTimeout(total=None,
+                                        sock_connect=self.connect_timeout,
+                                        sock_read=self.read_timeout)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=timeout,
+            headers={'Accept-Encoding': accept_encoding()})
+        return self.session
+
+    async def get(self, url: str, headers: dict) -> TransportResponse:
+        """
+        Sends a GET request and reads its body.
+        :param url: str
+        :param headers: dict, extra request headers
+        :return: TransportResponse
+        :raises OSError: on connection errors, timeouts included
+        """
+        session = self.session
+        if session is None:
+            session = self._open()
+        try:
+            async with session.get(url, headers=headers) as response:
+                return TransportResponse(response.status, response.headers,
+                                         await response.read())
+        except self._timeout_error as e:
+            raise TimeoutError(f'no answer from {url}') from e
+        except self._client_error as e:
+            raise ConnectionError(f'{type(e).__name__}: {e}') from e
+
+    def __str__(self):
+        """Returns the current state of the AiohttpTransport"""
+        return f'AiohttpTransport(pool_size={self.pool_size}, ' \
+               f'open={self.session is not None})'
+
+
+class FixtureTransport:
+    """
+    Transport answering from recorded responses laid out as
+    <fixtures_dir>/<kind>/<name or id>.json, the layout the benchmarks'
+    fake server reads too. Missing resources are answered with a 404, list
+    endpoints are paginated over the files of a kind.
+    """
+
+    def __init__(self, fixtures_dir: str):
+        """
+        Initialize a FixtureTransport.
+        :param fixtures_dir: str
+        :raises FileNotFoundError: when the directory does not exist
+        """
+        if not os.path.isdir(fixtures_dir):
+            raise FileNotFoundError(fixtures_dir)
+        self.fixtures_dir = fixtures_dir
+
+    def get(self, url: str, headers: dict) -> TransportResponse:
+        """
+        Answers a GET request from the fixtures.
+        :param url: str, only its path and query are used
+        :param headers: dict, ignored
+        :return: TransportResponse
+        """
+        parsed = urllib.parse.urlsplit(url)
+        parts = [part for part in parsed.path.split('/') if part]
+        if parsed.query and parts:
+            query = urllib.parse.parse_qs(parsed.query)
+            return self._list(url, parts[-1],
+                              int(query.get('limit', ['20'])[0]),
+                              int(query.get('offset', ['0'])[0]))
+        if len(parts) < 2:
+            return TransportResponse(404, {}, b'Not Found')
+        path = os.path.join(self.fixtures_dir, parts[-2], f'{parts[-1]}.json')
+        try:
+            with open(path, 'rb') as file:
+                return TransportResponse(200, {}, file.read())
+        except FileNotFoundError:
+            return TransportResponse(404, {}, b'Not Found')
+
+    def _list(self, url: str, kind: str, limit: int, offset: int):
+        """
+        Helper method to answer a page of a list endpoint.
+        :return: TransportResponse
+        """
+        directory = os.path.join(self.fixtures_dir, kind)
+        names = sorted(name[:-len('.json')] for name in os.listdir(directory)
+                       if name.endswith('.json')) \
+            if os.path.isdir(directory) else []
+        base = url.split('?', 1)[0]
+        next_url = f'{base}?limit={limit}&offset={offset + limit}' \
+            if offset + limit < len(names) else None
+        return TransportResponse(200, {}, json.dumps({
+            'count': len(names), 'next': next_url, 'previous': None,
+            'results': [{'name': name, 'url': f'{base}/{name}/'}
+                        for name in names[offset:offset + limit]]
+        }).encode())
+
+    def close(self):
+        """Nothing to release."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __str__(self):
+        """Returns the current state of the FixtureTransport"""
+        return f'FixtureTransport(fixtures_dir={self.fixtures_dir!r})'
+
+
+class AsyncFixtureTransport(FixtureTransport):
+    """FixtureTransport for the async engine."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def get(self, url: str, headers: dict) -> TransportResponse:
+        """
+        Answers a GET request from the fixtures.
+        :param url: str, only its path and query are used
+        :param headers: dict, ignored
+        :return: TransportResponse
+        """
+        return FixtureTransport.get(self, url, headers)
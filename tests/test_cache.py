@@ -0,0 +1,206 @@
+"""
+Tests of the on-disk response cache: freshness, eviction and the
+revalidation of stale entries, on a fake clock.
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+import fixtures  # noqa: E402
+from pokedex_maker import PokedexMaker  # noqa: E402
+from pokeretriever import cache  # noqa: E402
+from pokeretriever.cache import ResponseCache  # noqa: E402
+from pokeretriever.pokeretriever import PokedexRequest  # noqa: E402
+from pokeretriever.scheduler import RequestScheduler  # noqa: E402
+from pokeretriever.transport import FixtureTransport, \
+    TransportResponse  # noqa: E402
+
+URL = 'https://pokeapi.co/api/v2/pokemon/{}'
+
+
+class FakeClock:
+    """Stands in for the time module of the cache."""
+
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class CacheTestCase(unittest.TestCase):
+    """Caches in a temporary directory, on the fake clock."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.clock = FakeClock()
+        patcher = mock.patch.object(cache, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_cache(self, **kwargs) -> ResponseCache:
+        response_cache = ResponseCache(self.directory, **kwargs)
+        self.addCleanup(response_cache.close)
+        return response_cache
+
+
+class TestTtl(CacheTestCase):
+    """Entries are fresh for ttl seconds after they were (re)validated."""
+
+    def test_expiry(self):
+        response_cache = self.open_cache(ttl=60)
+        response_cache.put(URL.format(1), b'body', '"v1"',
+                           'Tue, 14 Nov 2023 22:13:20 GMT')
+        self.clock.advance(59.9)
+        entry = response_cache.get(URL.format(1))
+        self.assertTrue(entry.is_fresh(response_cache.ttl))
+        self.clock.advance(0.1)
+        self.assertFalse(entry.is_fresh(response_cache.ttl))
+        # stale entries are still there, to be revalidated
+        self.assertEqual(entry.body, b'body')
+        self.assertEqual(entry.validators(), {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Tue, 14 Nov 2023 22:13:20 GMT'})
+
+    def test_revalidated(self):
+        response_cache = self.open_cache(ttl=60)
+        response_cache.put(URL.format(1), b'body', '"v1"', 'then')
+        self.clock.advance(100)
+        response_cache.revalidated(URL.format(1), '"v2"')
+        entry = response_cache.get(URL.format(1))
+        self.assertTrue(entry.is_fresh(response_cache.ttl))
+        self.assertEqual((entry.etag, entry.last_modified), ('"v2"', 'then'))
+        self.assertEqual(entry.body, b'body')
+
+    def test_missing(self):
+        self.assertIsNone(self.open_cache().get(URL.format(1)))
+
+
+class TestEviction(CacheTestCase):
+    """The least recently used entries go when the cache is full."""
+
+    def put(self, response_cache: ResponseCache, id_: int, size: int = 100):
+        self.clock.advance(1)
+        response_cache.put(URL.format(id_), bytes(size))
+
+    def cached(self, response_cache: ResponseCache) -> list:
+        return [id_ for id_ in range(1, 10)
+                if response_cache.get(URL.format(id_)) is not None]
+
+    def test_least_recently_used(self):
+        response_cache = self.open_cache(max_size=300)
+        for id_ in (1, 2, 3):
+            self.put(response_cache, id_)
+        # reading 1 makes 2 the least recently used
+        self.clock.advance(1)
+        response_cache.get(URL.format(1))
+        self.put(response_cache, 4)
+        self.assertEqual(self.cached(response_cache), [1, 3, 4])
+
+    def test_replaced_entry_is_counted_once(self):
+        response_cache = self.open_cache(max_size=300)
+        for id_ in (1, 2, 1, 3):
+            self.put(response_cache, id_)
+        self.assertEqual(self.cached(response_cache), [1, 2, 3])
+
+    def test_size_is_kept_between_runs(self):
+        response_cache = self.open_cache(max_size=300)
+        for id_ in (1, 2):
+            self.put(response_cache, id_)
+        response_cache.close()
+        response_cache = self.open_cache(max_size=300)
+        self.put(response_cache, 3, 200)
+        self.assertEqual(self.cached(response_cache), [2, 3])
+
+    def test_body_larger_than_cache(self):
+        response_cache = self.open_cache(max_size=300)
+        self.put(response_cache, 1)
+        self.put(response_cache, 2, 301)
+        self.assertEqual(self.cached(response_cache), [])
+        self.put(response_cache, 3)
+        self.assertEqual(self.cached(response_cache), [3])
+
+
+class EtagTransport(FixtureTransport):
+    """
+    Answers from the fixtures with an ETag, and with 304 Not Modified when
+    the request has the current one.
+    """
+
+    def __init__(self, fixtures_dir: str):
+        super().__init__(fixtures_dir)
+        self.requests = []
+
+    def get(self, url: str, headers: dict) -> TransportResponse:
+        self.requests.append(dict(headers))
+        response = super().get(url, headers)
+        etag = f'"{zlib.crc32(response.content)}"'
+        if headers.get('If-None-Match') == etag:
+            return TransportResponse(304, {'ETag': etag}, b'')
+        return TransportResponse(response.status_code, {'ETag': etag},
+                                 response.content)
+
+
+class TestRevalidation(CacheTestCase):
+    """Stale entries are revalidated with conditional requests."""
+
+    def setUp(self):
+        super().setUp()
+        self.fixtures_dir = os.path.join(self.directory, 'fixtures')
+        fixtures.write_fixtures(self.fixtures_dir, [1])
+        self.transport = EtagTransport(self.fixtures_dir)
+        self.response_cache = self.open_cache(ttl=60)
+        PokedexMaker(self.transport, self.response_cache,
+                     RequestScheduler(4))
+
+    def look_up(self):
+        return PokedexMaker.execute_request(
+            PokedexRequest('pokemon', '1', False))
+
+    def test_not_modified(self):
+        weight = self.look_up().weight
+        self.clock.advance(30)
+        self.look_up()
+        self.assertEqual(len(self.transport.requests), 1)
+        self.clock.advance(60)
+        self.assertEqual(self.look_up().weight, weight)
+        self.assertEqual(len(self.transport.requests), 2)
+        etag = self.response_cache.get(URL.format(1)).etag
+        self.assertEqual(self.transport.requests[1],
+                         {'If-None-Match': etag})
+        # the 304 made the entry fresh for another ttl
+        self.clock.advance(59)
+        self.look_up()
+        self.assertEqual(len(self.transport.requests), 2)
+
+    def test_modified(self):
+        self.look_up()
+        path = os.path.join(self.fixtures_dir, 'pokemon', '1.json')
+        with open(path) as file:
+            doc = json.load(file)
+        doc['weight'] = 1234
+        with open(path, 'w') as file:
+            json.dump(doc, file)
+        # a fresh entry is used as is
+        self.assertNotEqual(self.look_up().weight, 1234)
+        self.clock.advance(60)
+        self.assertEqual(self.look_up().weight, 1234)
+        self.assertEqual(self.response_cache.get(URL.format(1)).etag,
+                         self.transport.get(URL.format(1), {})
+                         .headers['ETag'])
+
+
+if __name__ == '__main__':
+    unittest.main()
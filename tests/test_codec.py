@@ -0,0 +1,117 @@
+"""
+Tests of the binary codec of the PokedexObjects.
+"""
+import mmap
+import tempfile
+import unittest
+
+from pokeretriever import codec
+from pokeretriever.pokeretriever import Ability, Move, Pokemon, Stat
+
+
+def make_batch() -> list:
+    """
+    Builds Pokemon sharing their expanded Stats, Abilities and Moves like
+    the makers do, and an unexpanded one.
+    :return: list of Pokemon
+    """
+    stats = [Stat('hp', 1, False), Stat('attack', 2, False)]
+    abilities = [Ability('overgrow', 65, 'generation-iii',
+                         'Powers up grass moves.', 'Strengthens grass.',
+                         ['bulbasaur', 'ivysaur'])]
+    moves = [Move('tackle', 33, 'generation-i', 100, 35, 40, 'normal',
+                  'physical', 'Inflicts regular damage.'),
+             Move('growl', 45, 'generation-i', 100, 40, None, 'normal',
+                  'status', "Lowers the target's Attack by one stage.")]
+    return [
+        Pokemon('bulbasaur', 1, 7, 69, stats, ['grass', 'poison'],
+                abilities, moves, True),
+        Pokemon('ivysaur', 2, 10, 130, stats, ['grass', 'poison'],
+                abilities, moves[:1], True),
+        Pokemon('charmander', 4, 6, 85, [('hp', 39), ('attack', 52)],
+                ['fire'], ['blaze'], [('scratch', 1), ('ember', None)],
+                False),
+    ]
+
+
+class TestRoundTrip(unittest.TestCase):
+    """Objects decode to what was encoded."""
+
+    def assert_same(self, decoded: list, batch: list):
+        self.assertEqual([pokedex.to_dict() for pokedex in decoded],
+                         [pokedex.to_dict() for pokedex in batch])
+        self.assertEqual([pokedex._render() for pokedex in decoded],
+                         [pokedex._render() for pokedex in batch])
+
+    def test_bytes(self):
+        batch = make_batch()
+        self.assert_same(codec.decode(codec.encode(batch)), batch)
+
+    def test_memoryview(self):
+        batch = make_batch()
+        self.assert_same(codec.decode(memoryview(codec.encode(batch))),
+                         batch)
+
+    def test_mmap(self):
+        batch = make_batch()
+        with tempfile.TemporaryFile() as file:
+            file.write(codec.encode(batch))
+            file.flush()
+            with mmap.mmap(file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mapped:
+                self.assert_same(codec.decode(mapped), batch)
+
+    def test_partly_expanded(self):
+        batch = make_batch()
+        stats = [('hp', 45), ('attack', 49)]
+        pokemon = Pokemon('bulbasaur', 1, 7, 69, stats, ['grass'],
+                          batch[0].abilities, [('tackle', 1)], 'abilities')
+        self.assert_same(codec.decode(codec.encode([pokemon])), [pokemon])
+
+    def test_shared_objects_stay_shared(self):
+        decoded = codec.decode(codec.encode(make_batch()))
+        self.assertIs(decoded[0].move[0], decoded[1].move[0])
+        self.assertIs(decoded[0].abilities[0], decoded[1].abilities[0])
+
+    def test_single_objects(self):
+        batch = make_batch()
+        for pokedex in (batch[0], batch[2], batch[0].stats[0],
+                        batch[0].abilities[0], batch[0].move[1]):
+            decoded = type(pokedex).from_bytes(pokedex.to_bytes())
+            self.assertIs(type(decoded), type(pokedex))
+            self.assertEqual(decoded.to_dict(), pokedex.to_dict())
+
+    def test_from_bytes_checks_the_class(self):
+        blob = make_batch()[0].move[0].to_bytes()
+        with self.assertRaises(ValueError):
+            Ability.from_bytes(blob)
+
+
+class TestBadInput(unittest.TestCase):
+    """Blobs that cannot be decoded raise ValueError."""
+
+    def setUp(self):
+        self.blob = codec.encode(make_batch())
+
+    def test_bad_magic(self):
+        with self.assertRaises(ValueError):
+            codec.decode(b'nope' + self.blob[4:])
+
+    def test_version_mismatch(self):
+        with self.assertRaisesRegex(ValueError, 'version'):
+            codec.decode(self.blob[:4] + bytes([codec.VERSION + 1])
+                         + self.blob[5:])
+
+    def test_truncated(self):
+        for size in (0, 3, 8, len(self.blob) // 2, len(self.blob) - 1):
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    codec.decode(self.blob[:size])
+
+    def test_unknown_object(self):
+        with self.assertRaises(TypeError):
+            codec.encode([object()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests of the sub-resources the makers share between expanded Pokemon.
+"""
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import unittest
+import weakref
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+import fixtures  # noqa: E402
+from async_pokedex_maker import AsyncPokedexMaker  # noqa: E402
+from pokedex_maker import PokedexMaker  # noqa: E402
+from pokeretriever.pokeretriever import PokedexRequest  # noqa: E402
+from pokeretriever.scheduler import RequestScheduler  # noqa: E402
+from pokeretriever.transport import AsyncFixtureTransport, \
+    FixtureTransport  # noqa: E402
+
+
+class TestRelease(unittest.TestCase):
+    """
+    A sub-resource is shared while a Pokemon holds it and released once
+    none does.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        fixtures.write_fixtures(cls.directory.name, [1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def assert_released(self, look_up):
+        pokemon = look_up()
+        again = look_up()
+        move = pokemon.move[0]
+        self.assertIs(again.move[0], move)
+        self.assertIs(PokedexMaker.flyweights.get(('move', move.name)), move)
+        released = weakref.ref(move)
+        name = move.name
+        del pokemon, again, move
+        gc.collect()
+        self.assertIsNone(released())
+        self.assertIsNone(PokedexMaker.flyweights.get(('move', name)))
+
+    def test_threads_engine(self):
+        PokedexMaker(FixtureTransport(self.directory.name), None,
+                     RequestScheduler(4))
+        self.assert_released(lambda: PokedexMaker.execute_request(
+            PokedexRequest('pokemon', '1', True, 4)))
+        self.assertEqual(len(PokedexMaker.memo), 0)
+
+    def test_async_engine(self):
+        async def look_up():
+            async with AsyncFixtureTransport(self.directory.name) \
+                    as transport:
+                AsyncPokedexMaker(transport, None, RequestScheduler(4))
+                return await AsyncPokedexMaker.execute_request(
+                    PokedexRequest('pokemon', '1', True))
+
+        self.assert_released(lambda: asyncio.run(look_up()))
+        self.assertEqual(AsyncPokedexMaker.memo, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+"""
+Tests of the inverted indexes of the query mode against a linear filter
+over the fixtures.
+"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+import fixtures  # noqa: E402
+from pokeretriever import parsing  # noqa: E402
+from pokeretriever.cache import ResponseCache  # noqa: E402
+from pokeretriever.index import Clause, PokedexIndex  # noqa: E402
+
+BASE_URL = 'https://pokeapi.co/api/v2'
+OPERATORS = {'=': int.__eq__, '>=': int.__ge__, '<=': int.__le__,
+             '>': int.__gt__, '<': int.__lt__}
+
+
+def lean(kind: str, name: str) -> bytes:
+    """Gets the lean body of a fixture."""
+    return parsing.lean_body(kind, parsing.dumps(
+        fixtures.resource_json(kind, name)))
+
+
+class LinearFilter:
+    """
+    Answers a query by testing every clause against every lean body, the
+    way the index is meant to answer it.
+    """
+
+    def __init__(self, bodies: dict):
+        """
+        Initialize a LinearFilter.
+        :param bodies: dict of the kinds to dicts of name to lean body
+        """
+        self.docs = {kind: {name: parsing.loads(body)
+                            for name, body in named.items()}
+                     for kind, named in bodies.items()}
+        # what either side lists relates a Pokemon to an ability or a move
+        self.links = {pair: {} for pair in PokedexIndex.RELATIONS}
+        for name, doc in self.docs['pokemon'].items():
+            for other, entries in (('ability', doc['abilities']),
+                                   ('move', doc['moves'])):
+                for entry in entries:
+                    self.link(name, other, entry[other]['name'])
+        for name, doc in self.docs['ability'].items():
+            for entry in doc['pokemon']:
+                self.link(entry['pokemon']['name'], 'ability', name)
+
+    def link(self, pokemon: str, other: str, name: str):
+        self.links['pokemon', other].setdefault(pokemon, set()).add(name)
+        self.links[other, 'pokemon'].setdefault(name, set()).add(pokemon)
+
+    def find(self, kind: str, clauses: list) -> set:
+        """
+        Finds the names of the resources of a kind every clause holds for.
+        :param kind: str
+        :param clauses: list of Clause
+        :return: set of str
+        """
+        return {name for name, doc in self.docs[kind].items()
+                if self.holds(kind, doc, clauses)}
+
+    def holds(self, kind: str, doc: dict, clauses: list) -> bool:
+        related = {}
+        for clause in clauses:
+            if len(clause.path) > 1 and clause.path[0] == kind:
+                clause = clause.nested()
+            if clause.path[0] in PokedexIndex.KINDS:
+                related.setdefault(clause.path[0], []).append(
+                    clause.nested())
+            elif not self.field_holds(kind, doc, clause):
+                return False
+        # the clauses on a related kind hold for the same related resource
+        return all(any(self.holds(other, self.docs[other][name], nested)
+                       for name in self.links[kind, other].get(
+                           doc['name'], ())
+                       if name in self.docs[other])
+                   for other, nested in related.items())
+
+    @staticmethod
+    def field_holds(kind: str, doc: dict, clause: Clause) -> bool:
+        field = clause.path[0]
+        if field == 'name':
+            return doc['name'] == clause.value
+        if field == 'type' and kind == 'pokemon':
+            return clause.value in {a_type['type']['name']
+                                    for a_type in doc['types']}
+        if field in PokedexIndex.MOVE_VALUES:
+            # a move without a power has none to compare
+            return doc[field] is not None and OPERATORS[clause.op](
+                doc[field], int(clause.value))
+        return (doc[field] or {}).get('name') == clause.value
+
+
+class TestFind(unittest.TestCase):
+    """The indexes find what a linear filter over the bodies finds."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bodies = {
+            'pokemon': {fixtures.pokemon_name(id_): lean('pokemon', str(id_))
+                        for id_ in range(1, fixtures.POKEMON_COUNT + 1)},
+            'move': {name: lean('move', name)
+                     for name in fixtures.resource_names('move')},
+            'ability': {name: lean('ability', name)
+                        for name in fixtures.resource_names('ability')}}
+        cls.linear = LinearFilter(cls.bodies)
+        cls.index = PokedexIndex(':memory:')
+        for kind, named in cls.bodies.items():
+            for body in named.values():
+                cls.index.add_body(kind, body)
+        cls.index.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.index.close()
+
+    def assert_same(self, kind: str, *texts):
+        clauses = [Clause.parse(text) for text in texts]
+        expected = self.linear.find(kind, clauses)
+        self.assertEqual(set(self.index.find(kind, clauses)), expected,
+                         texts)
+        return expected
+
+    def test_and(self):
+        self.assertTrue(self.assert_same('pokemon', 'type=fire',
+                                         'ability=ability-7'))
+        self.assertTrue(self.assert_same('pokemon', 'move.type=fire',
+                                         'move.power>=80'))
+        self.assertTrue(self.assert_same('move', 'type=water',
+                                         'damage_class=special',
+                                         'generation=generation-ii'))
+        self.assert_same('pokemon', 'ability.generation=generation-iii',
+                         'move.type=grass', 'move.power>=100', 'type=grass')
+        # and the other way, from the Pokemon to what they are related to
+        self.assertTrue(self.assert_same('ability', 'pokemon.type=ice',
+                                         'generation=generation-i'))
+        self.assertTrue(self.assert_same('move', 'power<=40',
+                                         'pokemon.ability=ability-7'))
+
+    def test_or_across_related(self):
+        # a Pokemon matches when any of its moves does, and the clauses on
+        # moves must hold for the same move, not one move each
+        same_move = self.assert_same('pokemon', 'move.type=fire',
+                                     'move.power=150')
+        any_moves = self.assert_same('pokemon', 'move.type=fire') & \
+            self.assert_same('pokemon', 'move.power=150')
+        self.assertLess(same_move, any_moves)
+
+    def test_numeric_comparisons(self):
+        for field in PokedexIndex.MOVE_VALUES:
+            for op in OPERATORS:
+                for value in (0, 20, 60, 90, 100, 150):
+                    with self.subTest(clause=f'{field}{op}{value}'):
+                        self.assert_same('move', f'{field}{op}{value}')
+        # moves without a power match no range on it
+        self.assertEqual(self.assert_same('move', 'power>=0'),
+                         {name for name, body in self.bodies['move'].items()
+                          if parsing.loads(body)['power'] is not None})
+
+    def test_names_matching_nothing(self):
+        for texts in (['ability=no-such-ability'], ['move.type=no-type'],
+                      ['type=fire', 'name=no-such-pokemon'],
+                      ['move.power>1000'], ['move.name=no-such-move']):
+            with self.subTest(texts=texts):
+                self.assertEqual(self.assert_same('pokemon', *texts), set())
+        # a name alone is looked up as is, even when it was never indexed
+        self.assertEqual(self.index.find('pokemon', [
+            Clause.parse('name=no-such-pokemon')]), ['no-such-pokemon'])
+
+    def test_random_queries(self):
+        rng = random.Random(0)
+        for _ in range(40):
+            texts = rng.sample([
+                f'type={rng.choice(fixtures.TYPES)}',
+                f'ability={fixtures.ability_name(rng.randint(1, 260))}',
+                f'move.type={rng.choice(fixtures.TYPES)}',
+                f'move.power{rng.choice(list(OPERATORS))}'
+                f'{rng.choice([40, 80, 120])}',
+                f'move.damage_class={rng.choice(fixtures.DAMAGE_CLASSES)}',
+                f'ability.generation={rng.choice(fixtures.GENERATIONS)}'],
+                rng.randint(1, 3))
+            with self.subTest(texts=texts):
+                self.assert_same('pokemon', *texts)
+
+    def test_invalid_clauses(self):
+        for kind, text in (('pokemon', 'power>=80'), ('move', 'type>fire'),
+                           ('move', 'power>=high'),
+                           ('ability', 'move.type=fire')):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    self.index.find(kind, [Clause.parse(text)])
+        with self.assertRaises(ValueError):
+            Clause.parse('power 80')
+
+
+class TestUpdateFromCache(unittest.TestCase):
+    """The indexes follow the bodies the cache gets between updates."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ResponseCache(directory.name)
+        self.addCleanup(self.cache.close)
+        self.index = PokedexIndex(os.path.join(directory.name,
+                                               PokedexIndex.DB_NAME))
+        self.addCleanup(self.index.close)
+        self.bodies = {'pokemon': {}, 'move': {}, 'ability': {}}
+        for kind in ('move', 'ability'):
+            for name in fixtures.resource_names(kind):
+                self.fetch(kind, name, lean(kind, name))
+
+    def fetch(self, kind: str, lookup: str, body: bytes):
+        """Puts a body in the cache like a lookup by name or id would."""
+        self.cache.put(f'{BASE_URL}/{kind}/{lookup}', body)
+        self.bodies[kind][parsing.loads(body)['name']] = body
+
+    def assert_same(self, *texts):
+        clauses = [Clause.parse(text) for text in texts]
+        # the Pokemon were fetched by id, and are listed in id order
+        expected = sorted(
+            parsing.loads(self.bodies['pokemon'][name])['id']
+            for name in LinearFilter(self.bodies).find('pokemon', clauses)
+            if name in self.bodies['pokemon'])
+        found = [name for name in self.index.find('pokemon', clauses)
+                 if name.isdigit()]
+        self.assertEqual(found, [str(id_) for id_ in expected], texts)
+
+    def test_incremental(self):
+        for id_ in range(1, 201):
+            self.fetch('pokemon', str(id_), lean('pokemon', str(id_)))
+        self.assertEqual(self.index.update_from_cache(self.cache),
+                         fixtures.MOVE_COUNT + fixtures.ABILITY_COUNT + 200)
+        self.assert_same('move.type=fire', 'move.power>=90')
+        self.assertEqual(self.index.update_from_cache(self.cache), 0)
+
+        # new Pokemon, and one changed upstream
+        for id_ in range(201, 251):
+            self.fetch('pokemon', str(id_), lean('pokemon', str(id_)))
+        changed = parsing.loads(self.bodies['pokemon']['pokemon-1'])
+        changed['types'] = [{'slot': 1, 'type': {'name': 'dragon'}}]
+        changed['moves'] = changed['moves'][:1]
+        self.fetch('pokemon', '1', parsing.dumps(changed))
+        self.assertEqual(self.index.update_from_cache(self.cache), 51)
+        self.assertEqual(self.index.count('pokemon'), 250)
+        for texts in (['type=dragon'], ['move.type=fire', 'move.power>=90'],
+                      ['ability.generation=generation-i', 'type=water']):
+            with self.subTest(texts=texts):
+                self.assert_same(*texts)
+
+
+if __name__ == '__main__':
+    unittest.main()
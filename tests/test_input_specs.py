@@ -0,0 +1,106 @@
+"""
+Tests of how the input specs are expanded into names and ids, and how
+repeated ids are skipped.
+"""
+import unittest
+
+from poke_maker import Driver
+
+
+def expand(spec: str, list_ids=None) -> list:
+    return list(Driver._expand_spec(spec, list_ids))
+
+
+def iterate(lines, dedupe_window: int = 100000, list_ids=None) -> list:
+    return list(Driver._iter_name_ids(lines, dedupe_window, list_ids))
+
+
+class TestExpandSpec(unittest.TestCase):
+    """Specs are comma separated names, ids, ranges and 'all'."""
+
+    def test_range(self):
+        self.assertEqual(expand('1-10'), [str(id_) for id_ in range(1, 11)])
+        self.assertEqual(expand('7-7'), ['7'])
+
+    def test_reversed_range(self):
+        self.assertEqual(expand('5-1'), ['5', '4', '3', '2', '1'])
+
+    def test_overlapping_ranges_are_kept(self):
+        # de-duplicating is left to _iter_name_ids
+        self.assertEqual(expand('1-3,2-4'), ['1', '2', '3', '2', '3', '4'])
+
+    def test_names_and_ids(self):
+        self.assertEqual(expand(' pikachu , 007,,25 '),
+                         ['pikachu', '7', '25'])
+        # only whole tokens of digits are ranges
+        self.assertEqual(expand('ho-oh,1-2-3'), ['ho-oh', '1-2-3'])
+
+    def test_all(self):
+        listed = []
+
+        def list_ids():
+            listed.append(True)
+            return ['1', '2', '3']
+
+        self.assertEqual(expand('all', list_ids), ['1', '2', '3'])
+        self.assertEqual(expand('ALL,4', list_ids), ['1', '2', '3', '4'])
+        self.assertEqual(len(listed), 2)
+        # without a way to list the ids it is a name like any other
+        self.assertEqual(expand('all'), ['all'])
+
+    def test_lazy(self):
+        specs = Driver._expand_spec('1-1000000000')
+        self.assertEqual([next(specs) for _ in range(3)], ['1', '2', '3'])
+
+
+class TestIterNameIds(unittest.TestCase):
+    """Lines are expanded in order and recent repeats are skipped."""
+
+    def test_lines(self):
+        self.assertEqual(iterate(['# a comment\n', '\n', '3-1\n',
+                                  '  pikachu  \n', '4\n']),
+                         ['3', '2', '1', 'pikachu', '4'])
+
+    def test_overlapping_ranges_are_deduped(self):
+        self.assertEqual(iterate(['1-5', '3-8', '8-1']),
+                         [str(id_) for id_ in range(1, 9)])
+        # leading zeros do not make an id a new one
+        self.assertEqual(iterate(['7', '007', '5-8']), ['7', '5', '6', '8'])
+
+    def test_window_edge(self):
+        # a repeat right at the end of the window is skipped, one past it
+        # is not
+        self.assertEqual(iterate(['1,2,1'], dedupe_window=2), ['1', '2'])
+        self.assertEqual(iterate(['1,2,3,1'], dedupe_window=2),
+                         ['1', '2', '3', '1'])
+        self.assertEqual(iterate(['1,2,3,1'], dedupe_window=3),
+                         ['1', '2', '3'])
+        self.assertEqual(iterate(['1,1,2,2'], dedupe_window=1),
+                         ['1', '2'])
+
+    def test_repeat_refreshes_window(self):
+        # the skipped repeat of 1 makes it the most recent id again, so 2
+        # leaves the window before it does
+        self.assertEqual(iterate(['1,2,1,3,1,2'], dedupe_window=2),
+                         ['1', '2', '3', '2'])
+
+    def test_order_is_kept(self):
+        self.assertEqual(iterate(['5,1,5,3,1,2'], dedupe_window=10),
+                         ['5', '1', '3', '2'])
+
+    def test_all(self):
+        self.assertEqual(iterate(['2', 'all', '3'],
+                                 list_ids=lambda: ['1', '2', '3', '4']),
+                         ['2', '1', '3', '4'])
+
+    def test_lazy(self):
+        def lines():
+            yield '1-2'
+            raise AssertionError('read past the first line')
+
+        name_ids = Driver._iter_name_ids(lines(), 10)
+        self.assertEqual([next(name_ids), next(name_ids)], ['1', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests of the single-flight loading of SingleFlightMemo from many threads.
+"""
+import concurrent.futures
+import threading
+import unittest
+
+from pokeretriever.memo import SingleFlightMemo
+
+THREADS = 8
+
+
+class CountingLock:
+    """A lock that lets a test wait until it was taken some times."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._taken = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        self._lock.acquire()
+        with self._condition:
+            self._taken += 1
+            self._condition.notify_all()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def wait_taken(self, times: int):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._taken >= times,
+                                            timeout=10):
+                raise AssertionError(f'taken {self._taken} of {times} times')
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Concurrent lookups of a key share one load."""
+
+    def setUp(self):
+        # nothing is kept once loaded, so only a load in flight is shared
+        self.memo = SingleFlightMemo(max_size=0)
+        self.memo._lock = CountingLock()
+        self.calls = 0
+
+    def loader(self, value):
+        """
+        Loads a value once every thread waits on the memo: the lock is
+        taken once by each caller before it loads or waits.
+        """
+        self.calls += 1
+        self.memo._lock.wait_taken(THREADS)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def get_from_threads(self, value) -> list:
+        """
+        Gets a key from every thread at once.
+        :return: list of the values or exceptions each thread got
+        """
+        def get():
+            try:
+                return self.memo.get_or_load('key', self.loader, value)
+            except Exception as e:
+                return e
+
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            return list(executor.map(lambda _: get(), range(THREADS)))
+
+    def test_one_load_is_shared(self):
+        value = object()
+        self.assertEqual(self.get_from_threads(value), [value] * THREADS)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(self.memo), 0)
+
+    def test_failed_load_is_not_kept(self):
+        error = ConnectionError('down')
+        results = self.get_from_threads(error)
+        self.assertEqual(self.calls, 1)
+        # every waiting caller gets the error of the one load
+        self.assertEqual(results, [error] * THREADS)
+        self.memo.max_size = 16
+        self.assertEqual(self.get_from_threads('loaded'),
+                         ['loaded'] * THREADS)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.memo.get_or_load('key', self.loader, 'again'),
+                         'loaded')
+        self.assertEqual(self.calls, 2)
+
+
+class TestEviction(unittest.TestCase):
+    """The least recently used values go once the memo is full."""
+
+    def test_least_recently_used(self):
+        memo = SingleFlightMemo(max_size=2)
+        loads = []
+
+        def load(key):
+            loads.append(key)
+            return key
+
+        for key in ('a', 'b', 'a', 'c', 'a', 'b'):
+            memo.get_or_load(key, load, key)
+        self.assertEqual(loads, ['a', 'b', 'c', 'b'])
+        self.assertEqual(len(memo), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests of the runs that do not need the HTTP clients installed.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures  # noqa: E402
+
+# runs poke_maker.py with requests and aiohttp impossible to import
+WITHOUT_CLIENTS = '''
+import runpy, sys
+sys.path.insert(0, {root!r})
+sys.modules['requests'] = None
+sys.modules['aiohttp'] = None
+sys.argv = ['poke_maker.py'] + sys.argv[1:]
+runpy.run_path({script!r}, run_name='__main__')
+'''.format(root=ROOT, script=os.path.join(ROOT, 'poke_maker.py'))
+
+
+def run(*args, clients: bool = True) -> subprocess.CompletedProcess:
+    """
+    Runs poke_maker.py.
+    :param args: str, its arguments
+    :param clients: bool, False to make the HTTP clients impossible to
+    import
+    :return: subprocess.CompletedProcess
+    """
+    command = [sys.executable, os.path.join(ROOT, 'poke_maker.py')] \
+        if clients else [sys.executable, '-c', WITHOUT_CLIENTS]
+    return subprocess.run([*command, *args], capture_output=True, text=True,
+                          cwd=ROOT, timeout=60)
+
+
+class TestWithoutClients(unittest.TestCase):
+    """Snapshot runs look up without requests or aiohttp."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        fixtures_dir = os.path.join(cls.directory.name, 'fixtures')
+        fixtures.write_fixtures(fixtures_dir, range(1, 4))
+        cls.snapshot = os.path.join(cls.directory.name, 'snapshot.sqlite3')
+        cls.fixture_args = ('--transport', 'fixtures', '--fixtures-dir',
+                            fixtures_dir, '--no-cache')
+        made = run('snapshot', '--snapshot', cls.snapshot, *cls.fixture_args)
+        assert made.returncode == 0, made.stderr
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_snapshot_lookup(self):
+        expected = run('pokemon', '--inputdata', '1-3', '--expanded',
+                       *self.fixture_args)
+        self.assertEqual(expected.returncode, 0, expected.stderr)
+        for engine in ('threads', 'async'):
+            with self.subTest(engine=engine):
+                looked_up = run('pokemon', '--inputdata', '1-3',
+                                '--expanded', '--snapshot', self.snapshot,
+                                '--engine', engine, clients=False)
+                self.assertEqual(looked_up.returncode, 0, looked_up.stderr)
+                self.assertEqual(looked_up.stdout, expected.stdout)
+
+    def test_snapshot_query(self):
+        name = fixtures.pokemon_json(1)['moves'][0]['move']['name']
+        queried = run('query', '--where', f'move={name}', '--find',
+                      'pokemon', '--snapshot', self.snapshot, '--index',
+                      ':memory:', clients=False)
+        self.assertEqual(queried.returncode, 0, queried.stderr)
+        self.assertIn(fixtures.pokemon_name(1), queried.stdout)
+
+    def test_network_lookup_reports_the_client(self):
+        looked_up = run('pokemon', '--inputdata', '1', '--no-cache',
+                        clients=False)
+        self.assertEqual(looked_up.returncode, 1)
+        self.assertIn('requests is not installed', looked_up.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Tests of the incremental refresh of a report: whatever changed between two
+runs, the refreshed report must be the one a full rebuild writes.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures  # noqa: E402
+
+# the counts a refresh prints, e.g. '3 unchanged, 1 changed, 0 new, ...'
+COUNTS = re.compile(r'(\d+) unchanged, (\d+) changed, (\d+) new, '
+                    r'(\d+) removed')
+
+
+class TestRefresh(unittest.TestCase):
+    """Refreshed reports match full rebuilds."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.fixtures_dir = os.path.join(self.directory, 'fixtures')
+        fixtures.write_fixtures(self.fixtures_dir, range(1, 7))
+
+    def run_maker(self, ids: list, output: str, output_format: str,
+                  *args) -> subprocess.CompletedProcess:
+        """
+        Runs poke_maker.py on expanded Pokemon.
+        :param ids: list of int, the input, in order
+        :param output: str, the file name of the report
+        :param output_format: str, 'text' or 'ndjson'
+        :param args: str, more arguments
+        :return: subprocess.CompletedProcess
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        with open(input_file, 'w') as file:
+            file.write(''.join(f'{id_}\n' for id_ in ids))
+        made = subprocess.run(
+            [sys.executable, os.path.join(ROOT, 'poke_maker.py'), 'pokemon',
+             '--inputfile', input_file, '--expanded', '--format',
+             output_format, '--output', os.path.join(self.directory, output),
+             '--transport', 'fixtures', '--fixtures-dir', self.fixtures_dir,
+             *args], capture_output=True, text=True, cwd=ROOT, timeout=60)
+        self.assertEqual(made.returncode, 0, made.stderr)
+        return made
+
+    def read(self, output: str) -> bytes:
+        with open(os.path.join(self.directory, output), 'rb') as file:
+            return file.read()
+
+    def refresh(self, ids: list, output_format: str = 'text') -> tuple:
+        """
+        Refreshes the report with an input and rebuilds it from scratch.
+        :return: tuple of the unchanged, changed, new and removed counts
+        """
+        refreshed = self.run_maker(ids, 'report', output_format,
+                                   '--refresh')
+        self.run_maker(ids, 'rebuilt', output_format, '--no-cache')
+        self.assertEqual(self.read('report'), self.read('rebuilt'))
+        return tuple(map(int, COUNTS.search(refreshed.stderr).groups()))
+
+    def rewrite(self, kind: str, name: str, **fields):
+        """
+        Changes fields of a fixture, like the upstream changing it.
+        :param kind: str
+        :param name: str, the file name of the fixture
+        :param fields: the new values
+        """
+        path = os.path.join(self.fixtures_dir, kind, f'{name}.json')
+        with open(path) as file:
+            doc = json.load(file)
+        doc.update(fields)
+        with open(path, 'w') as file:
+            json.dump(doc, file)
+
+    def test_new(self):
+        for output_format in ('text', 'ndjson'):
+            with self.subTest(output_format=output_format):
+                self.assertEqual(self.refresh([1, 2, 3], output_format),
+                                 (0, 0, 3, 0))
+                self.assertEqual(self.refresh([1, 2, 3, 4, 5],
+                                              output_format), (3, 0, 2, 0))
+                os.remove(os.path.join(self.directory, 'report'))
+
+    def test_unchanged(self):
+        self.refresh([1, 2, 3, 4])
+        before = self.read('report')
+        self.assertEqual(self.refresh([1, 2, 3, 4]), (4, 0, 0, 0))
+        self.assertEqual(self.read('report'), before)
+
+    def test_changed(self):
+        self.refresh([1, 2, 3, 4])
+        # a Pokemon and a move one of the others is expanded with
+        self.rewrite('pokemon', '2', weight=1234)
+        move = fixtures.pokemon_json(3)['moves'][0]['move']['name']
+        self.rewrite('move', move, power=321)
+        using = {id_ for id_ in (1, 3, 4) if move in {
+            entry['move']['name']
+            for entry in fixtures.pokemon_json(id_)['moves']}}
+        changed = 1 + len(using)
+        self.assertEqual(self.refresh([1, 2, 3, 4]),
+                         (4 - changed, changed, 0, 0))
+        self.assertIn(b'321', self.read('report'))
+
+    def test_removed(self):
+        self.refresh([1, 2, 3, 4])
+        self.assertEqual(self.refresh([1, 3]), (2, 0, 0, 2))
+
+    def test_reordered(self):
+        for output_format in ('text', 'ndjson'):
+            with self.subTest(output_format=output_format):
+                self.refresh([1, 2, 3, 4], output_format)
+                self.assertEqual(self.refresh([4, 2, 3, 1], output_format),
+                                 (4, 0, 0, 0))
+                os.remove(os.path.join(self.directory, 'report'))
+
+
+if __name__ == '__main__':
+    unittest.main()
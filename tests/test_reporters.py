@@ -0,0 +1,52 @@
+"""
+Tests of the data reporters of poke_maker.
+"""
+import io
+import json
+import unittest
+
+from poke_maker import CSVReporter, DataReporter, JSONReporter, \
+    NDJSONReporter
+
+
+class Named:
+    """A PokeObject stand-in with the to_dict() the reporters use."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'moves': [{'name': 'tackle',
+                                              'level': 1}]}
+
+
+class TestDataReporter(unittest.TestCase):
+    """Every data reporter writes the report its subclass defines."""
+
+    def test_subclass_must_write_report(self):
+        class Incomplete(DataReporter):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+        with self.assertRaises(TypeError):
+            DataReporter()
+
+    def test_reporters(self):
+        objects = [Named('bulbasaur'), Named('ivysaur')]
+        for reporter, expected in (
+                (NDJSONReporter(), '{"name": "bulbasaur", "moves": [{"name": '
+                                   '"tackle", "level": 1}]}\n'),
+                (CSVReporter(), 'name,moves\r\nbulbasaur,tackle=1\r\n')):
+            with self.subTest(reporter=type(reporter).__name__):
+                sink = io.StringIO()
+                reporter._write_report(sink, objects)
+                self.assertTrue(sink.getvalue().startswith(expected))
+        sink = io.StringIO()
+        JSONReporter()._write_report(sink, objects)
+        self.assertEqual([doc['name'] for doc in json.loads(sink.getvalue())],
+                         ['bulbasaur', 'ivysaur'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+"""
+Tests of the failure handling of the fetch pipeline: the circuit breaker,
+the retries of PokedexMaker and the Retry-After pauses of the scheduler,
+on a fake clock.
+"""
+import email.utils
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+import fixtures  # noqa: E402
+import pokedex_maker  # noqa: E402
+from pokedex_maker import InvalidPokeObject, PokedexMaker  # noqa: E402
+from pokeretriever import resilience, scheduler  # noqa: E402
+from pokeretriever.pokeretriever import PokedexRequest  # noqa: E402
+from pokeretriever.resilience import CircuitBreaker, CircuitOpenError, \
+    RequestFailed, RetryPolicy  # noqa: E402
+from pokeretriever.scheduler import RequestScheduler  # noqa: E402
+from pokeretriever.transport import FixtureTransport, \
+    TransportResponse  # noqa: E402
+
+
+class FakeClock:
+    """
+    Stands in for the time module: time only passes when something sleeps.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.epoch = 1700000000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = monotonic
+
+    def time(self) -> float:
+        return self.epoch + self.now
+
+    def sleep(self, seconds: float):
+        # the scheduler sleeps for 0 seconds when nothing holds it back
+        if seconds > 0:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+    def patch(self, test: unittest.TestCase):
+        """Makes the fetch pipeline use this clock for the test."""
+        for module in (resilience, scheduler, pokedex_maker):
+            patcher = mock.patch.object(module, 'time', self)
+            patcher.start()
+            test.addCleanup(patcher.stop)
+
+
+class ScriptedTransport(FixtureTransport):
+    """
+    Answers from the fixtures once the scripted outcomes are used up. An
+    outcome is a status, a tuple of a status and headers, or an OSError
+    to raise.
+    """
+
+    def __init__(self, fixtures_dir: str, *outcomes):
+        super().__init__(fixtures_dir)
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url: str, headers: dict) -> TransportResponse:
+        self.calls += 1
+        if not self.outcomes:
+            return super().get(url, headers)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, OSError):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) \
+            else (outcome, {})
+        return TransportResponse(status, headers, b'')
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """The breaker goes from closed to open to half-open and back."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.clock.patch(self)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def fail(self, times: int):
+        for _ in range(times):
+            self.breaker.record_failure()
+
+    def test_closed(self):
+        self.fail(2)
+        self.breaker.before_request('1')
+        # a success forgets the failures before it
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.before_request('1')
+
+    def test_opens_after_threshold(self):
+        self.fail(3)
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('1')
+        self.clock.sleep(29.9)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('1')
+
+    def test_half_open_trial_success_closes(self):
+        self.fail(3)
+        self.clock.sleep(30)
+        self.breaker.before_request('1')
+        # only one trial request at a time
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('2')
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.before_request('2')
+        self.breaker.before_request('3')
+
+    def test_half_open_trial_failure_reopens(self):
+        self.fail(3)
+        self.clock.sleep(30)
+        self.breaker.before_request('1')
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+        # the reset timeout starts over from the failed trial
+        self.clock.sleep(29)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request('2')
+        self.clock.sleep(1)
+        self.breaker.before_request('2')
+
+
+class TestRetryAfter(unittest.TestCase):
+    """The scheduler pauses for the Retry-After the server sent."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.clock.patch(self)
+        self.scheduler = RequestScheduler(4)
+
+    def assert_paused(self, value, seconds: float):
+        self.assertAlmostEqual(self.scheduler.retry_after(value), seconds)
+        with self.scheduler.slot():
+            pass
+        self.assertAlmostEqual(sum(self.clock.sleeps), seconds)
+
+    def test_seconds(self):
+        self.assert_paused('7', 7)
+
+    def test_http_date(self):
+        self.assert_paused(email.utils.formatdate(self.clock.time() + 30,
+                                                  usegmt=True), 30)
+
+    def test_past_http_date(self):
+        self.assert_paused(email.utils.formatdate(self.clock.time() - 30,
+                                                  usegmt=True), 0)
+
+    def test_negative_seconds(self):
+        self.assert_paused('-5', 0)
+
+    def test_invalid(self):
+        # a value that is neither waits a second
+        self.assert_paused('soon', 1)
+
+    def test_longest_pause_wins(self):
+        self.scheduler.retry_after('20')
+        self.scheduler.retry_after('5')
+        with self.scheduler.slot():
+            pass
+        self.assertEqual(self.clock.sleeps, [20])
+
+
+class TestSend(unittest.TestCase):
+    """PokedexMaker retries transient failures only, and not forever."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        fixtures.write_fixtures(cls.directory.name, [1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.clock.patch(self)
+        self.policy = RetryPolicy(max_retries=3, base_delay=0.25,
+                                  max_delay=1.0)
+        self.breaker = CircuitBreaker(failure_threshold=10)
+        for name, value in (('retry_policy', self.policy),
+                            ('breaker', self.breaker)):
+            patcher = mock.patch.object(PokedexMaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def look_up(self, *outcomes):
+        """
+        Looks up a Pokemon through a transport answering with outcomes
+        first.
+        :return: tuple of the Pokemon and the transport
+        """
+        transport = ScriptedTransport(self.directory.name, *outcomes)
+        PokedexMaker(transport, None, RequestScheduler(4))
+        return PokedexMaker.execute_request(
+            PokedexRequest('pokemon', '1', False)), transport
+
+    def test_transient_statuses_are_retried(self):
+        pokemon, transport = self.look_up(503, 502, ConnectionError())
+        self.assertEqual(pokemon.name, fixtures.pokemon_name(1))
+        self.assertEqual(transport.calls, 4)
+        # full jitter under a cap doubling from base_delay to max_delay
+        self.assertEqual(len(self.clock.sleeps), 3)
+        for attempt, seconds in enumerate(self.clock.sleeps):
+            self.assertLessEqual(seconds, min(1.0, 0.25 * 2 ** attempt))
+        self.assertFalse(self.breaker.is_open)
+
+    def test_retry_after_replaces_backoff(self):
+        _, transport = self.look_up((429, {'Retry-After': '3'}),
+                                    (503, {'Retry-After': 'soon'}))
+        self.assertEqual(transport.calls, 3)
+        self.assertEqual(self.clock.sleeps, [3, 1])
+
+    def test_gives_up_after_max_retries(self):
+        with self.assertRaises(RequestFailed) as raised:
+            self.look_up(*[503] * 4)
+        self.assertEqual(raised.exception.reason, 'HTTP 503')
+        self.assertEqual(len(self.clock.sleeps), 3)
+
+    def test_other_statuses_are_not_retried(self):
+        for status, error in ((404, InvalidPokeObject),
+                              (403, RequestFailed)):
+            with self.subTest(status=status):
+                self.clock.sleeps.clear()
+                transport = ScriptedTransport(self.directory.name, status)
+                PokedexMaker(transport, None, RequestScheduler(4))
+                with self.assertRaises(error):
+                    PokedexMaker.execute_request(
+                        PokedexRequest('pokemon', '1', False))
+                self.assertEqual(transport.calls, 1)
+                self.assertEqual(self.clock.sleeps, [])
+
+    def test_open_breaker_fails_fast(self):
+        self.breaker.failure_threshold = 2
+        with self.assertRaises(CircuitOpenError):
+            self.look_up(503, 503)
+        transport = ScriptedTransport(self.directory.name)
+        PokedexMaker(transport, None, RequestScheduler(4))
+        with self.assertRaises(CircuitOpenError):
+            PokedexMaker.execute_request(
+                PokedexRequest('pokemon', '1', False))
+        self.assertEqual(transport.calls, 0)
+        # the trial after the reset timeout closes it again
+        self.clock.sleep(self.breaker.reset_timeout)
+        pokemon = PokedexMaker.execute_request(
+            PokedexRequest('pokemon', '1', False))
+        self.assertEqual(pokemon.name, fixtures.pokemon_name(1))
+        self.assertFalse(self.breaker.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+"""
+Tests of the RequestScheduler shared by threads and coroutines.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pokeretriever import scheduler as scheduler_module
+from pokeretriever.scheduler import EXPANSION, PREFETCH, TOP_LEVEL, \
+    RequestScheduler
+
+
+class TestMixedWaiters(unittest.TestCase):
+    """
+    A slot released by a thread must wake the coroutine waiting for it,
+    like the prefetches of the async engine do.
+    """
+
+    def test_thread_release_wakes_coroutine(self):
+        scheduler = RequestScheduler(1)
+        held = threading.Event()
+
+        def hold():
+            with scheduler.slot(PREFETCH):
+                held.set()
+                time.sleep(0.2)
+
+        async def wait():
+            async with scheduler.async_slot(TOP_LEVEL):
+                return time.perf_counter()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        start = time.perf_counter()
+        acquired = asyncio.run(asyncio.wait_for(wait(), 5))
+        thread.join()
+        self.assertLess(acquired - start, 1)
+        self.assertEqual(scheduler._in_flight, 0)
+
+    def test_coroutine_release_wakes_thread(self):
+        scheduler = RequestScheduler(1)
+        acquired = []
+
+        def take():
+            with scheduler.slot(PREFETCH):
+                acquired.append(time.perf_counter())
+
+        async def hold():
+            async with scheduler.async_slot(TOP_LEVEL):
+                thread.start()
+                await asyncio.sleep(0.2)
+            return time.perf_counter()
+
+        thread = threading.Thread(target=take)
+        released = asyncio.run(hold())
+        thread.join(5)
+        self.assertEqual(len(acquired), 1)
+        self.assertGreaterEqual(acquired[0], released)
+        self.assertEqual(scheduler._in_flight, 0)
+
+    def test_cancelled_waiter_passes_slot_on(self):
+        scheduler = RequestScheduler(1)
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(PREFETCH):
+                held.set()
+                release.wait()
+
+        async def wait():
+            async with scheduler.async_slot(TOP_LEVEL):
+                return True
+
+        async def main():
+            cancelled = asyncio.ensure_future(wait())
+            waiting = asyncio.ensure_future(wait())
+            await asyncio.sleep(0.05)
+            cancelled.cancel()
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.wait_for(waiting, 5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        self.assertTrue(asyncio.run(main()))
+        thread.join()
+        self.assertEqual(scheduler._in_flight, 0)
+
+
+class TestMixedPriorities(unittest.TestCase):
+    """
+    A released slot goes to the waiter with the lowest priority value,
+    thread or coroutine, the oldest first among equals.
+    """
+
+    def acquired_order(self, waiters: list) -> list:
+        """
+        Queues waiters for the one slot of a scheduler while a thread holds
+        it, then releases it.
+        :param waiters: list of tuples of 'thread' or 'coroutine' and the
+        priority, in the order they queue
+        :return: list of the indexes of the waiters, in the order they got
+        the slot
+        """
+        scheduler = RequestScheduler(1)
+        held = threading.Event()
+        release = threading.Event()
+        acquired = []
+
+        def hold():
+            with scheduler.slot(TOP_LEVEL):
+                held.set()
+                release.wait()
+
+        def take(index, priority):
+            with scheduler.slot(priority):
+                acquired.append(index)
+
+        async def wait(index, priority):
+            async with scheduler.async_slot(priority):
+                acquired.append(index)
+
+        async def queued(count: int):
+            while len(scheduler._waiters) + len(scheduler._async_waiters) \
+                    < count:
+                await asyncio.sleep(0.005)
+
+        async def main():
+            threads, tasks = [], []
+            for index, (kind, priority) in enumerate(waiters):
+                if kind == 'thread':
+                    threads.append(threading.Thread(target=take,
+                                                    args=(index, priority)))
+                    threads[-1].start()
+                else:
+                    tasks.append(asyncio.ensure_future(wait(index,
+                                                            priority)))
+                await asyncio.wait_for(queued(index + 1), 5)
+            release.set()
+            await asyncio.wait_for(asyncio.gather(*tasks), 5)
+            for thread in threads:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, thread.join, 5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        asyncio.run(main())
+        holder.join()
+        self.assertEqual(scheduler._in_flight, 0)
+        return acquired
+
+    def test_thread_before_coroutine(self):
+        self.assertEqual(self.acquired_order([('coroutine', EXPANSION),
+                                              ('thread', TOP_LEVEL)]),
+                         [1, 0])
+
+    def test_coroutine_before_thread(self):
+        self.assertEqual(self.acquired_order([('thread', PREFETCH),
+                                              ('coroutine', TOP_LEVEL)]),
+                         [1, 0])
+
+    def test_oldest_first_among_equals(self):
+        self.assertEqual(self.acquired_order([('thread', EXPANSION),
+                                              ('coroutine', EXPANSION),
+                                              ('thread', EXPANSION),
+                                              ('coroutine', TOP_LEVEL)]),
+                         [3, 0, 1, 2])
+
+
+class TestDelays(unittest.TestCase):
+    """Rate limits and Retry-After pauses are waited out without a slot."""
+
+    def test_thread_waits_without_slot(self):
+        scheduler = RequestScheduler(1, rate_limit=1, burst=1)
+        # the slots held whenever the scheduler sleeps
+        in_flight = []
+
+        class Clock:
+            now = 1000.0
+
+            def monotonic(self):
+                return self.now
+
+            perf_counter = monotonic
+
+            def sleep(self, seconds):
+                if seconds > 0:
+                    in_flight.append(scheduler._in_flight)
+                    self.now += seconds
+
+        clock = Clock()
+        with mock.patch.object(scheduler_module, 'time', clock):
+            scheduler.rate_limiter._updated = 1000.0
+            # the first token is spent, the next one is a second away
+            for _ in range(2):
+                with scheduler.slot():
+                    pass
+            scheduler.retry_after('5')
+            with scheduler.slot():
+                pass
+        # a second for the token, then the pause
+        self.assertEqual(in_flight, [0, 0])
+        self.assertEqual(clock.now, 1006.0)
+
+    def test_coroutine_waits_without_slot(self):
+        scheduler = RequestScheduler(1)
+
+        async def wait():
+            async with scheduler.async_slot():
+                pass
+
+        async def main():
+            scheduler.retry_after('0.2')
+            waiting = asyncio.ensure_future(wait())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiting.done())
+            # the paused request does not hold the only slot
+            self.assertEqual(scheduler._in_flight, 0)
+            await asyncio.wait_for(waiting, 5)
+
+        asyncio.run(main())
+        self.assertEqual(scheduler._in_flight, 0)
+
+    def test_pause_while_queued(self):
+        scheduler = RequestScheduler(1)
+        held = threading.Event()
+        release = threading.Event()
+        sent = []
+
+        def hold():
+            with scheduler.slot():
+                held.set()
+                release.wait()
+                # the server asks to wait while a request is queued
+                scheduler.retry_after('0.2')
+
+        def send():
+            with scheduler.slot():
+                sent.append(time.monotonic())
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        sender = threading.Thread(target=send)
+        sender.start()
+        while not scheduler._waiters:
+            time.sleep(0.005)
+        start = time.monotonic()
+        release.set()
+        holder.join()
+        sender.join(5)
+        self.assertGreaterEqual(sent[0] - start, 0.15)
+        self.assertEqual(scheduler._in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
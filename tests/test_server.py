@@ -0,0 +1,100 @@
+"""
+Tests of the poke_maker server and its client streaming lookups.
+"""
+import os
+import queue
+import socket
+import tempfile
+import threading
+import unittest
+
+from poke_server import PokeServer, RemotePokeObjectDownloader
+from pokeretriever.pokeretriever import PokedexRequest, RenderedObject
+
+
+class EchoDownloader:
+    """Answers every request with an object named after it."""
+
+    def __init__(self, pokedex_requests, unordered):
+        self.pokedex_requests = pokedex_requests
+        self.failures = []
+
+    def download(self):
+        for request in self.pokedex_requests:
+            yield RenderedObject(f'{request.mode} {request.name_or_id}',
+                                 {'name': request.name_or_id})
+
+
+class TestLookup(unittest.TestCase):
+    """Lookups stream the requests and the objects both ways."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.address = f'unix:{os.path.join(directory.name, "server")}'
+        self.server = PokeServer(self.address, EchoDownloader)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+
+    def test_objects_come_back_in_order(self):
+        requests = (PokedexRequest('pokemon', str(id_), False)
+                    for id_ in range(1, 2001))
+        downloader = RemotePokeObjectDownloader(requests, self.address)
+        names = [pokedex.name for pokedex in downloader.download()]
+        self.assertEqual(names, [str(id_) for id_ in range(1, 2001)])
+        self.assertEqual(downloader.failures, [])
+
+    def test_first_object_before_last_request(self):
+        pending = queue.Queue()
+
+        def requests():
+            for id_ in range(1, 4):
+                yield PokedexRequest('move', str(id_), False)
+                # the next request waits for the object of this one
+                pending.get(timeout=5)
+
+        objects = RemotePokeObjectDownloader(requests(),
+                                             self.address).download()
+        for id_ in range(1, 4):
+            self.assertEqual(next(objects).name, str(id_))
+            pending.put(id_)
+        self.assertEqual(list(objects), [])
+
+    def test_requests_error_is_raised(self):
+        def requests():
+            yield PokedexRequest('pokemon', '1', False)
+            raise KeyError('bad input')
+
+        downloader = RemotePokeObjectDownloader(requests(), self.address)
+        with self.assertRaises(KeyError):
+            list(downloader.download())
+        self.assertTrue(RemotePokeObjectDownloader.is_running(self.address))
+
+
+class TestIsRunning(unittest.TestCase):
+    """Only a poke_maker server counts as running."""
+
+    def test_not_http(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        self.addCleanup(listener.close)
+
+        def answer():
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(1024)
+                connection.sendall(b'hello\r\n')
+
+        thread = threading.Thread(target=answer)
+        thread.start()
+        port = listener.getsockname()[1]
+        self.assertFalse(RemotePokeObjectDownloader.is_running(
+            f'127.0.0.1:{port}', timeout=5))
+        thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+"""
+Tests of the command line the sharded runs give their shards.
+"""
+import unittest
+
+from poke_maker import ArgumentParser
+from poke_shards import shard_argv
+
+
+class TestShardArgv(unittest.TestCase):
+    """The shards do not get the options naming the files of the run."""
+
+    def setUp(self):
+        self.options = ArgumentParser.option_strings()
+
+    def test_file_options_are_dropped(self):
+        argv = ['pokemon', '--inputdata', '1-20', '--output', 'out.txt',
+                '--stats-json', 'stats.json', '--profile', 'run.prof',
+                '--errors-file', 'errors.ndjson', '--shard-dir', 'shards',
+                '--shards', '3']
+        self.assertEqual(shard_argv(argv, self.options),
+                         ['pokemon', '--inputdata', '1-20', '--shards', '3'])
+
+    def test_equals_and_abbreviations(self):
+        argv = ['move', '--out=out.txt', '--stats-j', 'stats.json',
+                '--prof=run.prof', '--errors', 'errors.ndjson', '--stats',
+                '--format', 'json', '--inputfile', 'in.txt']
+        self.assertEqual(shard_argv(argv, self.options),
+                         ['move', '--stats', '--format', 'json',
+                          '--inputfile', 'in.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()